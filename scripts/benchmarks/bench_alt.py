@@ -0,0 +1,59 @@
+import math
+import pickle
+import random
+import time
+import networkx as nx
+import numpy as np
+import sys
+sys.path.append('scripts')
+from graph.storage import load_graph
+from routing.alt import Landmarks, alt_route
+from routing.dijkstra import dijkstra
+
+N_QUERIES = 200
+
+def bench_alt(seed=0):
+    """Settled nodes and latency: nx.shortest_path vs Dijkstra vs ALT A*"""
+    with open('data/processed/pt_graph.gpickle', 'rb') as f:
+        G_nx = pickle.load(f)
+    G = load_graph('data/processed/pt_graph.bin')
+    landmarks = Landmarks.load(G)
+    
+    rng = random.Random(seed)
+    results = {'networkx': [], 'dijkstra': [], 'alt': []}
+    settled = {'dijkstra': [], 'alt': []}
+    
+    for metric in ['time', 'emissions']:
+        for _ in range(N_QUERIES):
+            origin, destination = rng.sample(list(G.station_ids), 2)
+            source, target = G.node(origin), G.node(destination)
+            
+            start = time.perf_counter()
+            try:
+                expected = nx.shortest_path_length(G_nx, origin, destination, weight=metric)
+            except nx.NetworkXNoPath:
+                expected = math.inf
+            results['networkx'].append(time.perf_counter() - start)
+            
+            start = time.perf_counter()
+            dist, _, count = dijkstra(G, source, metric, target)
+            results['dijkstra'].append(time.perf_counter() - start)
+            settled['dijkstra'].append(count)
+            
+            start = time.perf_counter()
+            route, count = alt_route(G, landmarks, origin, destination, metric)
+            results['alt'].append(time.perf_counter() - start)
+            settled['alt'].append(count)
+            
+            found = getattr(route, metric) if route else math.inf
+            assert math.isclose(found, expected, rel_tol=1e-4, abs_tol=1e-6) or (found == expected), \
+                f"ALT {metric} {origin} → {destination}: {found} != {expected}"
+    
+    for name, latencies in results.items():
+        line = f"{name}: mean {np.mean(latencies)*1000:.2f} ms, p99 {np.percentile(latencies, 99)*1000:.2f} ms"
+        if name in settled:
+            line += f", mean settled nodes {np.mean(settled[name]):.0f}"
+        print(line)
+
+if __name__ == "__main__":
+    bench_alt()
\ No newline at end of file
@@ -0,0 +1,45 @@
+import math
+import random
+import time
+import numpy as np
+import sys
+sys.path.append('scripts')
+from graph.storage import load_graph
+from routing.ch import METRICS, ContractionHierarchy
+from routing.dijkstra import dijkstra
+
+N_QUERIES = 500
+
+def bench_ch(seed=0):
+    """Preprocessing time, index size and query latency: Dijkstra vs contraction hierarchy"""
+    G = load_graph('data/processed/pt_graph.bin')
+    rng = random.Random(seed)
+    
+    for metric in METRICS:
+        start = time.perf_counter()
+        ch = ContractionHierarchy.build(G, metric)
+        preprocessing = time.perf_counter() - start
+        n_shortcuts = int(np.sum(ch.edge_orig < 0))
+        print(f"{metric}: preprocessing {preprocessing:.1f}s, {n_shortcuts} shortcuts, "
+              f"index {ch.nbytes() / 1e6:.1f} MB")
+        
+        results = {'dijkstra': [], 'ch': []}
+        for _ in range(N_QUERIES):
+            source, target = rng.randrange(G.number_of_nodes()), rng.randrange(G.number_of_nodes())
+            
+            start = time.perf_counter()
+            expected = dijkstra(G, source, metric, target)[0][target]
+            results['dijkstra'].append(time.perf_counter() - start)
+            
+            start = time.perf_counter()
+            cost, _ = ch.query(source, target)
+            results['ch'].append(time.perf_counter() - start)
+            
+            assert cost == expected or math.isclose(cost, expected, rel_tol=1e-9), \
+                f"CH {metric} {G.station_ids[source]} → {G.station_ids[target]}: {cost} != {expected}"
+        
+        for name, latencies in results.items():
+            print(f"  {name}: mean {np.mean(latencies)*1000:.3f} ms, p99 {np.percentile(latencies, 99)*1000:.3f} ms")
+
+if __name__ == "__main__":
+    bench_ch()
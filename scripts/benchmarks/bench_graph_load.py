@@ -0,0 +1,34 @@
+import pickle
+import time
+import sys
+sys.path.append('scripts')
+from graph.storage import load_graph
+
+PICKLE_PATH = 'data/processed/pt_graph.gpickle'
+COMPACT_PATH = 'data/processed/pt_graph.bin'
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def bench_graph_load():
+    """Cold-start cost of the pickled NetworkX graph vs the mmap format"""
+    def load_pickle():
+        with open(PICKLE_PATH, 'rb') as f:
+            return pickle.load(f)
+    
+    G, t_pickle = timed(load_pickle)
+    C, t_mmap = timed(lambda: load_graph(COMPACT_PATH))
+    
+    # First query: look up a station and read its outgoing edges
+    station_id = next(iter(G.nodes()))
+    _, t_query = timed(lambda: [C.edge_data(e) for e in C.out_edges(C.node(station_id))])
+    
+    print(f"Graph: {C.number_of_nodes()} nodes, {C.number_of_edges()} edges")
+    print(f"  pickle load: {t_pickle*1000:.1f} ms")
+    print(f"  mmap load:   {t_mmap*1000:.2f} ms")
+    print(f"  first query: {t_query*1000:.2f} ms")
+
+if __name__ == "__main__":
+    bench_graph_load()
\ No newline at end of file
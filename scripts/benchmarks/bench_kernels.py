@@ -0,0 +1,60 @@
+import time
+import numpy as np
+import sys
+sys.path.append('scripts')
+from utils.geo import haversine_distance, haversine_distances, pairwise_haversine
+from utils.time import parse_gtfs_time, time_diff, parse_gtfs_times, time_diffs
+
+N = 200_000
+
+def make_times(rng, n):
+    """GTFS-style times including > 24:00:00 and a few bad values"""
+    seconds = rng.integers(4 * 3600, 27 * 3600, n)
+    times = np.array([f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}" for s in seconds], dtype=object)
+    times[rng.random(n) < 0.01] = None
+    times[rng.random(n) < 0.01] = 'bad'
+    return times
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def bench_haversine(rng):
+    print(f"\nhaversine ({N} pairs):")
+    lat1 = -38 + rng.random(N)
+    lon1 = 144.5 + rng.random(N)
+    lat2 = -38 + rng.random(N)
+    lon2 = 144.5 + rng.random(N)
+    
+    scalar, t_scalar = timed(lambda: [
+        haversine_distance(a, b, c, d) for a, b, c, d in zip(lat1, lon1, lat2, lon2)
+    ])
+    vector, t_vector = timed(lambda: haversine_distances(lat1, lon1, lat2, lon2))
+    
+    print(f"  scalar: {t_scalar*1000:.1f} ms")
+    print(f"  vector: {t_vector*1000:.1f} ms ({t_scalar/t_vector:.0f}x)")
+    print(f"  max abs diff: {np.max(np.abs(np.array(scalar) - vector)):.2e} m")
+    
+    k = 2000
+    matrix, t_matrix = timed(lambda: pairwise_haversine(lat1[:k], lon1[:k], lat2[:k], lon2[:k]))
+    print(f"  pairwise {k}x{k}: {t_matrix*1000:.1f} ms")
+    assert np.isclose(matrix[3, 7], haversine_distance(lat1[3], lon1[3], lat2[7], lon2[7]))
+
+def bench_times(rng):
+    print(f"\nGTFS time parsing ({N} pairs):")
+    dep = make_times(rng, N)
+    arr = make_times(rng, N)
+    
+    scalar, t_scalar = timed(lambda: [time_diff(a, b) for a, b in zip(dep, arr)])
+    vector, t_vector = timed(lambda: time_diffs(parse_gtfs_times(dep), parse_gtfs_times(arr)))
+    
+    print(f"  scalar: {t_scalar*1000:.1f} ms")
+    print(f"  vector: {t_vector*1000:.1f} ms ({t_scalar/t_vector:.0f}x)")
+    print(f"  mismatches: {int((np.array(scalar) != vector).sum())}")
+    assert all(parse_gtfs_times(dep[:100]) == [parse_gtfs_time(t) for t in dep[:100]])
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    bench_haversine(rng)
+    bench_times(rng)
\ No newline at end of file
@@ -0,0 +1,35 @@
+import random
+import time
+import numpy as np
+import sys
+sys.path.append('scripts')
+from routing.raptor import Timetable, earliest_arrival, range_query
+
+N_QUERIES = 200
+
+def bench_raptor(seed=0):
+    """Latency of earliest-arrival and one-hour range queries between random stations"""
+    tt = Timetable.load()
+    rng = random.Random(seed)
+    stations = list(tt.station_ids)
+    
+    for name, query in [
+        ('earliest arrival', lambda a, b, d: earliest_arrival(tt, a, b, d)),
+        ('range (1 hour)', lambda a, b, d: range_query(tt, a, b, d, d + 3600))
+    ]:
+        latencies = []
+        found = 0
+        for _ in range(N_QUERIES):
+            origin, destination = rng.sample(stations, 2)
+            departure = rng.randint(6 * 3600, 20 * 3600)
+            start = time.perf_counter()
+            result = query(origin, destination, departure)
+            latencies.append(time.perf_counter() - start)
+            found += bool(result)
+        
+        latencies = np.array(latencies) * 1000
+        print(f"{name}: {found}/{N_QUERIES} found, "
+              f"p50 {np.percentile(latencies, 50):.1f} ms, p99 {np.percentile(latencies, 99):.1f} ms")
+
+if __name__ == "__main__":
+    bench_raptor()
\ No newline at end of file
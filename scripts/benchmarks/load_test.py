@@ -0,0 +1,124 @@
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlencode
+import numpy as np
+import sys
+sys.path.append('scripts')
+from graph.storage import load_graph
+from routing.server import DEFAULT_PORT
+
+N_REQUESTS = 2000
+CONCURRENCY = 16
+
+# /health requests made after the run to reach every worker (connections land on any of them)
+PROBES = 64
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+    
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+def worker_memory(host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None, probes=PROBES):
+    """
+    pid → memory (RSS and private MB, see server.memory_usage) of every worker
+    reached by `probes` fresh connections to /health
+    """
+    memory = {}
+    for _ in range(probes):
+        connection = UnixHTTPConnection(unix_socket) if unix_socket else http.client.HTTPConnection(host, port)
+        connection.request('GET', '/health')
+        info = json.loads(connection.getresponse().read())
+        connection.close()
+        memory[info['pid']] = info.get('memory')
+    return memory
+
+def load_test(host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None, n_requests=N_REQUESTS,
+              concurrency=CONCURRENCY, batch=0, weight='time', seed=0):
+    """
+    Fire random route queries at a running server from `concurrency` keep-alive
+    connections; batch > 0 sends /batch requests of that many queries instead of /route
+    """
+    G = load_graph('data/processed/pt_graph.bin')
+    rng = random.Random(seed)
+    station_ids = list(G.station_ids)
+    pairs = [rng.sample(station_ids, 2) for _ in range(n_requests * max(batch, 1))]
+    
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    next_request = iter(range(n_requests))
+    
+    def worker():
+        connection = UnixHTTPConnection(unix_socket) if unix_socket else http.client.HTTPConnection(host, port)
+        while True:
+            with lock:
+                i = next(next_request, None)
+            if i is None:
+                break
+            
+            start = time.perf_counter()
+            if batch:
+                queries = [{'from': o, 'to': d, 'weight': weight} for o, d in pairs[i * batch:(i + 1) * batch]]
+                connection.request('POST', '/batch', json.dumps({'queries': queries}),
+                                   {'Content-Type': 'application/json'})
+            else:
+                origin, destination = pairs[i]
+                connection.request('GET', '/route?' + urlencode({'from': origin, 'to': destination, 'weight': weight}))
+            response = connection.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - start
+            
+            with lock:
+                latencies.append(elapsed)
+                if response.status != 200:
+                    errors.append(response.status)
+        connection.close()
+    
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    
+    queries = n_requests * max(batch, 1)
+    print(f"{n_requests} requests ({queries} routes) over {concurrency} connections in {wall:.1f}s")
+    print(f"  throughput: {n_requests / wall:.0f} req/s, {queries / wall:.0f} routes/s")
+    print(f"  latency: p50 {np.percentile(latencies, 50)*1000:.2f} ms, "
+          f"p99 {np.percentile(latencies, 99)*1000:.2f} ms, max {max(latencies)*1000:.2f} ms")
+    if errors:
+        print(f"  ⚠ {len(errors)} non-200 responses")
+    
+    # Private memory is what each extra worker costs; the rest of RSS is shared
+    memory = worker_memory(host, port, unix_socket)
+    print(f"  memory of {len(memory)} worker(s) reached:")
+    for pid, usage in sorted(memory.items()):
+        if usage is None:
+            print(f"    pid {pid}: not available on this platform")
+        else:
+            print(f"    pid {pid}: RSS {usage['rss_mb']:.0f} MB, private {usage['private_mb']:.0f} MB")
+
+if __name__ == "__main__":
+    # python scripts/benchmarks/load_test.py [--port 8080 | --unix PATH] [--requests N] [--concurrency C] [--batch B]
+    args = sys.argv[1:]
+    
+    def option(name, default=None):
+        return args[args.index(name) + 1] if name in args else default
+    
+    load_test(
+        port=int(option('--port', DEFAULT_PORT)),
+        unix_socket=option('--unix'),
+        n_requests=int(option('--requests', N_REQUESTS)),
+        concurrency=int(option('--concurrency', CONCURRENCY)),
+        batch=int(option('--batch', 0)),
+        weight=option('--weight', 'time')
+    )
@@ -1,25 +1,99 @@
+import numpy as np
 import pandas as pd
 import networkx as nx
 import pickle
+import sys
+import time
+sys.path.append('scripts')
+from utils.io import PROCESSED_DIR, read_table
+from graph.csr import CATEGORICAL_EDGE_ATTRS, SERVICE_EDGE_ATTRS, CSRGraph, pair_keys
+from graph.emissions import MODE_FACTORS, EmissionsModel, load_route_feeds
+from graph.storage import write_graph
 
-PROCESSED_DIR = "data/processed/"
+# Emissions factors by mode (kg CO2 per passenger-km); finer-grained factors
+# (per feed, route, time of day) come from an EmissionsModel (graph/emissions.py)
+EMISSIONS_FACTORS = MODE_FACTORS
 
-# Emissions factors (kg CO2 per passenger-km)
-# These are example values - use your team's actual model
-EMISSIONS_FACTORS = {
-    'train': 0.041,  # Electric trains are most efficient
-    'tram': 0.045,   # Electric trams
-    'bus': 0.089     # Diesel/hybrid buses
-}
+# Edge attributes, in the order build_graph sets them on every edge, followed by
+# the service statistics (trips, time_p90, headway) edges_merged has
+EDGE_COLUMNS = ['route_id', 'route_name', 'mode', 'distance', 'time', 'emissions_factor', 'emissions']
 
-def build_graph(save=True):
-    print("Building NetworkX graph...")
+def _service_columns(edges):
+    return [name for name in SERVICE_EDGE_ATTRS if name in edges.columns]
+
+def edge_table(edges, transfers=None, model=None):
+    """
+    Every graph edge as one row, with emissions_factor and emissions as columns
+    (service statistics are NaN on walking transfers)
+    model: EmissionsModel giving the factors (default: EMISSIONS_FACTORS by mode)
+    Walking transfers are appended where no PT edge already links the pair.
+    Rows are in the order build_graph adds them; a repeated pair updates the
+    earlier edge, as G.add_edge does.
+    """
+    edges = edges.copy()
+    columns = EDGE_COLUMNS + _service_columns(edges)
+    
+    if transfers is not None and len(transfers):
+        pt_pairs, walk_pairs = pair_keys(edges, transfers)
+        walks = transfers[~np.isin(walk_pairs, pt_pairs)]
+        walks = walks.drop_duplicates(subset=['from_station', 'to_station'], keep='first')
+        walks = walks[['from_station', 'to_station', 'distance', 'time']].assign(
+            route_id='walk', route_name='Walk', mode='walk'
+        )
+        print(f"  ✓ Adding {len(walks)} walking transfers")
+        edges = pd.concat([edges, walks], ignore_index=True)
+    
+    # Calculate emissions (kg CO2) for every edge at once
+    model = model or EmissionsModel()
+    feeds = edges['route_id'].map(load_route_feeds()) if model.needs_feeds() else None
+    edges['emissions_factor'] = model.factors(edges['mode'], edges['route_id'], feeds)
+    edges['emissions'] = (edges['distance'] / 1000) * edges['emissions_factor']  # Convert distance to km
     
+    return edges[['from_station', 'to_station'] + columns]
+
+def _records(df, columns):
+    """Rows of df as attribute dicts of plain Python values (much faster than to_dict on string columns)"""
+    values = [df[name].to_numpy(object).tolist() for name in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+def _build_bulk(stations, edges, transfers, networkx=True, model=None):
+    """
+    NetworkX graph and compact graph from whole columns, without per-row Python
+    networkx=False skips the NetworkX graph (returned as None); the compact
+    graph is built straight from the tables either way.
+    """
+    if not networkx:
+        table = edge_table(edges, transfers, model)
+        print(f"  Building compact graph from {len(stations)} stations and {len(table)} edges...")
+        return None, CSRGraph.from_tables(stations, table, EMISSIONS_FACTORS)
+    
+    G = nx.DiGraph()
+    
+    print(f"  Adding {len(stations)} nodes...")
+    node_attrs = pd.DataFrame({
+        'stop_name': stations['stop_name'],
+        'lat': stations['stop_lat'],
+        'lon': stations['stop_lon'],
+        'node_type': 'pt_stop'
+    })
+    G.add_nodes_from(zip(stations['station_id'].to_numpy(object).tolist(),
+                         _records(node_attrs, list(node_attrs.columns))))
+    print(f"  ✓ Added {G.number_of_nodes()} nodes")
+    
+    table = edge_table(edges, transfers, model)
+    print(f"  Adding {len(table)} edges...")
+    G.add_edges_from(zip(table['from_station'].to_numpy(object).tolist(),
+                         table['to_station'].to_numpy(object).tolist(),
+                         _records(table, list(table.columns[2:]))))
+    print(f"  ✓ Added {G.number_of_edges()} edges")
+    
+    return G, CSRGraph.from_tables(stations, table, EMISSIONS_FACTORS)
+
+def _build_rowwise(stations, edges, transfers):
+    """NetworkX graph one node and edge at a time, then the compact graph from it"""
     # Create directed graph (bidirectional)
     G = nx.DiGraph()
     
-    # Load stations (nodes)
-    stations = pd.read_csv(f'{PROCESSED_DIR}/stops_cleaned.csv')
     print(f"  Adding {len(stations)} nodes...")
     
     # Add nodes
@@ -33,10 +107,8 @@ def build_graph(save=True):
         )
     
     print(f"  ✓ Added {G.number_of_nodes()} nodes")
-    
-    # Load edges
-    edges = pd.read_csv(f'{PROCESSED_DIR}/edges_merged.csv')
     print(f"  Adding {len(edges)} edges...")
+    service = _service_columns(edges)
     
     # Add edges
     for _, edge in edges.iterrows():
@@ -53,11 +125,69 @@ def build_graph(save=True):
             distance=edge['distance'],  # meters
             time=edge['time'],          # seconds
             emissions_factor=emissions_factor,
-            emissions=emissions          # kg CO2 for this segment
+            emissions=emissions,         # kg CO2 for this segment
+            **{name: edge[name] for name in service}
         )
     
     print(f"  ✓ Added {G.number_of_edges()} edges")
     
+    # Walking transfers between nearby stations, where no PT edge already links them
+    if transfers is not None:
+        walks = 0
+        for edge in transfers.itertuples(index=False):
+            if G.has_edge(edge.from_station, edge.to_station):
+                continue
+            G.add_edge(
+                edge.from_station,
+                edge.to_station,
+                route_id='walk',
+                route_name='Walk',
+                mode='walk',
+                distance=edge.distance,
+                time=edge.time,
+                emissions_factor=EMISSIONS_FACTORS['walk'],
+                emissions=0.0,
+                **{name: np.nan for name in service}
+            )
+            walks += 1
+        print(f"  ✓ Added {walks} walking transfers")
+    
+    return G, CSRGraph.from_networkx(G)
+
+def _load_tables():
+    stations = read_table('stops_cleaned')
+    edges = read_table('edges_merged')
+    try:
+        transfers = read_table('transfers')
+    except FileNotFoundError:
+        transfers = None
+    return stations, edges, transfers
+
+def build_graph(save=True, bulk=True, networkx=True, model=None):
+    """
+    Build the NetworkX graph (pt_graph.gpickle) and its compact copy (pt_graph.bin)
+    bulk=False uses the original node-by-node/edge-by-edge construction, which
+    gives the same graphs far more slowly (see compare_builds).
+    networkx=False (bulk only) builds and saves just the compact graph and returns it.
+    model: EmissionsModel for the emissions attribute (bulk only; default by mode).
+    Other scenarios can be added to a built graph later (graph/emissions.py).
+    """
+    print("Building NetworkX graph..." if networkx else "Building compact graph...")
+    
+    # Load stations (nodes) and edges
+    stations, edges, transfers = _load_tables()
+    if bulk:
+        G, compact = _build_bulk(stations, edges, transfers, networkx, model)
+    else:
+        G, compact = _build_rowwise(stations, edges, transfers)
+    
+    if G is None:
+        if save:
+            compact_path = f'{PROCESSED_DIR}/pt_graph.bin'
+            write_graph(compact, compact_path)
+            print(f"✓ Compact graph saved to {compact_path}")
+        return compact
+    
     # Save graph
     if save:
         output_path = f'{PROCESSED_DIR}/pt_graph.gpickle'
@@ -65,8 +195,60 @@ def build_graph(save=True):
             pickle.dump(G, f, pickle.HIGHEST_PROTOCOL)
         
         print(f"\n✓ Graph saved to {output_path}")
+        
+        # Compact, memory-mappable copy of the same graph (see graph/storage.py)
+        compact_path = f'{PROCESSED_DIR}/pt_graph.bin'
+        write_graph(compact, compact_path)
+        print(f"✓ Compact graph saved to {compact_path}")
     
     return G
 
+def compare_builds():
+    """Build both ways without saving; time them and check the graphs are identical"""
+    stations, edges, transfers = _load_tables()
+    
+    builds = {
+        'row-wise': lambda: _build_rowwise(stations, edges, transfers),
+        'bulk': lambda: _build_bulk(stations, edges, transfers),
+        'bulk, compact only': lambda: _build_bulk(stations, edges, transfers, networkx=False)
+    }
+    results, timings = {}, {}
+    for name, build in builds.items():
+        start = time.perf_counter()
+        results[name] = build()
+        timings[name] = time.perf_counter() - start
+    
+    (G_row, compact_row), (G_bulk, compact_bulk) = results['row-wise'], results['bulk']
+    print()
+    for name, seconds in timings.items():
+        print(f"  {name}: {seconds:.2f}s ({timings['row-wise'] / seconds:.1f}x)")
+    
+    def same(a, b):
+        return a == b or (a != a and b != b)  # NaN == NaN
+    
+    def same_data(x, y):
+        return x.keys() == y.keys() and all(same(x[key], y[key]) for key in x)
+    
+    assert list(G_row.nodes) == list(G_bulk.nodes), "node order differs"
+    assert all(same_data(G_row.nodes[u], G_bulk.nodes[u]) for u in G_row.nodes), "node attributes differ"
+    assert list(G_row.edges) == list(G_bulk.edges), "edge order differs"
+    assert all(same_data(G_row.edges[e], G_bulk.edges[e]) for e in G_row.edges), "edge attributes differ"
+    
+    for compact in (compact_bulk, results['bulk, compact only'][1]):
+        assert list(compact_row.station_ids) == list(compact.station_ids), "station order differs"
+        assert np.array_equal(compact_row.indptr, compact.indptr)
+        assert np.array_equal(compact_row.indices, compact.indices)
+        for name, values in compact_row.edge_attrs.items():
+            if name in CATEGORICAL_EDGE_ATTRS:
+                decoded = [np.append(G.labels[name], None)[G.edge_attrs[name]] for G in (compact_row, compact)]
+                assert np.array_equal(*decoded), name
+            else:
+                assert np.array_equal(values, compact.edge_attrs[name], equal_nan=True), name
+    print("  ✓ Graphs are identical")
+
 if __name__ == "__main__":
-    build_graph()
\ No newline at end of file
+    # python scripts/build_graph/build_graph.py [--rowwise | --compact-only | --compare]
+    if '--compare' in sys.argv:
+        compare_builds()
+    else:
+        build_graph(bulk='--rowwise' not in sys.argv, networkx='--compact-only' not in sys.argv)
\ No newline at end of file
@@ -1,11 +1,14 @@
-import pandas as pd
+import os
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 sys.path.append('scripts')
-from utils.geo import haversine_distance
-from utils.time import parse_gtfs_time, time_diff
-from tqdm import tqdm
-
-PROCESSED_DIR = "data/processed/"
+from utils.geo import haversine_distances
+from utils.time import parse_gtfs_times, time_diffs
+from utils.io import PROCESSED_DIR, iter_table, read_table, write_table
 
 def get_mode_from_feed(feed_source, route_type):
     """
@@ -34,38 +37,31 @@ def get_mode_from_feed(feed_source, route_type):
         }
         return mode_map.get(route_type, 'bus')
 
-def create_edges():
-    print("Creating edges...")
+def load_lookups():
+    """
+    Per-trip attributes and stop lookups create_edges pairs stop_times against
+    Returns (trips indexed by trip_id with route_id/route_short_name/mode,
+    stop_id → station_id Series, stop_id-indexed stop_lat/stop_lon frame).
+    """
+    trips = read_table('trips')
+    routes = read_table('routes', columns=['route_id', 'route_type', 'feed_source'])
+    stop_map = read_table('stop_to_station_map')
+    stops_raw = read_table('stops_raw', columns=['stop_id', 'stop_lat', 'stop_lon'])
     
-    # Load data
-    print("  Loading stop_times...")
-    stop_times = pd.read_csv(f'{PROCESSED_DIR}/stop_times.csv', low_memory=False)
-    print("  Loading trips...")
-    trips = pd.read_csv(f'{PROCESSED_DIR}/trips.csv')
-    print("  Loading routes...")
-    routes = pd.read_csv(f'{PROCESSED_DIR}/routes.csv')
-    print("  Loading stops...")
-    stops = pd.read_csv(f'{PROCESSED_DIR}/stops_cleaned.csv')
-    stop_map = pd.read_csv(f'{PROCESSED_DIR}/stop_to_station_map.csv')
-    
-    print(f"  Loaded {len(stop_times)} stop_times")
-    
-    # Create lookup: stop_id → station_id
-    print("  Building lookups...")
-    stop_to_station = dict(zip(stop_map['stop_id'].astype(str), stop_map['station_id'].astype(str)))
-    
-    # Create lookup: stop_id → coords
-    stops_raw = pd.read_csv(f'{PROCESSED_DIR}/stops_raw.csv')
-    stop_coords = dict(zip(
-        stops_raw['stop_id'].astype(str), 
-        zip(stops_raw['stop_lat'], stops_raw['stop_lon'])
-    ))
+    # Lookups are indexed by stop_id string; like a dict, the last duplicate wins
+    stop_to_station = pd.Series(
+        stop_map['station_id'].astype(str).to_numpy(),
+        index=stop_map['stop_id'].astype(str)
+    )
+    stop_to_station = stop_to_station[~stop_to_station.index.duplicated(keep='last')]
     
-    # Convert stop_times stop_id to string for matching
-    stop_times['stop_id'] = stop_times['stop_id'].astype(str)
+    stop_coords = pd.DataFrame({
+        'stop_lat': stops_raw['stop_lat'].to_numpy(),
+        'stop_lon': stops_raw['stop_lon'].to_numpy()
+    }, index=stops_raw['stop_id'].astype(str))
+    stop_coords = stop_coords[~stop_coords.index.duplicated(keep='last')]
     
     # Merge trips with routes to get route_type and feed_source
-    print("  Merging trips with routes...")
     trips = trips.merge(
         routes[['route_id', 'route_type', 'feed_source']], 
         on='route_id', 
@@ -78,11 +74,31 @@ def create_edges():
         trips['route_type'] = trips['route_type_from_routes'].fillna(trips['route_type'])
         trips = trips.drop(columns=['route_type_from_routes'])
     
-    # Create trip info dictionary for fast lookup
-    trip_info_dict = trips.set_index('trip_id').to_dict('index')
+    # Per-trip attributes, with the same defaults as a missing dict key
+    if 'route_type' not in trips.columns:
+        trips['route_type'] = 3
+    if 'route_short_name' not in trips.columns:
+        trips['route_short_name'] = 'Unknown'
+    if 'feed_source' not in trips.columns:
+        trips['feed_source'] = ''
     
-    edges = []
-    skipped = 0
+    # Determine mode from feed source (more reliable than route_type),
+    # once per distinct (feed_source, route_type) rather than once per trip
+    combos = trips[['feed_source', 'route_type']].drop_duplicates()
+    combos['mode'] = [
+        get_mode_from_feed(feed_source, route_type)
+        for feed_source, route_type in combos.itertuples(index=False)
+    ]
+    trips = trips.merge(combos, on=['feed_source', 'route_type'], how='left')
+    trips = trips.set_index('trip_id')
+    
+    return trips, stop_to_station, stop_coords
+
+def pair_stop_times(stop_times, trips, stop_to_station, stop_coords):
+    """
+    Edges between consecutive stops of every trip in stop_times
+    Returns (edges DataFrame, skipped_reasons counts, number of stop pairs, number of trips).
+    """
     skipped_reasons = {
         'missing_station': 0,
         'missing_coords': 0,
@@ -92,113 +108,254 @@ def create_edges():
         'missing_trip_info': 0
     }
     
-    # Group by trip
-    print("  Processing trips...")
-    grouped = stop_times.groupby('trip_id')
-    total_trips = len(grouped)
+    # Convert stop_times stop_id to string for matching
+    stop_times = stop_times[stop_times['trip_id'].notna()]
+    stop_times = stop_times.assign(stop_id=stop_times['stop_id'].astype(str))
+    
+    # Sort once so consecutive rows of a trip are consecutive stops
+    stop_times = stop_times.sort_values(['trip_id', 'stop_sequence'], kind='mergesort')
+    
+    trip_ids = stop_times['trip_id'].to_numpy()
+    stop_ids = stop_times['stop_id'].to_numpy()
+    
+    # Pair i joins row i to row i+1 whenever both rows belong to the same trip
+    same_trip = trip_ids[1:] == trip_ids[:-1]
+    from_rows = np.flatnonzero(same_trip)
+    to_rows = from_rows + 1
+    pair_trips = trip_ids[from_rows]
+    
+    # Get trip info
+    trip_rows = trips.index.get_indexer(pair_trips)
+    keep = trip_rows >= 0
+    skipped_reasons['missing_trip_info'] = int((~keep).sum())
+    
+    # Map to station_id
+    from_station = stop_to_station.reindex(stop_ids[from_rows]).to_numpy()
+    to_station = stop_to_station.reindex(stop_ids[to_rows]).to_numpy()
+    
+    missing_station = keep & (pd.isna(from_station) | pd.isna(to_station))
+    skipped_reasons['missing_station'] = int(missing_station.sum())
+    keep &= ~missing_station
     
-    # Process with progress bar
-    for trip_id, group in tqdm(grouped, total=total_trips, desc="  Creating edges"):
-        # Sort by stop_sequence
-        group = group.sort_values('stop_sequence')
+    # Skip self-loops
+    self_loop = keep & (from_station == to_station)
+    skipped_reasons['self_loop'] = int(self_loop.sum())
+    keep &= ~self_loop
+    
+    # Get coordinates
+    from_coord_rows = stop_coords.index.get_indexer(stop_ids[from_rows])
+    to_coord_rows = stop_coords.index.get_indexer(stop_ids[to_rows])
+    
+    missing_coords = keep & ((from_coord_rows < 0) | (to_coord_rows < 0))
+    skipped_reasons['missing_coords'] = int(missing_coords.sum())
+    keep &= ~missing_coords
+    
+    # Calculate time (seconds)
+    dep_times = parse_gtfs_times(stop_times['departure_time'].to_numpy()[from_rows])
+    arr_times = parse_gtfs_times(stop_times['arrival_time'].to_numpy()[to_rows])
+    travel_time = time_diffs(dep_times, arr_times)
+    
+    # Skip edges with unreasonable times (> 2 hours or <= 0)
+    bad_time = keep & ((travel_time > 7200) | (travel_time <= 0))
+    skipped_reasons['bad_time'] = int(bad_time.sum())
+    keep &= ~bad_time
+    
+    # Calculate distance (meters); unmatched rows are masked out by keep
+    lats = stop_coords['stop_lat'].to_numpy()
+    lons = stop_coords['stop_lon'].to_numpy()
+    distance = np.full(len(from_rows), np.nan)
+    distance[keep] = haversine_distances(
+        lats[from_coord_rows[keep]], lons[from_coord_rows[keep]],
+        lats[to_coord_rows[keep]], lons[to_coord_rows[keep]]
+    )
+    
+    # Skip edges with zero/negative distance
+    bad_distance = keep & (distance <= 0)
+    skipped_reasons['bad_distance'] = int(bad_distance.sum())
+    keep &= ~bad_distance
+    
+    trip_rows = trip_rows[keep]
+    edges_df = pd.DataFrame({
+        'from_station': from_station[keep],
+        'to_station': to_station[keep],
+        'route_id': trips['route_id'].to_numpy()[trip_rows],
+        'route_name': trips['route_short_name'].to_numpy()[trip_rows],
+        'mode': trips['mode'].to_numpy()[trip_rows],
+        'time': travel_time[keep],
+        'distance': distance[keep],
+        'departure': dep_times[keep],   # seconds since midnight at from_station
+        'trip_id': pair_trips[keep]
+    })
+    
+    return edges_df, skipped_reasons, len(from_rows), pd.unique(trip_ids).size
+
+# stop_times columns edges are built from
+STOP_TIME_COLUMNS = ['trip_id', 'stop_id', 'stop_sequence', 'arrival_time', 'departure_time']
+
+def _feed_filter(feeds):
+    return [('feed_source', 'in', list(feeds))] if feeds is not None else None
+
+def trip_buckets(trip_ids, n_shards):
+    """Shard of each trip_id: a stable hash, the same in every process and run"""
+    return pd.util.hash_array(trip_ids.astype(str).to_numpy(dtype=object)) % np.uint64(n_shards)
+
+def _partition(shards, shard_by, feeds, out_dir):
+    """
+    Split stop_times into per-shard files in out_dir, streaming it in batches so
+    only one batch is in memory, and write each shard the lookups for its own
+    trips and stops. Returns {shard: (stop_times paths, lookups path)}.
+    """
+    paths = {shard: [] for shard in shards}
+    shard_trips = {shard: [] for shard in shards}
+    shard_stops = {shard: [] for shard in shards}
+    
+    for b, batch in enumerate(iter_table('stop_times', columns=STOP_TIME_COLUMNS + ['feed_source'])):
+        feed_source = batch['feed_source'].astype(str)
+        if feeds is not None:
+            keep = feed_source.isin(list(feeds)).to_numpy()
+            batch, feed_source = batch[keep], feed_source[keep]
+        if shard_by == 'trip':
+            keys = trip_buckets(batch['trip_id'], len(shards))
+        else:
+            keys = feed_source.to_numpy()
         
-        # Get trip info
-        if trip_id not in trip_info_dict:
-            skipped += len(group) - 1
-            skipped_reasons['missing_trip_info'] += len(group) - 1
-            continue
-            
-        trip_info = trip_info_dict[trip_id]
-        route_id = trip_info['route_id']
-        route_type = trip_info.get('route_type', 3)
-        route_name = trip_info.get('route_short_name', 'Unknown')
-        feed_source = trip_info.get('feed_source', '')
+        # Each shard keeps its rows in stored order, so pairing sees the same order as one process
+        for shard, rows in pd.Series(np.arange(len(batch))).groupby(keys, sort=False):
+            if shard not in paths:
+                continue
+            part = batch.iloc[rows.to_numpy()][STOP_TIME_COLUMNS]
+            path = os.path.join(out_dir, f'stop_times_{shard}_{b}.pkl')
+            part.to_pickle(path)
+            paths[shard].append(path)
+            shard_trips[shard].append(pd.unique(part['trip_id'].astype(str)))
+            shard_stops[shard].append(pd.unique(part['stop_id'].astype(str)))
+    
+    trips, stop_to_station, stop_coords = load_lookups()
+    trip_index = trips.index.astype(str)
+    lookups = {}
+    for shard in shards:
+        trip_ids = np.concatenate(shard_trips[shard]) if shard_trips[shard] else []
+        stop_ids = np.concatenate(shard_stops[shard]) if shard_stops[shard] else []
+        path = os.path.join(out_dir, f'lookups_{shard}.pkl')
+        pd.to_pickle((
+            trips[trip_index.isin(trip_ids)],
+            stop_to_station[stop_to_station.index.isin(stop_ids)],
+            stop_coords[stop_coords.index.isin(stop_ids)]
+        ), path)
+        lookups[shard] = (paths[shard], path)
+    return lookups
+
+def _build_shard(shard, paths, lookups_path, out_dir):
+    """
+    Pair one shard of stop_times (written by _partition) in a worker process
+    and write its edges to out_dir. Returns (partial path, skipped_reasons, pairs, trips).
+    """
+    if paths:
+        stop_times = pd.concat([pd.read_pickle(path) for path in paths], ignore_index=True)
+    else:
+        stop_times = pd.DataFrame({name: pd.Series(dtype=object) for name in STOP_TIME_COLUMNS})
+    edges_df, skipped_reasons, n_pairs, n_trips = pair_stop_times(stop_times, *pd.read_pickle(lookups_path))
+    
+    # Pickle rather than the table store, so dtypes survive the round trip exactly
+    path = os.path.join(out_dir, f'edges_{shard}.pkl')
+    edges_df.to_pickle(path)
+    return path, skipped_reasons, n_pairs, n_trips
+
+def _shards(feeds, shard_by, workers):
+    """Shard keys for _build_shard; falls back to trip hashing if a trip_id spans feeds"""
+    if shard_by == 'trip':
+        return list(range(workers)), 'trip'
+    if shard_by != 'feed':
+        raise ValueError(f"Unknown shard_by '{shard_by}' (expected 'feed' or 'trip')")
+    
+    stop_times = read_table('stop_times', columns=['trip_id', 'feed_source'], filters=_feed_filter(feeds))
+    stop_times = stop_times[stop_times['trip_id'].notna()]
+    feed_source = stop_times['feed_source'].astype(str)
+    
+    # Pairs would cross feeds where the single-process run sorts them together
+    if (feed_source.groupby(stop_times['trip_id']).nunique() > 1).any():
+        print("  ⚠ trip_ids shared between feeds, sharding by trip instead")
+        return list(range(workers)), 'trip'
+    return sorted(pd.unique(feed_source)), 'feed'
+
+def create_edges(feeds=None, save=True, workers=1, shard_by='trip'):
+    """
+    Build edges_raw from consecutive stops of every trip
+    feeds: only pair stop_times from these feed_source values (used by the
+    pipeline runner to rebuild a single changed feed); trips, routes and the
+    stop lookups are always loaded in full.
+    workers: processes to shard the work over (default 1: in this process).
+    shard_by='trip' splits stop_times by trip_id hash into one shard per
+    worker, 'feed' into one shard per feed_source. stop_times is partitioned
+    once, in batches, and each worker loads only its shard and the lookups for
+    its trips and stops. Trips never span shards, so the merged output is
+    identical to a single-process run.
+    """
+    print("Creating edges...")
+    
+    if workers == 1:
+        # Load data
+        print("  Loading stop_times...")
+        stop_times = read_table('stop_times', columns=STOP_TIME_COLUMNS, filters=_feed_filter(feeds))
+        print(f"  Loaded {len(stop_times)} stop_times")
+        print("  Loading trips, routes and stops...")
+        lookups = load_lookups()
         
-        # Determine mode from feed source (more reliable than route_type)
-        mode = get_mode_from_feed(feed_source, route_type)
+        print("  Pairing consecutive stops...")
+        edges_df, skipped_reasons, n_pairs, n_trips = pair_stop_times(stop_times, *lookups)
+    else:
+        shards, shard_by = _shards(feeds, shard_by, workers)
+        print(f"  Pairing consecutive stops in {len(shards)} {shard_by} shards over {min(workers, len(shards))} processes...")
         
-        # Create edges between consecutive stops
-        for i in range(len(group) - 1):
-            from_stop = str(group.iloc[i]['stop_id'])
-            to_stop = str(group.iloc[i+1]['stop_id'])
-            
-            # Map to station_id
-            from_station = stop_to_station.get(from_stop)
-            to_station = stop_to_station.get(to_stop)
-            
-            if not from_station or not to_station:
-                skipped += 1
-                skipped_reasons['missing_station'] += 1
-                continue
-            
-            # Skip self-loops
-            if from_station == to_station:
-                skipped += 1
-                skipped_reasons['self_loop'] += 1
-                continue
+        out_dir = tempfile.mkdtemp(prefix='edges_shards_', dir=PROCESSED_DIR)
+        try:
+            inputs = _partition(shards, shard_by, feeds, out_dir)
+            with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+                futures = [
+                    pool.submit(_build_shard, shard, *inputs[shard], out_dir)
+                    for shard in shards
+                ]
+                results = [future.result() for future in futures]
             
-            # Get coordinates
-            from_coords = stop_coords.get(from_stop)
-            to_coords = stop_coords.get(to_stop)
-            
-            if not from_coords or not to_coords:
-                skipped += 1
-                skipped_reasons['missing_coords'] += 1
-                continue
-            
-            # Calculate time (seconds)
-            dep_time = group.iloc[i]['departure_time']
-            arr_time = group.iloc[i+1]['arrival_time']
-            travel_time = time_diff(dep_time, arr_time)
-            
-            # Skip edges with unreasonable times (> 2 hours or <= 0)
-            if travel_time > 7200 or travel_time <= 0:
-                skipped += 1
-                skipped_reasons['bad_time'] += 1
-                continue
-            
-            # Calculate distance (meters)
-            distance = haversine_distance(
-                from_coords[0], from_coords[1],
-                to_coords[0], to_coords[1]
-            )
-            
-            # Skip edges with zero/negative distance
-            if distance <= 0:
-                skipped += 1
-                skipped_reasons['bad_distance'] += 1
-                continue
-            
-            # Create edge record
-            edges.append({
-                'from_station': from_station,
-                'to_station': to_station,
-                'route_id': route_id,
-                'route_name': route_name,
-                'mode': mode,
-                'time': travel_time,
-                'distance': distance,
-                'trip_id': trip_id
-            })
-    
-    print(f"\n  Created {len(edges)} edges (skipped {skipped})")
+            # Merge in shard order; a stable sort on trip_id then restores the
+            # single-process order, since each trip's rows sit in one shard, in order
+            parts = [pd.read_pickle(path) for path, _, _, _ in results]
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+        
+        edges_df = pd.concat(parts, ignore_index=True)
+        edges_df = edges_df.sort_values('trip_id', kind='mergesort').reset_index(drop=True)
+        
+        skipped_reasons = {reason: sum(r[1][reason] for r in results) for reason in results[0][1]}
+        n_pairs = sum(r[2] for r in results)
+        n_trips = sum(r[3] for r in results)
+    
+    print(f"  {n_pairs} consecutive stop pairs across {n_trips} trips")
+    skipped = sum(skipped_reasons.values())
+    
+    print(f"\n  Created {len(edges_df)} edges (skipped {skipped})")
     print(f"  Skipped breakdown:")
     for reason, count in skipped_reasons.items():
         if count > 0:
             print(f"    - {reason}: {count}")
     
-    # Save
-    print("  Saving edges...")
-    edges_df = pd.DataFrame(edges)
-    
     # Show mode distribution
     print(f"\n  Mode distribution:")
     print(edges_df['mode'].value_counts())
     
-    edges_df.to_csv(f'{PROCESSED_DIR}/edges_raw.csv', index=False)
-    print(f"  ✓ Saved to edges_raw.csv")
+    # Save
+    if save:
+        print("  Saving edges...")
+        write_table(edges_df, 'edges_raw')
+        print(f"  ✓ Saved edges_raw")
     
     return edges_df
 
 if __name__ == "__main__":
-    create_edges()
\ No newline at end of file
+    # python scripts/build_graph/edges.py [--workers N] [--by trip|feed]
+    args = sys.argv[1:]
+    
+    def option(name, default=None):
+        return args[args.index(name) + 1] if name in args else default
+    
+    create_edges(workers=int(option('--workers', 1)), shard_by=option('--by', 'trip'))
\ No newline at end of file
@@ -1,26 +1,236 @@
+import numpy as np
 import pandas as pd
+import sys
+sys.path.append('scripts')
+from utils.io import BATCH_ROWS, iter_table, write_table
 
-PROCESSED_DIR = "data/processed/"
+# Observations are counted under packed int64 keys: edge number in the high
+# bits, travel time / departure (whole seconds) in the low bits. Edges are
+# themselves numbered by (from_station, to_station, route_id) codes of CODE_BITS each.
+CODE_BITS = 21         # up to ~2M stations and routes
+TIME_BITS = 16         # travel times are at most 7200 s (edges.py)
+DEPARTURE_BITS = 20    # departures up to ~290 h past midnight
 
-def merge_edges():
+# Partial counts are re-combined once they grow past this many rows, so memory
+# follows the number of distinct (edge, time) values rather than raw edges
+COMPACT_ROWS = 5_000_000
+
+def _check_fits(values, bits, what, constant):
+    """ValueError unless every value fits the unsigned bits-wide field it is packed into"""
+    if len(values) and (values.min() < 0 or values.max() >= 1 << bits):
+        raise ValueError(f"{what} {values.min()}..{values.max()} do not fit {constant}={bits} "
+                         f"(0..{(1 << bits) - 1}); raise {constant} in merge.py")
+
+class _Codes:
+    """Dense integer codes for labels, assigned in order of first appearance"""
+    
+    def __init__(self):
+        self.labels = pd.Index([], dtype=object)
+    
+    def __len__(self):
+        return len(self.labels)
+    
+    def encode(self, values):
+        # Look up each distinct value of the batch once
+        local, uniques = pd.factorize(values)
+        codes = self.labels.get_indexer(uniques)
+        missing = codes < 0
+        if missing.any():
+            self.labels = self.labels.append(pd.Index(uniques[missing], dtype=object))
+            codes[missing] = np.arange(len(self.labels) - missing.sum(), len(self.labels))
+        return codes.astype(np.int64)[local]
+
+class _Counts:
+    """Counts of packed keys, accumulated batch by batch"""
+    
+    def __init__(self, distinct=False):
+        self.distinct = distinct   # only record which keys occur
+        self.keys = []
+        self.counts = []
+        self.rows = 0
+    
+    def add(self, keys):
+        keys, counts = np.unique(keys, return_counts=True)
+        self.keys.append(keys)
+        self.counts.append(counts)
+        self.rows += len(keys)
+        if self.rows > COMPACT_ROWS:
+            keys, counts = self.result()
+            self.keys, self.counts, self.rows = [keys], [counts], len(keys)
+    
+    def result(self):
+        """(sorted distinct keys, counts)"""
+        if not self.keys:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        keys, inverse = np.unique(np.concatenate(self.keys), return_inverse=True)
+        if self.distinct:
+            return keys, np.ones(len(keys), np.int64)
+        return keys, np.bincount(inverse, weights=np.concatenate(self.counts)).astype(np.int64)
+
+def _regroup(keys, counts, groups, bits):
+    """Re-key packed (edge, value) counts to (groups[edge], value), summing counts"""
+    mask = (1 << bits) - 1
+    keys, inverse = np.unique((groups[keys >> bits] << bits) | (keys & mask), return_inverse=True)
+    return keys, np.bincount(inverse, weights=counts).astype(np.int64)
+
+def _group_bounds(groups):
+    if not len(groups):
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    return starts, np.r_[starts[1:], len(groups)]
+
+def _grouped_quantiles(groups, values, counts, q):
+    """
+    Quantile q of each group of a weighted sample, as np.percentile would give
+    on the expanded sample (linear interpolation)
+    groups: group number of each row, ascending; values: sorted within each
+    group; counts: how often each value occurs.
+    """
+    cum = np.cumsum(counts)
+    starts, ends = _group_bounds(groups)
+    base = np.r_[0, cum][starts]
+    n = cum[ends - 1] - base
+    
+    h = (n - 1) * q
+    lo = np.floor(h).astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+    # The k-th sample of a group is in the first row whose running count exceeds k
+    x_lo = values[np.searchsorted(cum, base + lo, side='right')]
+    x_hi = values[np.searchsorted(cum, base + hi, side='right')]
+    return x_lo + (h - lo) * (x_hi - x_lo)
+
+def _edge_stats(times, departures):
+    """
+    trips, time (median), time_p90 and, given departures, first/last departure
+    and mean headway for every group (edge number), as a dict of columns
+    times: (packed keys, counts); departures: distinct packed keys or None
+    """
+    keys, counts = times
+    groups = keys >> TIME_BITS
+    values = (keys & ((1 << TIME_BITS) - 1)).astype(np.float64)
+    starts, ends = _group_bounds(groups)
+    
+    stats = {
+        'trips': np.add.reduceat(counts, starts).astype(np.int32),
+        'time': _grouped_quantiles(groups, values, counts, 0.5).astype(np.float32),
+        'time_p90': _grouped_quantiles(groups, values, counts, 0.9).astype(np.float32)
+    }
+    
+    if departures is not None:
+        # Distinct departure times, so trips repeated on several service days count once;
+        # every group with a travel time also has a departure
+        keys = departures
+        values = keys & ((1 << DEPARTURE_BITS) - 1)
+        starts, ends = _group_bounds(keys >> DEPARTURE_BITS)
+        first, last = values[starts], values[ends - 1]
+        gaps = ends - starts - 1
+        
+        stats['first_departure'] = first.astype(np.int32)
+        stats['last_departure'] = last.astype(np.int32)
+        # Mean gap between departures over the service span; expected wait is about half
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stats['headway'] = np.where(gaps > 0, (last - first) / gaps, np.nan).astype(np.float32)
+    
+    return stats
+
+def merge_edges(batch_size=BATCH_ROWS):
+    """
+    Aggregate edges_raw into one row per station pair (edges_merged) and one per
+    station pair and route (edge_stats), streaming edges_raw in batches
+    Both carry trips, median (time) and 90th percentile (time_p90) travel time,
+    first/last departure and mean headway in seconds. In edges_merged, route_id,
+    route_name, mode and distance are those of the route with the most trips,
+    and the other statistics are over every route on the pair.
+    """
     print("Merging duplicate edges...")
     
-    # Load raw edges
-    edges = pd.read_csv(f'{PROCESSED_DIR}/edges_raw.csv')
-    print(f"  Loaded {len(edges)} raw edges")
+    stations, routes, edges = _Codes(), _Codes(), _Codes()
+    route_info = []
+    times = _Counts()
+    departures = _Counts(distinct=True)
+    distance_sum = np.zeros(0)
+    has_departures = True
+    n_raw = 0
+    
+    for batch in iter_table('edges_raw', batch_size=batch_size):
+        n_raw += len(batch)
+        has_departures &= 'departure' in batch.columns
+        
+        # Edge number of each row: one per (from_station, to_station, route_id)
+        n_routes = len(routes)
+        from_code = stations.encode(batch['from_station'].astype(str))
+        to_code = stations.encode(batch['to_station'].astype(str))
+        route_code = routes.encode(batch['route_id'].astype(str))
+        # Wrong packing would silently merge unrelated edges, so refuse instead
+        if max(len(stations), len(routes)) > 1 << CODE_BITS:
+            raise ValueError(f"{len(stations)} stations and {len(routes)} routes do not fit CODE_BITS={CODE_BITS} "
+                             f"({1 << CODE_BITS} codes each); raise CODE_BITS in merge.py")
+        edge = edges.encode((from_code << (2 * CODE_BITS)) | (to_code << CODE_BITS) | route_code)
+        
+        new_routes = route_code >= n_routes
+        if new_routes.any():
+            info = batch.loc[new_routes, ['route_name', 'mode']].assign(route=route_code[new_routes])
+            route_info.append(info.drop_duplicates('route'))
+        
+        time = batch['time'].to_numpy().astype(np.int64)
+        _check_fits(time, TIME_BITS, 'travel times (s)', 'TIME_BITS')
+        times.add((edge << TIME_BITS) | time)
+        if has_departures:
+            departure = batch['departure'].to_numpy().astype(np.int64)
+            _check_fits(departure, DEPARTURE_BITS, 'departures (s)', 'DEPARTURE_BITS')
+            departures.add((edge << DEPARTURE_BITS) | departure)
+        
+        distance_sum = np.pad(distance_sum, (0, len(edges) - len(distance_sum)))
+        distance_sum += np.bincount(edge, weights=batch['distance'].to_numpy(np.float64), minlength=len(edges))
+    
+    print(f"  Streamed {n_raw} raw edges")
+    if not has_departures:
+        print("  ⚠ edges_raw has no departure column (rerun edges); skipping service span and headway")
+    
+    times = times.result()
+    departure_keys = departures.result()[0] if has_departures else None
+    
+    # Per station pair and route
+    edge_keys = edges.labels.to_numpy(np.int64)
+    mask = (1 << CODE_BITS) - 1
+    route_stats = pd.DataFrame({
+        'from_station': stations.labels[edge_keys >> (2 * CODE_BITS)],
+        'to_station': stations.labels[(edge_keys >> CODE_BITS) & mask],
+        'route': edge_keys & mask
+    })
+    # No batches (empty edges_raw) leave no route rows to concatenate
+    route_info = pd.concat(route_info or [pd.DataFrame(columns=['route_name', 'mode', 'route'])], ignore_index=True)
+    route_info = route_info.drop_duplicates('route').set_index('route')
+    route_stats['route_id'] = routes.labels[route_stats['route']]
+    route_stats['route_name'] = route_info['route_name'].reindex(route_stats['route']).to_numpy()
+    route_stats['mode'] = route_info['mode'].reindex(route_stats['route']).to_numpy()
+    stats = _edge_stats(times, departure_keys)
+    for name, values in stats.items():
+        route_stats[name] = values
+    route_stats['distance'] = distance_sum / route_stats['trips'].to_numpy()
     
-    # Sort by trip_id to ensure consistent "first occurrence"
-    edges = edges.sort_values('trip_id')
+    # Per station pair, over every route that serves it
+    pair = pd.factorize(edge_keys >> CODE_BITS)[0].astype(np.int64)
+    pair_times = _regroup(*times, pair, TIME_BITS)
+    pair_departures = None
+    if has_departures:
+        pair_departures = _regroup(departure_keys, np.ones(len(departure_keys)), pair, DEPARTURE_BITS)[0]
+    merged = pd.DataFrame(_edge_stats(pair_times, pair_departures))
     
-    # Group by station pairs and keep first
-    # This keeps the first edge encountered for each (from_station, to_station) pair
-    merged = edges.groupby(['from_station', 'to_station']).first().reset_index()
+    # Route, mode and distance from the busiest route (ties: first route_id)
+    busiest = route_stats.assign(pair=pair).sort_values(['trips', 'route_id'], ascending=[False, True], kind='mergesort')
+    busiest = busiest.drop_duplicates('pair').set_index('pair').sort_index()
+    for name in ['from_station', 'to_station', 'route_id', 'route_name', 'mode', 'distance']:
+        merged[name] = busiest[name].to_numpy()
     
-    # Drop trip_id column (no longer needed)
-    merged = merged.drop(columns=['trip_id'])
+    stat_columns = ['trips', 'time_p90'] + (['first_departure', 'last_departure', 'headway'] if has_departures else [])
+    merged = merged[['from_station', 'to_station', 'route_id', 'route_name', 'mode', 'time', 'distance'] + stat_columns]
+    merged = merged.sort_values(['from_station', 'to_station'], kind='mergesort', ignore_index=True)
+    route_stats = route_stats[['from_station', 'to_station', 'route_id', 'route_name', 'mode', 'time', 'distance'] + stat_columns]
+    route_stats = route_stats.sort_values(['from_station', 'to_station', 'route_id'], kind='mergesort', ignore_index=True)
     
-    print(f"  ✓ Reduced to {len(merged)} unique edges")
-    print(f"  Removed {len(edges) - len(merged)} duplicates")
+    print(f"  ✓ Reduced to {len(merged)} unique edges ({len(route_stats)} station pair/route combinations)")
+    print(f"  Removed {n_raw - len(merged)} duplicates")
     
     # Check for issues
     zero_time = len(merged[merged['time'] == 0])
@@ -32,16 +242,20 @@ def merge_edges():
         print(f"  ⚠ Warning: {zero_distance} edges have zero distance")
     
     # Save
-    merged.to_csv(f'{PROCESSED_DIR}/edges_merged.csv', index=False)
-    print(f"  ✓ Saved to edges_merged.csv")
+    write_table(merged, 'edges_merged')
+    write_table(route_stats, 'edge_stats')
+    print(f"  ✓ Saved edges_merged and edge_stats")
     
     # Print some stats
     print(f"\n  Edge Statistics:")
     print(f"    Average time: {merged['time'].mean():.1f} seconds")
     print(f"    Average distance: {merged['distance'].mean():.1f} meters")
+    print(f"    Median trips per edge: {merged['trips'].median():.0f}")
+    if has_departures:
+        print(f"    Median headway: {merged['headway'].median():.0f} seconds")
     print(f"    Modes: {merged['mode'].value_counts().to_dict()}")
     
     return merged
 
 if __name__ == "__main__":
-    merge_edges()
\ No newline at end of file
+    merge_edges()
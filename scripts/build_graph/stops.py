@@ -1,9 +1,12 @@
+import numpy as np
 import pandas as pd
 import sys
 sys.path.append('scripts')
+from graph.components import connected_components
+from graph.names import tokenize
 from utils.geo import is_in_melbourne
-
-PROCESSED_DIR = "data/processed/"
+from utils.io import read_table, write_table
+from utils.spatial import GridIndex
 
 MELBOURNE_BOUNDS = {
     'lat_min': -38.5,
@@ -12,11 +15,58 @@ MELBOURNE_BOUNDS = {
     'lon_max': 145.5
 }
 
-def process_stops():
+# Station clustering rules
+#   platforms: stops with a parent_station belong to the parent's station
+#   same_name_radius: also merge stations with the same (normalized) name
+#       within this many metres, e.g. bus stops on either side of a road; 0 = off
+CLUSTER_RULES = {
+    'platforms': True,
+    'same_name_radius': 0
+}
+
+def resolve_stations(stops, platforms=True):
+    """
+    station_id for each stop: parent stations (location_type=1) are their own
+    station, other stops join their parent_station if they have one
+    """
+    station_id = stops['stop_id'].copy()
+    if platforms:
+        has_parent = (stops['location_type'] != 1) & stops['parent_station'].notna()
+        station_id[has_parent] = stops.loc[has_parent, 'parent_station']
+    return station_id
+
+def _first_per_station(stops):
+    """One row per station_id (sorted), with the first non-null name and coordinates of its stops"""
+    stations = stops.groupby('station_id')[['stop_name', 'stop_lat', 'stop_lon']].first().reset_index()
+    return stations[['station_id', 'stop_name', 'stop_lat', 'stop_lon']]
+
+def merge_same_name(stations, radius):
+    """
+    {station_id: merged station_id} joining stations with the same normalized
+    name (abbreviations expanded) within radius metres of one another,
+    transitively. Each group takes the station_id that sorts first.
+    """
+    codes, uniques = pd.factorize(stations['stop_name'])
+    names = np.array([' '.join(tokenize(name)) for name in uniques] + [''], dtype=object)[codes]
+    index = GridIndex(stations['stop_lat'].to_numpy(), stations['stop_lon'].to_numpy())
+    i, j, _ = index.pairs_within(radius)
+    same = (names[i] == names[j]) & (names[i] != '')
+    
+    # stations is sorted by station_id, so the smallest index is the first id
+    labels = connected_components(len(stations), i[same], j[same])
+    station_ids = stations['station_id'].to_numpy()
+    return dict(zip(station_ids, station_ids[labels]))
+
+def process_stops(rules=None):
+    """
+    Filter stops_raw and cluster stops into stations (see CLUSTER_RULES)
+    rules: overrides for CLUSTER_RULES
+    """
+    rules = dict(CLUSTER_RULES, **(rules or {}))
     print("Processing stops...")
     
     # Load raw stops
-    stops = pd.read_csv(f'{PROCESSED_DIR}/stops_raw.csv')
+    stops = read_table('stops_raw')
     print(f"  Loaded {len(stops)} raw stops")
     
     # CHANGE: Keep both regular stops (location_type=0) AND parent stations (location_type=1)
@@ -46,40 +96,40 @@ def process_stops():
     ]
     print(f"  {len(stops)} after filtering to Melbourne")
     
-    # For parent stations (location_type=1), use stop_id as station_id
-    # For regular stops (location_type=0), group by parent_station if it exists
-    stops['station_id'] = stops.apply(
-        lambda row: row['stop_id'] if row['location_type'] == 1 
-                    else (row['parent_station'] if pd.notna(row['parent_station']) else row['stop_id']),
-        axis=1
-    )
+    stops['station_id'] = resolve_stations(stops, rules['platforms'])
     
     # Create mapping: ALL stop_ids → station_id (for both platforms and parent stations)
-    stop_to_station_map = stops[['stop_id', 'station_id']].copy()
-    
-    # For parent stations, also map them to themselves
-    # This handles cases where stop_times references parent station directly
-    parent_stations = stops[stops['location_type'] == 1][['stop_id']].copy()
-    parent_stations['station_id'] = parent_stations['stop_id']
-    stop_to_station_map = pd.concat([stop_to_station_map, parent_stations], ignore_index=True)
-    
-    # Remove duplicates (keep first)
-    stop_to_station_map = stop_to_station_map.drop_duplicates(subset=['stop_id'], keep='first')
+    # Parent stations already map to themselves; first occurrence of a stop_id wins
+    stop_to_station_map = stops[['stop_id', 'station_id']].drop_duplicates(subset=['stop_id'], keep='first')
+    stop_to_station_map = stop_to_station_map.reset_index(drop=True)
     
     # Create unique stations (one per station_id)
-    stations = stops.groupby('station_id').first().reset_index()
-    stations = stations[['station_id', 'stop_name', 'stop_lat', 'stop_lon']]
+    stations = _first_per_station(stops)
+    
+    if rules['same_name_radius']:
+        merged = merge_same_name(stations, rules['same_name_radius'])
+        stops['station_id'] = stops['station_id'].map(merged).fillna(stops['station_id'])
+        stop_to_station_map['station_id'] = stop_to_station_map['station_id'].map(merged).fillna(
+            stop_to_station_map['station_id'])
+        stations = _first_per_station(stops)
+        print(f"  Merged same-name stations within {rules['same_name_radius']} m: "
+              f"{len(merged)} → {stations['station_id'].nunique()} stations")
     
     print(f"  ✓ Created {len(stations)} unique stations")
     print(f"  ✓ Created {len(stop_to_station_map)} stop→station mappings")
     
     # Save
-    stations.to_csv(f'{PROCESSED_DIR}/stops_cleaned.csv', index=False)
-    stop_to_station_map.to_csv(f'{PROCESSED_DIR}/stop_to_station_map.csv', index=False)
+    write_table(stations, 'stops_cleaned')
+    write_table(stop_to_station_map, 'stop_to_station_map')
     
-    print(f"  ✓ Saved to stops_cleaned.csv and stop_to_station_map.csv")
+    print(f"  ✓ Saved stops_cleaned and stop_to_station_map")
     
     return stations, stop_to_station_map
 
 if __name__ == "__main__":
-    process_stops()
\ No newline at end of file
+    # python scripts/build_graph/stops.py [--no-platforms] [--merge-radius METRES]
+    args = sys.argv[1:]
+    rules = {'platforms': '--no-platforms' not in args}
+    if '--merge-radius' in args:
+        rules['same_name_radius'] = float(args[args.index('--merge-radius') + 1])
+    process_stops(rules)
\ No newline at end of file
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import sys
+sys.path.append('scripts')
+from utils.io import read_table, write_table
+from utils.spatial import GridIndex
+
+# Walking links between stations (e.g. a tram stop outside a train station)
+WALK_RADIUS = 300     # meters, straight line
+WALK_SPEED = 1.3      # meters per second
+WALK_DETOUR = 1.25    # street distance vs straight line
+
+def create_transfers(radius=WALK_RADIUS, save=True):
+    print(f"Creating walking transfers within {radius} m...")
+    
+    stations = read_table('stops_cleaned', columns=['station_id', 'stop_lat', 'stop_lon'])
+    stations = stations.drop_duplicates(subset=['station_id'], keep='last').reset_index(drop=True)
+    print(f"  Indexing {len(stations)} stations")
+    
+    index = GridIndex(stations['stop_lat'], stations['stop_lon'], cell_size=radius)
+    i, j, straight = index.pairs_within(radius)
+    
+    # One row per direction
+    station_ids = stations['station_id'].to_numpy(dtype=object)
+    distance = straight * WALK_DETOUR
+    transfers = pd.DataFrame({
+        'from_station': np.concatenate([station_ids[i], station_ids[j]]),
+        'to_station': np.concatenate([station_ids[j], station_ids[i]]),
+        'time': np.concatenate([distance, distance]) / WALK_SPEED,
+        'distance': np.concatenate([distance, distance]),
+        'mode': 'walk',
+        'emissions': 0.0
+    })
+    transfers = transfers.sort_values(['from_station', 'to_station'], kind='stable').reset_index(drop=True)
+    
+    print(f"  ✓ Created {len(transfers)} walking links")
+    if len(transfers):
+        print(f"    Average walk: {transfers['distance'].mean():.0f} meters, {transfers['time'].mean():.0f} seconds")
+    
+    if save:
+        write_table(transfers, 'transfers')
+        print(f"  ✓ Saved transfers")
+    
+    return transfers
+
+if __name__ == "__main__":
+    # python scripts/build_graph/transfers.py [radius_m]
+    create_transfers(float(sys.argv[1]) if len(sys.argv) > 1 else WALK_RADIUS)
@@ -1,233 +1,354 @@
-import networkx as nx
+import json
+import math
 import pickle
+import time
+import numpy as np
 import pandas as pd
+import sys
+sys.path.append('scripts')
+from utils.io import PROCESSED_DIR, read_table
+from graph.components import connected_components, strong_components
+from graph.csr import CSRGraph
+from graph.storage import load_graph as load_compact_graph
+from routing.dijkstra import dijkstra, path_edges, shortest_route
 
-def load_graph():
-    """Load the PT graph"""
-    with open('data/processed/pt_graph.gpickle', 'rb') as f:
-        return pickle.load(f)
+REQUIRED_NODE_ATTRS = ['stop_name', 'lat', 'lon', 'node_type']
+REQUIRED_EDGE_ATTRS = ['route_id', 'mode', 'distance', 'time']
 
-def validate_graph():
-    print("="*60)
-    print("PT GRAPH VALIDATION")
-    print("="*60)
+# Known Melbourne routes that must be found by name and routed
+TEST_QUERIES = [
+    ('Southern Cross', 'Flinders Street'),
+    ('Melbourne Central', 'Flagstaff'),
+    ('Richmond', 'Flinders Street'),
+]
+
+# Randomized pathfinding checks (--sample N): fixed seed, so CI runs are repeatable;
+# one full search per sampled origin checks this many destinations
+SAMPLE_SEED = 42
+PAIRS_PER_ORIGIN = 10
+
+# Relative tolerance for emissions = distance * factor and path cost checks (float32 attributes)
+RTOL = 1e-3
+
+def load_graph(compact=True):
+    """
+    Load the PT graph as a CSRGraph
+    compact=False reads pt_graph.gpickle (NetworkX) instead of mapping pt_graph.bin
+    """
+    if compact:
+        return load_compact_graph(f'{PROCESSED_DIR}/pt_graph.bin')
+    with open(f'{PROCESSED_DIR}/pt_graph.gpickle', 'rb') as f:
+        return CSRGraph.from_networkx(pickle.load(f))
+
+def _labels(G, name):
+    """Label of every edge's categorical attribute (missing: 'unknown')"""
+    return np.append(np.asarray(G.labels[name], dtype=object), 'unknown')[G.edge_attrs[name]]
+
+def _report_issue(report, level, message):
+    report[level].append(message)
+    print(f"  {'✗' if level == 'errors' else '⚠'} {message}")
+
+def check_attributes(G, report):
+    """Required node/edge attributes, and nodes that only edges mention (no attributes)"""
+    missing_node_attrs = [attr for attr in REQUIRED_NODE_ATTRS if attr not in G.node_attrs]
+    missing_edge_attrs = [attr for attr in REQUIRED_EDGE_ATTRS if attr not in G.edge_attrs]
+    if missing_node_attrs:
+        _report_issue(report, 'errors', f"Missing node attributes: {missing_node_attrs}")
+    if missing_edge_attrs:
+        _report_issue(report, 'errors', f"Missing edge attributes: {missing_edge_attrs}")
+    if not missing_node_attrs and not missing_edge_attrs:
+        print(f"  ✓ All required node and edge attributes present")
     
-    # Load graph
-    print("\n[1/7] Loading graph...")
-    G = load_graph()
-    print(f"  ✓ Graph loaded")
+    bare = G.node_attrs['node_type'] < 0
+    lat, lon = G.node_attrs['lat'], G.node_attrs['lon']
+    no_coords = ~bare & ~(np.isfinite(lat) & np.isfinite(lon))
+    if bare.any():
+        _report_issue(report, 'warnings', f"{int(bare.sum())} nodes have no attributes (station missing from stops_cleaned)")
+    if no_coords.any():
+        _report_issue(report, 'warnings', f"{int(no_coords.sum())} stations have no coordinates")
     
-    # Basic statistics
-    print("\n[2/7] Basic Statistics:")
-    print(f"  Nodes: {G.number_of_nodes()}")
-    print(f"  Edges: {G.number_of_edges()}")
-    print(f"  Average degree: {sum(dict(G.degree()).values()) / G.number_of_nodes():.2f}")
+    return {
+        'missing_node_attrs': missing_node_attrs,
+        'missing_edge_attrs': missing_edge_attrs,
+        'nodes_without_attrs': int(bare.sum()),
+        'nodes_without_coords': int(no_coords.sum())
+    }
+
+def check_edges(G, report):
+    """Every edge statistic and value check in one vectorized pass over the edge arrays"""
+    m = G.number_of_edges()
+    sources = G.edge_sources().astype(np.int64)
+    targets = G.indices.astype(np.int64)
+    times = G.edge_attrs['time'].astype(np.float64)
+    distances = G.edge_attrs['distance'].astype(np.float64)
+    factors = G.edge_attrs['emissions_factor'].astype(np.float64)
+    emissions = G.edge_attrs['emissions'].astype(np.float64)
     
-    # Check node attributes
-    print("\n[3/7] Validating Node Attributes:")
-    sample_node = list(G.nodes(data=True))[0]
-    required_node_attrs = ['stop_name', 'lat', 'lon', 'node_type']
-    missing_node_attrs = [attr for attr in required_node_attrs if attr not in sample_node[1]]
+    modes, mode_counts = np.unique(_labels(G, 'mode'), return_counts=True)
+    by_count = np.argsort(-mode_counts, kind='stable')
+    mode_distribution = {str(modes[k]): int(mode_counts[k]) for k in by_count}
+    for mode, count in mode_distribution.items():
+        print(f"  {mode}: {count} edges ({count / m * 100:.1f}%)")
     
-    if missing_node_attrs:
-        print(f"  ✗ Missing node attributes: {missing_node_attrs}")
-    else:
-        print(f"  ✓ All required node attributes present")
+    stats = {
+        'modes': mode_distribution,
+        'invalid_time': int((~np.isfinite(times)).sum()),
+        'invalid_distance': int((~np.isfinite(distances)).sum()),
+        'zero_time': int((times <= 0).sum()),
+        'zero_distance': int((distances <= 0).sum()),
+        'negative_emissions': int((emissions < 0).sum()),
+        'emissions_mismatch': int((~np.isclose(emissions, distances / 1000 * factors, rtol=RTOL, atol=1e-9)).sum()),
+        'self_loops': int((sources == targets).sum()),
+        'parallel_edges': int(m - len(np.unique(sources * G.number_of_nodes() + targets))),
+        'no_route': int((G.edge_attrs['route_id'] < 0).sum()),
+        'bad_targets': int(((targets < 0) | (targets >= G.number_of_nodes())).sum())
+    }
     
-    # Check edge attributes
-    print("\n[4/7] Validating Edge Attributes:")
-    sample_edge = list(G.edges(data=True))[0]
-    required_edge_attrs = ['route_id', 'mode', 'distance', 'time']
-    missing_edge_attrs = [attr for attr in required_edge_attrs if attr not in sample_edge[2]]
+    for name, count in [('NaN/inf time', stats['invalid_time']), ('NaN/inf distance', stats['invalid_distance']),
+                        ('negative emissions', stats['negative_emissions']),
+                        ('emissions ≠ distance × emissions_factor', stats['emissions_mismatch']),
+                        ('parallel duplicates', stats['parallel_edges']),
+                        ('targets outside the graph', stats['bad_targets'])]:
+        if count:
+            _report_issue(report, 'errors', f"{count} edges with {name}")
+    for name, count in [('zero/negative time', stats['zero_time']), ('zero/negative distance', stats['zero_distance']),
+                        ('self loops', stats['self_loops']), ('no route_id', stats['no_route'])]:
+        if count:
+            _report_issue(report, 'warnings', f"{count} edges with {name}")
+        else:
+            print(f"  ✓ No edges with {name}")
     
-    if missing_edge_attrs:
-        print(f"  ✗ Missing edge attributes: {missing_edge_attrs}")
-    else:
-        print(f"  ✓ All required edge attributes present")
-    
-    # Mode distribution
-    print("\n[5/7] Mode Distribution:")
-    modes = {}
-    for u, v, data in G.edges(data=True):
-        mode = data.get('mode', 'unknown')
-        modes[mode] = modes.get(mode, 0) + 1
-    
-    for mode, count in sorted(modes.items(), key=lambda x: x[1], reverse=True):
-        percentage = (count / G.number_of_edges()) * 100
-        print(f"  {mode}: {count} edges ({percentage:.1f}%)")
-    
-    # Check for graph issues
-    print("\n[6/7] Graph Integrity Checks:")
-    
-    # Isolated nodes
-    isolated = list(nx.isolates(G))
-    if isolated:
-        print(f"  ⚠ Warning: {len(isolated)} isolated nodes")
+    finite = np.isfinite(times) & np.isfinite(distances)
+    stats['avg_time'] = float(times[finite].mean()) if finite.any() else None
+    stats['avg_distance'] = float(distances[finite].mean()) if finite.any() else None
+    stats['total_emissions'] = float(emissions.sum())
+    if finite.any():
+        print(f"\n  Edge Statistics:")
+        print(f"    Avg time: {stats['avg_time']:.1f}s ({stats['avg_time'] / 60:.1f} min)")
+        print(f"    Avg distance: {stats['avg_distance']:.1f}m ({stats['avg_distance'] / 1000:.2f} km)")
+    return stats
+
+def check_connectivity(G, report):
+    """
+    Isolated nodes, weakly connected components (union-find on the edge arrays)
+    and strongly connected components (Tarjan over the CSR arrays)
+    Returns (section, weak labels, strong labels).
+    """
+    n = G.number_of_nodes()
+    sources = G.edge_sources()
+    degree = np.diff(G.indptr) + np.bincount(G.indices, minlength=n)
+    isolated = np.flatnonzero(degree == 0)
+    if len(isolated):
+        _report_issue(report, 'warnings', f"{len(isolated)} isolated nodes")
         if len(isolated) <= 5:
-            for node in isolated:
-                data = G.nodes[node]
-                print(f"    - {data.get('stop_name', 'Unknown')} ({node})")
+            for u in isolated:
+                print(f"    - {G.node_attrs['stop_name'][u] or 'Unknown'} ({G.station_ids[u]})")
     else:
         print(f"  ✓ No isolated nodes")
     
-    # Weakly connected components
-    if not G.is_directed():
-        components = list(nx.connected_components(G))
-    else:
-        components = list(nx.weakly_connected_components(G))
+    weak = connected_components(n, sources, G.indices)
+    strong = strong_components(G.indptr, G.indices)
+    weak_sizes = np.sort(np.bincount(weak, minlength=n)[np.unique(weak)])[::-1]
+    strong_sizes = np.sort(np.bincount(strong))[::-1]
     
-    if len(components) == 1:
+    if len(weak_sizes) <= 1:
         print(f"  ✓ Graph is fully connected")
     else:
-        print(f"  ⚠ Graph has {len(components)} components")
-        component_sizes = sorted([len(c) for c in components], reverse=True)
-        print(f"    Largest: {component_sizes[0]} nodes")
-        if len(component_sizes) > 1:
-            print(f"    Second largest: {component_sizes[1]} nodes")
-    
-    # Check for zero/negative values
-    zero_time = sum(1 for u, v, d in G.edges(data=True) if d.get('time', 0) <= 0)
-    zero_distance = sum(1 for u, v, d in G.edges(data=True) if d.get('distance', 0) <= 0)
-    
-    if zero_time > 0:
-        print(f"  ⚠ {zero_time} edges with zero/negative time")
-    else:
-        print(f"  ✓ No edges with zero/negative time")
-    
-    if zero_distance > 0:
-        print(f"  ⚠ {zero_distance} edges with zero/negative distance")
-    else:
-        print(f"  ✓ No edges with zero/negative distance")
-    
-    # Edge statistics
-    times = [d.get('time', 0) for u, v, d in G.edges(data=True)]
-    distances = [d.get('distance', 0) for u, v, d in G.edges(data=True)]
+        _report_issue(report, 'warnings', f"Graph has {len(weak_sizes)} components")
+        print(f"    Largest: {weak_sizes[0]} nodes")
+        print(f"    Second largest: {weak_sizes[1]} nodes")
     
-    print(f"\n  Edge Statistics:")
-    print(f"    Avg time: {sum(times)/len(times):.1f}s ({sum(times)/len(times)/60:.1f} min)")
-    print(f"    Avg distance: {sum(distances)/len(distances):.1f}m ({sum(distances)/len(distances)/1000:.2f} km)")
+    largest_scc = int(strong_sizes[0]) if n else 0
+    print(f"  Strongly connected: {len(strong_sizes)} components, largest {largest_scc} nodes "
+          f"({largest_scc / max(n, 1) * 100:.1f}%; every station in it can reach every other)")
     
-    # Pathfinding tests
-    print("\n[7/7] Pathfinding Tests:")
-    test_pathfinding(G)
-    
-    print("\n" + "="*60)
-    print("VALIDATION COMPLETE")
-    print("="*60)
+    section = {
+        'isolated_nodes': int(len(isolated)),
+        'isolated_sample': [str(G.station_ids[u]) for u in isolated[:5]],
+        'weak_components': int(len(weak_sizes)),
+        'weak_component_sizes': weak_sizes[:10].tolist(),
+        'strong_components': int(len(strong_sizes)),
+        'strong_component_sizes': strong_sizes[:10].tolist(),
+        'largest_scc_fraction': largest_scc / max(n, 1)
+    }
+    return section, weak, strong
 
-def test_pathfinding(G):
-    """Test pathfinding with known Melbourne routes"""
-    
-    # Find test stations
-    test_queries = [
-        ('Southern Cross', 'Flinders Street'),
-        ('Melbourne Central', 'Flagstaff'),
-        ('Richmond', 'Flinders Street'),
-    ]
-    
-    tests_passed = 0
-    tests_failed = 0
-    
-    for origin_name, dest_name in test_queries:
-        # Find nodes
-        origin_nodes = [n for n, d in G.nodes(data=True) 
-                       if origin_name.lower() in d.get('stop_name', '').lower()]
-        dest_nodes = [n for n, d in G.nodes(data=True) 
-                     if dest_name.lower() in d.get('stop_name', '').lower()]
+def test_pathfinding(G, report, queries=TEST_QUERIES):
+    """Route known Melbourne station pairs, found by name"""
+    results = []
+    for origin_name, dest_name in queries:
+        origins, destinations = G.find_stations(origin_name, 1), G.find_stations(dest_name, 1)
+        result = {'from': origin_name, 'to': dest_name, 'found': False}
+        results.append(result)
+        if not origins or not destinations:
+            _report_issue(report, 'warnings', f"Could not find: {origin_name} → {dest_name}")
+            continue
         
-        if not origin_nodes or not dest_nodes:
-            print(f"  ⚠ Could not find: {origin_name} → {dest_name}")
-            tests_failed += 1
+        route = shortest_route(G, origins[0][0], destinations[0][0], 'time')
+        if route is None:
+            _report_issue(report, 'errors', f"No path found: {origin_name} → {dest_name}")
             continue
         
-        try:
-            # Find shortest path by time
-            path = nx.shortest_path(G, origin_nodes[0], dest_nodes[0], weight='time')
-            path_time = nx.shortest_path_length(G, origin_nodes[0], dest_nodes[0], weight='time')
-            
-            # Calculate total distance
-            total_distance = sum(
-                G[path[i]][path[i+1]]['distance'] 
-                for i in range(len(path)-1)
-            )
-            
-            # Get modes used
-            modes_used = set()
-            for i in range(len(path)-1):
-                modes_used.add(G[path[i]][path[i+1]]['mode'])
-            
-            print(f"  ✓ {origin_name} → {dest_name}")
-            print(f"    Path: {len(path)} stops")
-            print(f"    Time: {path_time:.0f}s ({path_time/60:.1f} min)")
-            print(f"    Distance: {total_distance:.0f}m ({total_distance/1000:.2f} km)")
-            print(f"    Modes: {', '.join(modes_used)}")
-            
-            tests_passed += 1
-            
-        except nx.NetworkXNoPath:
-            print(f"  ✗ No path found: {origin_name} → {dest_name}")
-            tests_failed += 1
-        except Exception as e:
-            print(f"  ✗ Error: {origin_name} → {dest_name} ({e})")
-            tests_failed += 1
-    
-    # Random reachability test
-    print(f"\n  Random Reachability Test:")
-    random_node = list(G.nodes())[0]
-    reachable = len(nx.descendants(G, random_node))
-    reachable_pct = (reachable / G.number_of_nodes()) * 100
-    print(f"    From random node: can reach {reachable}/{G.number_of_nodes()} nodes ({reachable_pct:.1f}%)")
-    
-    print(f"\n  Summary: {tests_passed} passed, {tests_failed} failed")
-
-def cross_validate_with_csv():
-    """Cross-validate graph with source CSV files"""
-    print("\n" + "="*60)
-    print("CROSS-VALIDATION WITH SOURCE DATA")
-    print("="*60)
+        result.update(found=True, stops=len(route.stations), time=route.time,
+                      distance=route.distance, modes=sorted(set(route.modes)))
+        print(f"  ✓ {origin_name} → {dest_name}")
+        print(f"    Path: {len(route.stations)} stops")
+        print(f"    Time: {route.time:.0f}s ({route.time / 60:.1f} min)")
+        print(f"    Distance: {route.distance:.0f}m ({route.distance / 1000:.2f} km)")
+        print(f"    Modes: {', '.join(result['modes'])}")
     
-    # Load graph
-    G = load_graph()
+    passed = sum(result['found'] for result in results)
+    print(f"\n  Summary: {passed} passed, {len(results) - passed} failed")
+    return results
+
+def sample_paths(G, report, weak, strong, n_pairs, seed=SAMPLE_SEED):
+    """
+    Dijkstra for n_pairs random station pairs (fixed seed), checked against
+    the component labels and the edge arrays: pairs in one strongly connected
+    component must be reachable, pairs in different weak components must not be,
+    and a found path must run source → target with edge times summing to its cost
+    """
+    rng = np.random.default_rng(seed)
+    n = G.number_of_nodes()
+    origins = rng.integers(0, n, size=-(-n_pairs // PAIRS_PER_ORIGIN)) if n else []
+    destinations = rng.integers(0, n, size=n_pairs) if n else []
+    sources, times = G.edge_sources(), G.edge_attrs['time'].astype(np.float64)
     
-    # Load source data
-    print("\n[1/3] Loading source data...")
-    edges_merged = pd.read_csv('data/processed/edges_merged.csv')
-    stops_cleaned = pd.read_csv('data/processed/stops_cleaned.csv')
+    checked = reachable = 0
+    failures = []
+    for k, target in enumerate(np.asarray(destinations).tolist()):
+        source = int(origins[k // PAIRS_PER_ORIGIN])
+        if k % PAIRS_PER_ORIGIN == 0:
+            dist, parent, _ = dijkstra(G, source, 'time')
+        found = dist[target] != math.inf
+        checked += 1
+        reachable += found
+        if strong[source] == strong[target] and not found:
+            failures.append(f"{G.station_ids[source]} → {G.station_ids[target]}: unreachable within one strong component")
+        elif weak[source] != weak[target] and found:
+            failures.append(f"{G.station_ids[source]} → {G.station_ids[target]}: path across weak components")
+        elif found and source != target:
+            edges = np.array(path_edges(G, parent, target))
+            ok = (sources[edges[0]] == source and G.indices[edges[-1]] == target
+                  and (G.indices[edges[:-1]] == sources[edges[1:]]).all()
+                  and math.isclose(times[edges].sum(), dist[target], rel_tol=RTOL, abs_tol=1e-6))
+            if not ok:
+                failures.append(f"{G.station_ids[source]} → {G.station_ids[target]}: path does not match its cost")
     
-    print(f"  edges_merged.csv: {len(edges_merged)} edges")
-    print(f"  stops_cleaned.csv: {len(stops_cleaned)} stops")
+    for failure in failures[:5]:
+        _report_issue(report, 'errors', failure)
+    if len(failures) > 5:
+        _report_issue(report, 'errors', f"... {len(failures) - 5} more sampled path failures")
+    print(f"  {checked} random pairs (seed {seed}): {reachable} reachable, {len(failures)} inconsistent")
+    return {'pairs': checked, 'seed': seed, 'reachable': reachable, 'failures': len(failures)}
+
+def cross_validate_with_tables(G, report):
+    """Cross-validate the graph with stops_cleaned and edges_merged"""
+    edges_merged = read_table('edges_merged', columns=['from_station', 'to_station'])
+    stops_cleaned = read_table('stops_cleaned', columns=['station_id'])
+    n, m = G.number_of_nodes(), G.number_of_edges()
+    print(f"  edges_merged: {len(edges_merged)} edges")
+    print(f"  stops_cleaned: {len(stops_cleaned)} stops")
     
-    # Check node count matches
-    print("\n[2/3] Node Count Validation:")
-    if G.number_of_nodes() == len(stops_cleaned):
-        print(f"  ✓ Graph nodes ({G.number_of_nodes()}) matches stops_cleaned ({len(stops_cleaned)})")
+    if n == len(stops_cleaned):
+        print(f"  ✓ Graph nodes ({n}) matches stops_cleaned ({len(stops_cleaned)})")
     else:
-        print(f"  ⚠ Mismatch: Graph has {G.number_of_nodes()} nodes, stops_cleaned has {len(stops_cleaned)}")
-    
-    # Check edge count (should be less due to invalid edges filtered)
-    print("\n[3/3] Edge Count Validation:")
-    print(f"  edges_merged.csv: {len(edges_merged)} edges")
-    print(f"  Graph: {G.number_of_edges()} edges")
-    diff = len(edges_merged) - G.number_of_edges()
-    if diff > 0:
-        print(f"  ✓ {diff} edges were filtered out (invalid stations)")
-    elif diff == 0:
-        print(f"  ✓ All edges from CSV are in graph")
+        _report_issue(report, 'warnings', f"Mismatch: Graph has {n} nodes, stops_cleaned has {len(stops_cleaned)}")
+    
+    # Walking transfers are added on top of edges_merged (build_graph/transfers.py)
+    walk_edges = int((_labels(G, 'mode') == 'walk').sum())
+    print(f"  Graph: {m} edges, {walk_edges} of them walking transfers")
+    
+    # Every merged pair must be a graph edge
+    position = pd.Index(np.asarray([str(s) for s in G.station_ids], dtype=object))
+    u = position.get_indexer(edges_merged['from_station'].astype(str))
+    v = position.get_indexer(edges_merged['to_station'].astype(str))
+    graph_keys = G.edge_sources().astype(np.int64) * n + G.indices
+    missing = (u < 0) | (v < 0) | ~np.isin(u.astype(np.int64) * n + v, graph_keys)
+    if missing.any():
+        _report_issue(report, 'errors', f"{int(missing.sum())} edges_merged edges NOT in graph")
     else:
-        print(f"  ⚠ Graph has MORE edges than CSV? ({-diff} extra)")
-    
-    # Sample validation: check if specific edges exist
-    print("\n  Sample Edge Validation:")
-    for i in range(min(5, len(edges_merged))):
-        edge = edges_merged.iloc[i]
-        from_s = str(edge['from_station'])
-        to_s = str(edge['to_station'])
-        
-        if G.has_edge(from_s, to_s):
-            print(f"  ✓ Edge {from_s} → {to_s} exists")
-        else:
-            print(f"  ✗ Edge {from_s} → {to_s} NOT in graph")
+        print(f"  ✓ All edges from edges_merged are in graph")
+    
+    return {
+        'stops_cleaned': len(stops_cleaned),
+        'edges_merged': len(edges_merged),
+        'walk_edges': walk_edges,
+        'missing_edges': int(missing.sum())
+    }
+
+def validate_graph(compact=True, sample=0, seed=SAMPLE_SEED, cross_validate=True, report_path=None):
+    """
+    Validate the PT graph and return a machine-readable report
+    ('ok' is False if any check found errors; warnings do not fail it)
+    sample: number of random station pairs to route and check (0: skip)
+    report_path: also write the report there as JSON
+    """
+    started = time.perf_counter()
+    report = {'errors': [], 'warnings': []}
+    steps = 6 + cross_validate + bool(sample)
+    step = iter(range(1, steps + 1))
+    print("="*60)
+    print("PT GRAPH VALIDATION")
+    print("="*60)
+    
+    print(f"\n[{next(step)}/{steps}] Loading graph...")
+    G = load_graph(compact)
+    print(f"  ✓ Graph loaded")
+    
+    print(f"\n[{next(step)}/{steps}] Basic Statistics:")
+    n, m = G.number_of_nodes(), G.number_of_edges()
+    report['nodes'], report['edges'] = n, m
+    report['average_degree'] = 2 * m / n if n else 0.0
+    print(f"  Nodes: {n}")
+    print(f"  Edges: {m}")
+    print(f"  Average degree: {report['average_degree']:.2f}")
+    
+    print(f"\n[{next(step)}/{steps}] Validating Node and Edge Attributes:")
+    report['attributes'] = check_attributes(G, report)
+    
+    print(f"\n[{next(step)}/{steps}] Edge Checks and Mode Distribution:")
+    report['edge_checks'] = check_edges(G, report)
+    
+    print(f"\n[{next(step)}/{steps}] Connectivity:")
+    report['connectivity'], weak, strong = check_connectivity(G, report)
+    
+    print(f"\n[{next(step)}/{steps}] Pathfinding Tests:")
+    report['pathfinding'] = test_pathfinding(G, report)
+    
+    if sample:
+        print(f"\n[{next(step)}/{steps}] Sampled Pathfinding Checks:")
+        report['sampled_paths'] = sample_paths(G, report, weak, strong, sample, seed)
+    
+    if cross_validate:
+        print(f"\n[{next(step)}/{steps}] Cross-validation with Source Data:")
+        report['cross_validation'] = cross_validate_with_tables(G, report)
+    
+    report['ok'] = not report['errors']
+    report['seconds'] = time.perf_counter() - started
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    
+    print("\n" + "="*60)
+    print(f"VALIDATION {'PASSED' if report['ok'] else 'FAILED'}: {len(report['errors'])} errors, "
+          f"{len(report['warnings'])} warnings ({report['seconds']:.1f}s)")
+    print("="*60)
+    return report
 
 if __name__ == "__main__":
-    validate_graph()
-    cross_validate_with_csv()
\ No newline at end of file
+    # python scripts/build_graph/validate_graph.py [--gpickle] [--sample N] [--seed S] [--no-cross] [--json REPORT.json]
+    # Exits with status 1 when any check fails (for CI)
+    args = sys.argv[1:]
+    
+    def option(name, default=None):
+        return args[args.index(name) + 1] if name in args else default
+    
+    report = validate_graph(
+        compact='--gpickle' not in args,
+        sample=int(option('--sample', 0)),
+        seed=int(option('--seed', SAMPLE_SEED)),
+        cross_validate='--no-cross' not in args,
+        report_path=option('--json')
+    )
+    sys.exit(0 if report['ok'] else 1)
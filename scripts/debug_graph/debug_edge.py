@@ -1,6 +1,8 @@
-import pandas as pd
+import sys
+sys.path.append('scripts')
+from utils.io import read_table
 
-edges = pd.read_csv('data/processed/edges_raw.csv', low_memory=False)
+edges = read_table('edges_raw')
 
 print("=== EDGE ANALYSIS ===\n")
 
@@ -1,6 +1,8 @@
-import pandas as pd
+import sys
+sys.path.append('scripts')
+from utils.io import read_table
 
-stops = pd.read_csv('data/processed/stops_cleaned.csv')
+stops = read_table('stops_cleaned')
 
 print("=== STOPS ANALYSIS ===\n")
 
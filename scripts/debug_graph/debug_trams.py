@@ -1,6 +1,9 @@
 import pandas as pd
+import sys
+sys.path.append('scripts')
+from utils.io import read_table
 
-routes = pd.read_csv('data/processed/routes.csv')
+routes = read_table('routes')
 print(routes['feed_source'].unique())
 
 
@@ -1,13 +1,18 @@
 import networkx as nx
 import pickle
+import sys
+sys.path.append('scripts')
+from graph.storage import load_graph as load_compact_graph
 
-def load_graph():
+def load_graph(compact=False):
+    if compact:
+        return load_compact_graph('data/processed/pt_graph.bin').to_networkx()
     with open('data/processed/pt_graph.gpickle', 'rb') as f:
         return pickle.load(f)
 
-def test_graph():
+def test_graph(compact=False):
     print("Loading graph...")
-    G = load_graph()
+    G = load_graph(compact)
     
     print(f"\nGraph Statistics:")
     print(f"  Nodes: {G.number_of_nodes()}")
@@ -46,4 +51,4 @@ def test_graph():
     print(f"    ✓ Can reach {reachable} stations")
 
 if __name__ == "__main__":
-    test_graph()
\ No newline at end of file
+    test_graph('--compact' in sys.argv)
\ No newline at end of file
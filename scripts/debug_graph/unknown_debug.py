@@ -1,6 +1,9 @@
-import pandas as pd
-routes = pd.read_csv("data/processed/routes.csv", dtype=str)
-trips = pd.read_csv("data/processed/trips.csv", dtype=str)
+import sys
+sys.path.append('scripts')
+from utils.io import read_table
+# IDs compared as strings, as the original dtype=str read did
+routes = read_table('routes').astype({'route_id': str, 'feed_source': str})
+trips = read_table('trips').astype({'route_id': str})
 
 # how many routes have empty short name?
 print("routes: total", len(routes))
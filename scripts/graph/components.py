@@ -0,0 +1,90 @@
+import numpy as np
+
+def connected_components(n, i, j):
+    """
+    Connected component label (smallest member) of each of n nodes, given edges i-j
+    (array union-find with path halving and union by rank, near-linear in edges)
+    """
+    parent = list(range(n))
+    rank = [0] * n
+    
+    def find(u):
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]   # path halving
+            u = parent[u]
+        return u
+    
+    for u, v in zip(np.asarray(i).tolist(), np.asarray(j).tolist()):
+        u, v = find(u), find(v)
+        if u == v:
+            continue
+        if rank[u] < rank[v]:
+            u, v = v, u
+        parent[v] = u
+        if rank[u] == rank[v]:
+            rank[u] += 1
+    
+    # Relabel each component by its smallest member
+    roots = np.array([find(u) for u in range(n)], dtype=np.int64)
+    smallest = np.full(n, n, dtype=np.int64)
+    np.minimum.at(smallest, roots, np.arange(n))
+    return smallest[roots]
+
+def strong_components(indptr, indices):
+    """
+    Strongly connected component number of each node of a CSR graph
+    (iterative Tarjan over plain lists; components are numbered in reverse
+    topological order, so edges only lead to equal or smaller numbers)
+    """
+    indptr, indices = list(indptr), list(indices)
+    n = len(indptr) - 1
+    order = [-1] * n        # discovery number
+    low = [0] * n
+    on_stack = [False] * n
+    labels = [-1] * n
+    stack = []
+    counter = components = 0
+    
+    for root in range(n):
+        if order[root] >= 0:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, indptr[root])]   # (node, next edge to look at)
+        
+        while work:
+            u, e = work[-1]
+            end = indptr[u + 1]
+            while e < end:
+                v = indices[e]
+                e += 1
+                if order[v] < 0:
+                    # Descend into v, resuming u at edge e afterwards
+                    work[-1] = (u, e)
+                    order[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = True
+                    work.append((v, indptr[v]))
+                    break
+                if on_stack[v] and order[v] < low[u]:
+                    low[u] = order[v]
+            else:
+                # Every edge of u done: u roots a component or passes its low up
+                work.pop()
+                if low[u] == order[u]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        labels[w] = components
+                        if w == u:
+                            break
+                    components += 1
+                if work:
+                    parent = work[-1][0]
+                    if low[u] < low[parent]:
+                        low[parent] = low[u]
+    
+    return np.array(labels, dtype=np.int64)
@@ -0,0 +1,337 @@
+import numpy as np
+import pandas as pd
+from graph.names import NameIndex
+
+# Categorical edge/node attributes: stored as integer codes plus one label table each
+CATEGORICAL_EDGE_ATTRS = ['route_id', 'route_name', 'mode']
+CATEGORICAL_NODE_ATTRS = ['node_type']
+
+# Numeric edge attributes, as parallel arrays in CSR order
+NUMERIC_EDGE_ATTRS = {
+    'time': np.float32,              # seconds
+    'distance': np.float32,          # meters
+    'emissions_factor': np.float32,  # kg CO2 per passenger-km
+    'emissions': np.float32          # kg CO2
+}
+
+# Service statistics of PT edges from merge_edges, kept when edges_merged has
+# them (NaN on walking transfers); informational, so not search weights
+SERVICE_EDGE_ATTRS = {
+    'trips': np.float32,     # trips over the feed's service days
+    'time_p90': np.float32,  # seconds, 90th percentile travel time
+    'headway': np.float32    # seconds, mean gap between departures
+}
+
+def _encode(values):
+    """Integer codes and label table for a column (missing values get code -1)"""
+    codes, labels = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    return codes.astype(np.int32), np.asarray(labels, dtype=object)
+
+def _decode(codes, labels):
+    """Inverse of _encode; code -1 becomes None"""
+    return np.append(labels, None)[codes]
+
+def array_view(values):
+    """Read-only memoryview of a flat array (native byte order, so it can be indexed)"""
+    values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('='))
+    return memoryview(values).toreadonly()
+
+def pair_keys(*tables):
+    """
+    One int64 key per (from_station, to_station) row of each table; equal pairs
+    get equal keys across all the tables
+    """
+    columns = [table[name].to_numpy(object) for table in tables for name in ('from_station', 'to_station')]
+    codes, uniques = pd.factorize(np.concatenate(columns))
+    keys, start = [], 0
+    for table in tables:
+        n = len(table)
+        keys.append(codes[start:start + n].astype(np.int64) * len(uniques) + codes[start + n:start + 2 * n])
+        start += 2 * n
+    return keys
+
+class CSRGraph:
+    """
+    Compact directed graph: integer node IDs 0..n-1, CSR adjacency and one
+    flat array per attribute. Edges of node u are indices[indptr[u]:indptr[u+1]]
+    and the same slice of every edge attribute array.
+    
+    station_ids[i] is the station ID of node i; index maps it back.
+    Arrays may be read-only views of a memory-mapped file (see graph/storage.py).
+    """
+    
+    def __init__(self, station_ids, node_attrs, indptr, indices, edge_attrs, labels, index=None):
+        self.station_ids = station_ids
+        if index is None:
+            index = {station_id: i for i, station_id in enumerate(station_ids)}
+        self.index = index              # station ID → node index (dict-like)
+        self.node_attrs = node_attrs    # stop_name, lat, lon, node_type (codes)
+        self.indptr = indptr            # int64, n + 1
+        self.indices = indices          # int32, m (target node of each edge)
+        self.edge_attrs = edge_attrs    # time, distance, ..., headway, route_id/route_name/mode (codes)
+        self.labels = labels            # categorical attr → label array
+        self.cache = {}                 # derived lookups searches build on first use
+    
+    @classmethod
+    def from_edge_list(cls, station_ids, node_attrs, sources, targets, edge_attrs, labels):
+        """Build CSR arrays from an edge list (sources/targets are node indices)"""
+        n = len(station_ids)
+        sources = np.asarray(sources, dtype=np.int64)
+        
+        # Stable sort keeps each node's edges in insertion order, like NetworkX
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+        indices = np.asarray(targets, dtype=np.int32)[order]
+        edge_attrs = {name: np.asarray(values)[order] for name, values in edge_attrs.items()}
+        
+        return cls(station_ids, node_attrs, indptr, indices, edge_attrs, labels)
+    
+    @classmethod
+    def from_tables(cls, stations, edges, emissions_factors, default_factor=0.1, transfers=None):
+        """
+        Build straight from stops_cleaned and edges_merged, same result as
+        build_graph() followed by from_networkx() but without NetworkX
+        emissions_factors: mode → kg CO2 per passenger-km (build_graph.EMISSIONS_FACTORS);
+        edges that already have emissions_factor and emissions columns keep them
+        transfers: optional walking links, added where no PT edge links the pair
+        """
+        if transfers is not None and len(transfers):
+            pt_pairs, walk_pairs = pair_keys(edges, transfers)
+            walks = transfers[~np.isin(walk_pairs, pt_pairs)].assign(route_id='walk', route_name='Walk', mode='walk')
+            walks = walks.drop_duplicates(subset=['from_station', 'to_station'], keep='first')
+            if 'emissions_factor' in edges.columns:
+                walks = walks.assign(emissions_factor=emissions_factors.get('walk', default_factor))
+                walks = walks.assign(emissions=(walks['distance'] / 1000) * walks['emissions_factor'])
+            edges = pd.concat([edges, walks[list(edges.columns.intersection(walks.columns))]], ignore_index=True)
+        
+        # Later duplicates update the earlier edge in place, as G.add_edge does:
+        # the last row's values at the first row's position
+        pair_codes, _ = pd.factorize(pair_keys(edges)[0])
+        last_rows = np.zeros(pair_codes.max() + 1 if len(edges) else 0, dtype=np.int64)
+        last_rows[pair_codes] = np.arange(len(edges))  # later rows overwrite earlier ones
+        edges = edges.iloc[last_rows]
+        
+        # Stations referenced only by edges become attribute-less nodes, as in NetworkX,
+        # in the order add_edge meets them (source then target of each edge)
+        endpoints = np.column_stack([edges['from_station'].to_numpy(object), edges['to_station'].to_numpy(object)])
+        station_ids = pd.unique(np.concatenate([stations['station_id'].to_numpy(object), endpoints.ravel()]))
+        known = stations.drop_duplicates(subset=['station_id'], keep='last').set_index('station_id').reindex(station_ids)
+        
+        is_stop = pd.Index(station_ids).isin(stations['station_id'].to_numpy(object))
+        node_type = np.full(len(station_ids), None, dtype=object)
+        node_type[is_stop] = 'pt_stop'
+        node_type_codes, node_type_labels = _encode(node_type)
+        stop_name = known['stop_name'].to_numpy(dtype=object)
+        stop_name[~is_stop] = None
+        node_attrs = {
+            'stop_name': stop_name,
+            'lat': known['stop_lat'].to_numpy(dtype=np.float64),
+            'lon': known['stop_lon'].to_numpy(dtype=np.float64),
+            'node_type': node_type_codes
+        }
+        labels = {'node_type': node_type_labels}
+        
+        position = pd.Index(station_ids)
+        sources = position.get_indexer(edges['from_station'])
+        targets = position.get_indexer(edges['to_station'])
+        
+        # Calculate emissions (kg CO2) for every edge at once
+        distance = edges['distance'].to_numpy(np.float64)
+        if 'emissions_factor' in edges.columns and 'emissions' in edges.columns:
+            factors = edges['emissions_factor'].to_numpy(np.float64)
+            emissions = edges['emissions'].to_numpy(np.float64)
+        else:
+            factors = edges['mode'].map(emissions_factors).fillna(default_factor).to_numpy(np.float64)
+            emissions = (distance / 1000) * factors
+        edge_attrs = {
+            'time': edges['time'].to_numpy(np.float32),
+            'distance': distance.astype(np.float32),
+            'emissions_factor': factors.astype(np.float32),
+            'emissions': emissions.astype(np.float32)
+        }
+        edge_attrs.update({
+            name: edges[name].to_numpy(np.float32)
+            for name in SERVICE_EDGE_ATTRS if name in edges.columns
+        })
+        # Label tables in order of first use in CSR order, as from_networkx makes them
+        order = np.argsort(sources, kind='stable')
+        for name in CATEGORICAL_EDGE_ATTRS:
+            codes, labels[name] = _encode(edges[name].to_numpy(object)[order])
+            edge_attrs[name] = np.empty_like(codes)
+            edge_attrs[name][order] = codes
+        
+        return cls.from_edge_list(station_ids, node_attrs, sources, targets, edge_attrs, labels)
+    
+    @classmethod
+    def from_networkx(cls, G):
+        """Convert a PT DiGraph as made by build_graph()"""
+        station_ids = np.array(list(G.nodes()), dtype=object)
+        position = {station_id: i for i, station_id in enumerate(station_ids)}
+        
+        node_data = [G.nodes[node] for node in station_ids]
+        node_type_codes, node_type_labels = _encode([d.get('node_type') for d in node_data])
+        node_attrs = {
+            'stop_name': np.array([d.get('stop_name') for d in node_data], dtype=object),
+            'lat': np.array([d.get('lat', np.nan) for d in node_data], dtype=np.float64),
+            'lon': np.array([d.get('lon', np.nan) for d in node_data], dtype=np.float64),
+            'node_type': node_type_codes
+        }
+        labels = {'node_type': node_type_labels}
+        
+        edge_list = list(G.edges(data=True))
+        sources = np.array([position[u] for u, v, d in edge_list], dtype=np.int64)
+        targets = np.array([position[v] for u, v, d in edge_list], dtype=np.int32)
+        edge_attrs = {
+            name: np.array([d.get(name, np.nan) for u, v, d in edge_list], dtype=dtype)
+            for name, dtype in NUMERIC_EDGE_ATTRS.items()
+        }
+        edge_attrs.update({
+            name: np.array([d.get(name, np.nan) for u, v, d in edge_list], dtype=dtype)
+            for name, dtype in SERVICE_EDGE_ATTRS.items() if any(name in d for u, v, d in edge_list)
+        })
+        for name in CATEGORICAL_EDGE_ATTRS:
+            edge_attrs[name], labels[name] = _encode([d.get(name) for u, v, d in edge_list])
+        
+        return cls.from_edge_list(station_ids, node_attrs, sources, targets, edge_attrs, labels)
+    
+    def number_of_nodes(self):
+        return len(self.station_ids)
+    
+    def number_of_edges(self):
+        return len(self.indices)
+    
+    def node(self, station_id):
+        """Node index of a station ID (KeyError if unknown)"""
+        return self.index[station_id]
+    
+    def edge_sources(self):
+        """Source node of every edge, in CSR order"""
+        return np.repeat(np.arange(self.number_of_nodes(), dtype=np.int32), np.diff(self.indptr))
+    
+    def out_edges(self, u):
+        """Edge positions (a range) of node u's outgoing edges"""
+        return range(self.indptr[u], self.indptr[u + 1])
+    
+    def successors(self, u):
+        return self.indices[self.indptr[u]:self.indptr[u + 1]]
+    
+    def find_edge(self, u, v):
+        """Edge position of u → v, or -1"""
+        start, end = self.indptr[u], self.indptr[u + 1]
+        hits = np.flatnonzero(self.indices[start:end] == v)
+        return int(start + hits[0]) if len(hits) else -1
+    
+    def edge_label(self, name, e):
+        """Decoded categorical attribute (route_id, route_name, mode) of edge e"""
+        code = self.edge_attrs[name][e]
+        return self.labels[name][code] if code >= 0 else None
+    
+    def edge_data(self, e):
+        """All attributes of edge e as a dict, like G[u][v] in NetworkX"""
+        data = {name: self.edge_label(name, e) for name in CATEGORICAL_EDGE_ATTRS}
+        data.update({name: float(self.edge_attrs[name][e]) for name in NUMERIC_EDGE_ATTRS})
+        data.update({name: float(self.edge_attrs[name][e]) for name in self.service_attrs()})
+        return data
+    
+    def node_data(self, u):
+        data = {
+            'stop_name': self.node_attrs['stop_name'][u],
+            'lat': float(self.node_attrs['lat'][u]),
+            'lon': float(self.node_attrs['lon'][u])
+        }
+        code = self.node_attrs['node_type'][u]
+        if code < 0:
+            return {}
+        data['node_type'] = self.labels['node_type'][code]
+        return data
+    
+    def adjacency_views(self):
+        """
+        indptr, indices, edge sources and the edge time/emissions/distance/route_id
+        arrays as read-only memoryviews, built once per graph. Indexing one gives
+        a plain Python number, as fast as indexing a list inside a pure-Python
+        search loop, but the values stay in the arrays: with a memory-mapped
+        graph, forked workers share those pages instead of each boxing a copy.
+        """
+        if 'adjacency_views' not in self.cache:
+            self.cache['adjacency_views'] = {
+                'indptr': array_view(self.indptr),
+                'indices': array_view(self.indices),
+                'sources': array_view(self.edge_sources()),
+                'time': array_view(self.edge_attrs['time']),
+                'emissions': array_view(self.edge_attrs['emissions']),
+                'distance': array_view(self.edge_attrs['distance']),
+                'route': array_view(self.edge_attrs['route_id'])
+            }
+            for name in self.extra_weights():
+                self.cache['adjacency_views'][name] = array_view(self.edge_attrs[name])
+        return self.cache['adjacency_views']
+    
+    def extra_weights(self):
+        """Names of extra weight columns (e.g. emissions scenarios, see graph/emissions.py)"""
+        return [name for name in self.edge_attrs if name not in NUMERIC_EDGE_ATTRS
+                and name not in CATEGORICAL_EDGE_ATTRS and name not in SERVICE_EDGE_ATTRS]
+    
+    def service_attrs(self):
+        """Names of the service statistics this graph carries (SERVICE_EDGE_ATTRS)"""
+        return [name for name in SERVICE_EDGE_ATTRS if name in self.edge_attrs]
+    
+    def set_weight(self, name, values):
+        """
+        Add or replace an extra weight column (float32, CSR order)
+        Searches pick it up as weight=name without rebuilding anything else.
+        Built-in attributes, emissions included, are refused: hierarchies and
+        landmarks are built on them (base emissions come from build_graph).
+        """
+        if name in CATEGORICAL_EDGE_ATTRS or name in SERVICE_EDGE_ATTRS or name in NUMERIC_EDGE_ATTRS:
+            raise ValueError(f"'{name}' is a fixed edge attribute")
+        values = np.asarray(values, dtype=np.float32)
+        if values.shape != (self.number_of_edges(),):
+            raise ValueError(f"Weight '{name}' needs one value per edge ({self.number_of_edges()}), got {values.shape}")
+        self.edge_attrs[name] = values
+        if 'adjacency_views' in self.cache:
+            self.cache['adjacency_views'][name] = array_view(values)
+    
+    def name_index(self):
+        """Station-name search index; loaded from the graph file when present, else built here"""
+        if 'name_index' not in self.cache:
+            self.cache['name_index'] = NameIndex.build(self.node_attrs['stop_name'], np.diff(self.indptr))
+        return self.cache['name_index']
+    
+    def find_stations(self, query, limit=10):
+        """Stations whose stop_name matches query, best first: [(station_id, stop_name, score)]"""
+        return [
+            (self.station_ids[u], self.node_attrs['stop_name'][u], score)
+            for u, score in self.name_index().search(query, limit)
+        ]
+    
+    def reverse(self):
+        """Graph with every edge flipped (for backward searches)"""
+        return CSRGraph.from_edge_list(
+            self.station_ids, self.node_attrs,
+            self.indices, self.edge_sources(),
+            self.edge_attrs, self.labels
+        )
+    
+    def to_networkx(self):
+        """
+        Adapter for the NetworkX-based tools (debug scripts)
+        Numeric attributes come back as float (float32 precision).
+        """
+        import networkx as nx
+        
+        G = nx.DiGraph()
+        G.add_nodes_from(
+            (self.station_ids[u], self.node_data(u)) for u in range(self.number_of_nodes())
+        )
+        
+        columns = {name: _decode(self.edge_attrs[name], self.labels[name]) for name in CATEGORICAL_EDGE_ATTRS}
+        columns.update({name: self.edge_attrs[name].astype(np.float64)
+                        for name in list(NUMERIC_EDGE_ATTRS) + self.service_attrs()})
+        records = pd.DataFrame(columns).to_dict('records')
+        sources = self.station_ids[self.edge_sources()]
+        targets = self.station_ids[self.indices]
+        G.add_edges_from(zip(sources, targets, records))
+        
+        return G
\ No newline at end of file
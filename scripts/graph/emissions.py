@@ -0,0 +1,196 @@
+import json
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append('scripts')
+from utils.time import parse_gtfs_time
+
+# Emissions factors (kg CO2 per passenger-km)
+# These are example values - use your team's actual model
+MODE_FACTORS = {
+    'train': 0.041,  # Electric trains are most efficient
+    'tram': 0.045,   # Electric trams
+    'bus': 0.089,    # Diesel/hybrid buses
+    'walk': 0.0      # Walking transfers (build_graph/transfers.py)
+}
+DEFAULT_FACTOR = 0.1  # modes missing from MODE_FACTORS
+
+# Rule keys an edge is matched on, with the weight each adds to a rule's
+# specificity; the most specific matching rule sets the factor
+RULE_KEYS = {'route_id': 4, 'feed': 2, 'mode': 1}
+
+# Example scenarios (python scripts/graph/emissions.py --scenario NAME)
+SCENARIOS = {
+    'electric_buses': {
+        'rules': [
+            {'mode': 'bus', 'factor': 0.035},
+            {'feed': '11_skybus', 'factor': 0.089}   # Skybus stays diesel
+        ]
+    },
+    'peak_occupancy': {
+        # Fuller vehicles in the peaks share the same emissions between more passengers
+        'rules': [
+            {'mode': ['train', 'tram'], 'start': '07:00', 'end': '09:30', 'factor': 0.025},
+            {'mode': 'bus', 'start': '07:00', 'end': '09:30', 'factor': 0.06},
+            {'mode': ['train', 'tram'], 'start': '16:30', 'end': '19:00', 'factor': 0.025},
+            {'mode': 'bus', 'start': '16:30', 'end': '19:00', 'factor': 0.06}
+        ]
+    }
+}
+
+def _seconds(value):
+    """Time of day in seconds from seconds or 'HH:MM[:SS]'"""
+    if isinstance(value, str):
+        return parse_gtfs_time(value if value.count(':') == 2 else value + ':00')
+    return int(value)
+
+class EmissionsModel:
+    """
+    Emissions factors keyed by mode, feed, route and time of day
+    Each rule is a dict with a factor and any of:
+        mode, feed, route_id: a value or list of values the edge must have
+        start, end: time-of-day window 'HH:MM' (end exclusive; may wrap past midnight)
+    A rule applies to an edge when all of its keys match (windowed rules only
+    when evaluated at a time inside the window). The most specific applicable
+    rule wins: route_id > feed > mode, a time window breaking ties, then the
+    later rule. Edges no rule covers use mode_factors, then default.
+    """
+
+    def __init__(self, rules=(), mode_factors=None, default=DEFAULT_FACTOR):
+        self.rules = [dict(rule) for rule in rules]
+        self.mode_factors = dict(MODE_FACTORS if mode_factors is None else mode_factors)
+        self.default = default
+        for rule in self.rules:
+            if 'factor' not in rule:
+                raise ValueError(f"Emissions rule {rule} has no factor")
+            unknown = set(rule) - set(RULE_KEYS) - {'factor', 'start', 'end'}
+            if unknown:
+                raise ValueError(f"Unknown emissions rule keys {sorted(unknown)} (expected {', '.join(RULE_KEYS)}, start, end)")
+            if ('start' in rule) != ('end' in rule):
+                raise ValueError(f"Emissions rule {rule} needs both start and end")
+
+    @classmethod
+    def from_dict(cls, spec):
+        """Model from {'rules': [...], 'mode_factors': {...}, 'default': ...} (all optional)"""
+        return cls(spec.get('rules', ()), spec.get('mode_factors'), spec.get('default', DEFAULT_FACTOR))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def needs_feeds(self):
+        return any('feed' in rule for rule in self.rules)
+
+    def _active(self, at):
+        """Rules that apply at time of day at (None: only rules without a window), least specific first"""
+        at = None if at is None else _seconds(at) % 86400
+        active = []
+        for i, rule in enumerate(self.rules):
+            windowed = 'start' in rule
+            if windowed:
+                if at is None:
+                    continue
+                start, end = _seconds(rule['start']) % 86400, _seconds(rule['end']) % 86400
+                inside = start <= at < end if start <= end else (at >= start or at < end)
+                if not inside:
+                    continue
+            specificity = sum(weight for key, weight in RULE_KEYS.items() if key in rule)
+            active.append((specificity, windowed, i, rule))
+        return [rule for *_, rule in sorted(active, key=lambda item: item[:3])]
+
+    def factors(self, modes, route_ids=None, feeds=None, at=None):
+        """
+        kg CO2 per passenger-km for each edge, from parallel arrays of its mode,
+        route_id and feed (route_id/feeds may be None when no rule uses them)
+        """
+        modes = pd.Series(np.asarray(modes, dtype=object))
+        columns = {'mode': modes}
+        if route_ids is not None:
+            columns['route_id'] = pd.Series(np.asarray(route_ids, dtype=object))
+        if feeds is not None:
+            columns['feed'] = pd.Series(np.asarray(feeds, dtype=object))
+
+        factors = modes.map(self.mode_factors).fillna(self.default).to_numpy(np.float64, copy=True)
+        for rule in self._active(at):
+            match = np.ones(len(modes), dtype=bool)
+            for key in RULE_KEYS:
+                if key not in rule:
+                    continue
+                if key not in columns:
+                    raise ValueError(f"Emissions rule on '{key}' needs {key} values for every edge")
+                values = rule[key] if isinstance(rule[key], (list, tuple, set)) else [rule[key]]
+                match &= columns[key].isin(values).to_numpy()
+            factors[match] = rule['factor']
+        return factors
+
+    def edge_factors(self, G, route_feeds=None, at=None):
+        """
+        Factor of every edge of a CSRGraph, in CSR order
+        Evaluated once per distinct (route_id, mode) and broadcast to the edges.
+        route_feeds: route_id → feed_source, needed by rules on feed
+        (default: read from the routes table).
+        """
+        route_codes = G.edge_attrs['route_id'].astype(np.int64)
+        mode_codes = G.edge_attrs['mode'].astype(np.int64)
+        combos, inverse = np.unique((route_codes + 1) * (len(G.labels['mode']) + 1) + mode_codes + 1,
+                                    return_inverse=True)
+        route_of, mode_of = np.divmod(combos, len(G.labels['mode']) + 1)
+        route_ids = np.append(G.labels['route_id'], None)[route_of - 1]
+        modes = np.append(G.labels['mode'], None)[mode_of - 1]
+
+        feeds = None
+        if self.needs_feeds():
+            if route_feeds is None:
+                route_feeds = load_route_feeds()
+            feeds = pd.Series(route_ids, dtype=object).map(route_feeds).to_numpy(dtype=object)
+
+        return self.factors(modes, route_ids, feeds, at)[inverse.ravel()]
+
+def load_route_feeds():
+    """route_id → feed_source from the routes table"""
+    from utils.io import read_table
+    routes = read_table('routes', columns=['route_id', 'feed_source'])
+    routes = routes.drop_duplicates('route_id')
+    return dict(zip(routes['route_id'].astype(str), routes['feed_source'].astype(str)))
+
+def apply_model(G, model, name, route_feeds=None, at=None):
+    """
+    Emissions (kg CO2) of every edge of G under model, added or replaced in place
+    as the extra weight column name (searches use it with weight=name); topology
+    and the base emissions are untouched. Returns the emissions array.
+    The base emissions come from build_graph(model=...), which keeps the
+    landmarks and contraction hierarchies built on them in step.
+    """
+    if name in ('emissions', 'emissions_factor'):
+        raise ValueError(f"'{name}' is the base emissions; rebuild the graph with build_graph(model=...) instead")
+    factors = model.edge_factors(G, route_feeds, at)
+    emissions = (G.edge_attrs['distance'].astype(np.float64) / 1000) * factors
+    G.set_weight(name, emissions)
+    return G.edge_attrs[name]
+
+if __name__ == "__main__":
+    # python scripts/graph/emissions.py (--scenario NAME | SCENARIO.json) [--name COLUMN] [--at HH:MM]
+    # Adds the scenario to pt_graph.bin as an extra weight column (default: the scenario name)
+    from graph.storage import load_graph, write_graph
+    from utils.io import PROCESSED_DIR
+    args = sys.argv[1:]
+
+    def option(name, default=None):
+        return args[args.index(name) + 1] if name in args else default
+
+    if '--scenario' in args:
+        scenario = option('--scenario')
+        model = EmissionsModel.from_dict(SCENARIOS[scenario])
+    else:
+        path = next(arg for arg in args if arg.endswith('.json'))
+        scenario = path.rsplit('/', 1)[-1][:-len('.json')]
+        model = EmissionsModel.load(path)
+    name = option('--name', f'emissions_{scenario}')
+
+    graph_path = f'{PROCESSED_DIR}/pt_graph.bin'
+    G = load_graph(graph_path)
+    emissions = apply_model(G, model, name, at=option('--at'))
+    write_graph(G, graph_path)
+    print(f"  ✓ {name}: {emissions.sum():.1f} kg CO2 over {G.number_of_edges()} edges "
+          f"(base {G.edge_attrs['emissions'].astype(np.float64).sum():.1f}), saved to {graph_path}")
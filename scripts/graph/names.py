@@ -0,0 +1,215 @@
+import bisect
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+# Common abbreviations in PTV stop names, expanded so "Flinders St" finds "Flinders Street"
+ABBREVIATIONS = {
+    'st': 'street',
+    'rd': 'road',
+    'stn': 'station',
+    'ave': 'avenue',
+    'av': 'avenue',
+    'hwy': 'highway',
+    'pde': 'parade',
+    'cres': 'crescent',
+    'dr': 'drive',
+    'ct': 'court',
+    'pl': 'place',
+    'sq': 'square',
+    'nth': 'north',
+    'sth': 'south',
+    'mt': 'mount',
+    'uni': 'university',
+    'ctr': 'centre'
+}
+
+# Score of one query token against a station token
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.5          # plus up to 0.5 for how much of the token the prefix covers
+FUZZY_SCORE = 0.5           # times trigram similarity, for tokens with no exact/prefix match
+FUZZY_THRESHOLD = 0.4       # minimum trigram (Jaccard) similarity for a fuzzy match
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+def normalize(name):
+    """Lowercase, strip accents and punctuation: 'Flinders St/Elizabeth St' → 'flinders st elizabeth st'"""
+    # Missing names (None/NaN) normalize to '' rather than 'nan'
+    name = unicodedata.normalize('NFKD', '' if pd.isna(name) else str(name))
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(' ', name.lower()).strip()
+
+def tokenize(name):
+    """Normalized tokens with abbreviations expanded"""
+    return [ABBREVIATIONS.get(token, token) for token in normalize(name).split()]
+
+def query_tokens(query):
+    """
+    Query tokens as tuples of alternatives. Abbreviations are expanded on whole
+    words; the last token may still be partly typed, so it is also kept as typed
+    ('st' prefix-matches 'station' and 'stanley' as well as meaning 'street').
+    """
+    tokens = normalize(query).split()
+    alternatives = [(ABBREVIATIONS.get(token, token),) for token in tokens[:-1]]
+    if tokens:
+        last = tokens[-1]
+        alternatives.append(tuple(dict.fromkeys([last, ABBREVIATIONS.get(last, last)])))
+    return alternatives
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _best_per_node(nodes, scores):
+    """Each node once, with its best score, sorted by node"""
+    order = np.lexsort((-scores, nodes))
+    nodes, scores = nodes[order], scores[order]
+    first = np.ones(len(nodes), dtype=bool)
+    first[1:] = nodes[1:] != nodes[:-1]
+    return nodes[first], scores[first]
+
+def _postings(keys, values, n_keys):
+    """CSR (ptr, values sorted by key) from parallel key/value arrays"""
+    keys = np.asarray(keys, dtype=np.int64)
+    order = np.lexsort((np.asarray(values, dtype=np.int64), keys))
+    ptr = np.zeros(n_keys + 1, dtype='<i8')
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=ptr[1:])
+    return ptr, np.asarray(values, dtype='<i4')[order]
+
+class NameIndex:
+    """
+    Token index over station names for ranked, autocomplete-style search
+    tokens: sorted vocabulary; token_ptr/token_nodes: nodes whose name has each token
+    trigrams: sorted trigram vocabulary; trigram_ptr/trigram_tokens: tokens containing each
+    node_rank: tie-breaker between equally good matches (node degree, busier first)
+    Plain arrays and string sequences, so the index can live in the mmap graph file.
+    """
+    
+    def __init__(self, tokens, token_ptr, token_nodes, trigrams, trigram_ptr, trigram_tokens, node_rank):
+        self.tokens = tokens
+        self.token_ptr = token_ptr
+        self.token_nodes = token_nodes
+        self.trigrams = trigrams
+        self.trigram_ptr = trigram_ptr
+        self.trigram_tokens = trigram_tokens
+        self.node_rank = node_rank
+    
+    @classmethod
+    def build(cls, stop_names, node_rank=None):
+        """Index stop_names (one per node); node_rank defaults to all zeros"""
+        node_tokens = [set(tokenize(name)) for name in stop_names]
+        vocabulary = sorted(set().union(*node_tokens)) if node_tokens else []
+        token_id = {token: i for i, token in enumerate(vocabulary)}
+        
+        keys, nodes = [], []
+        for node, tokens in enumerate(node_tokens):
+            for token in tokens:
+                keys.append(token_id[token])
+                nodes.append(node)
+        token_ptr, token_nodes = _postings(keys, nodes, len(vocabulary))
+        
+        token_trigrams = [trigrams(token) for token in vocabulary]
+        trigram_vocabulary = sorted(set().union(*token_trigrams)) if token_trigrams else []
+        trigram_id = {trigram: i for i, trigram in enumerate(trigram_vocabulary)}
+        keys, token_ids = [], []
+        for i, grams in enumerate(token_trigrams):
+            for gram in grams:
+                keys.append(trigram_id[gram])
+                token_ids.append(i)
+        trigram_ptr, trigram_tokens = _postings(keys, token_ids, len(trigram_vocabulary))
+        
+        if node_rank is None:
+            node_rank = np.zeros(len(node_tokens))
+        return cls(vocabulary, token_ptr, token_nodes, trigram_vocabulary, trigram_ptr, trigram_tokens,
+                   np.asarray(node_rank, dtype='<f4'))
+    
+    def arrays(self):
+        """Numeric arrays and string lists to persist, keyed by name"""
+        return {
+            'token_ptr': self.token_ptr,
+            'token_nodes': self.token_nodes,
+            'trigram_ptr': self.trigram_ptr,
+            'trigram_tokens': self.trigram_tokens,
+            'node_rank': self.node_rank
+        }, {'tokens': list(self.tokens), 'trigrams': list(self.trigrams)}
+    
+    def _token_matches(self, token):
+        """(token ids, scores) in the vocabulary matching one query token"""
+        # Tokens starting with the query token are one contiguous range of the sorted vocabulary
+        lo = bisect.bisect_left(self.tokens, token)
+        hi = bisect.bisect_left(self.tokens, token + '\x7f', lo)
+        if hi > lo:
+            ids = np.arange(lo, hi)
+            lengths = np.array([len(self.tokens[i]) for i in ids])
+            scores = PREFIX_SCORE + (1 - PREFIX_SCORE) * len(token) / lengths
+            scores[lengths == len(token)] = EXACT_SCORE
+            return ids, scores
+        
+        # No prefix match: tokens sharing enough trigrams (typos, missing letters)
+        grams = trigrams(token)
+        candidates = []
+        for gram in grams:
+            i = bisect.bisect_left(self.trigrams, gram)
+            if i < len(self.trigrams) and self.trigrams[i] == gram:
+                candidates.append(self.trigram_tokens[self.trigram_ptr[i]:self.trigram_ptr[i + 1]])
+        if not candidates:
+            return np.zeros(0, np.int64), np.zeros(0)
+        
+        ids, shared = np.unique(np.concatenate(candidates), return_counts=True)
+        sizes = np.array([len(trigrams(self.tokens[i])) for i in ids])
+        similarity = shared / (len(grams) + sizes - shared)
+        keep = similarity >= FUZZY_THRESHOLD
+        return ids[keep], FUZZY_SCORE * similarity[keep]
+    
+    def _node_scores(self, token):
+        """(nodes, best score per node) for one query token, sorted by node"""
+        ids, scores = self._token_matches(token)
+        if len(ids) == 0:
+            return np.zeros(0, np.int64), np.zeros(0)
+        
+        # Prefix matches are a contiguous id range, so their postings are one slice
+        if len(ids) > 1 and ids[-1] - ids[0] == len(ids) - 1:
+            nodes = self.token_nodes[self.token_ptr[ids[0]]:self.token_ptr[ids[-1] + 1]]
+        else:
+            nodes = np.concatenate([self.token_nodes[self.token_ptr[i]:self.token_ptr[i + 1]] for i in ids])
+        counts = self.token_ptr[ids + 1] - self.token_ptr[ids]
+        node_scores = np.repeat(scores, counts)
+        if len(ids) == 1:
+            return nodes, node_scores  # postings are already sorted and unique
+        return _best_per_node(nodes, node_scores)
+    
+    def _alternative_scores(self, alternatives):
+        """(nodes, best score per node) over a query token's alternatives (see query_tokens)"""
+        if len(alternatives) == 1:
+            return self._node_scores(alternatives[0])
+        parts = [self._node_scores(token) for token in alternatives]
+        return _best_per_node(np.concatenate([nodes for nodes, _ in parts]),
+                              np.concatenate([scores for _, scores in parts]))
+    
+    def search(self, query, limit=10):
+        """
+        Nodes whose names match every query token (by exact word, prefix or
+        trigram similarity), best first. Returns [(node index, score)].
+        """
+        nodes = None
+        for alternatives in dict.fromkeys(query_tokens(query)):
+            token_nodes, token_scores = self._alternative_scores(alternatives)
+            if nodes is None:
+                nodes, scores = token_nodes, token_scores
+            else:
+                nodes, mine, theirs = np.intersect1d(nodes, token_nodes, assume_unique=True, return_indices=True)
+                scores = scores[mine] + token_scores[theirs]
+            if len(nodes) == 0:
+                return []
+        if nodes is None:
+            return []
+        
+        # Best score first, then busier node, then lower node index
+        if len(nodes) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            cutoff = scores[top].min()
+            keep = scores >= cutoff
+            nodes, scores = nodes[keep], scores[keep]
+        order = np.lexsort((nodes, -self.node_rank[nodes], -scores))[:limit]
+        return [(int(u), float(score)) for u, score in zip(nodes[order], scores[order])]
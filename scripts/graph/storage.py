@@ -0,0 +1,262 @@
+import json
+import mmap
+import os
+import numpy as np
+import pandas as pd
+from graph.csr import CSRGraph, CATEGORICAL_EDGE_ATTRS, CATEGORICAL_NODE_ATTRS, NUMERIC_EDGE_ATTRS
+from graph.names import NameIndex
+
+# File layout:
+#   magic (8 bytes) | version (uint32) | header length (uint32) | JSON header | arrays
+# Every array starts on an ALIGNMENT boundary and is read with np.frombuffer over
+# one read-only mmap, so opening a graph costs a header parse and nothing else.
+# Processes mapping the same file share its pages through the page cache.
+MAGIC = b'PTGRAPH\x00'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Arrays every version-1 file must contain, with their exact dtypes
+SCHEMA = {
+    'indptr': '<i8',
+    'indices': '<i4',
+    'station_order': '<i4',
+    'node/lat': '<f8',
+    'node/lon': '<f8',
+    'node/node_type': '<i4'
+}
+SCHEMA.update({f'edge/{name}': np.dtype(dtype).newbyteorder('<').str for name, dtype in NUMERIC_EDGE_ATTRS.items()})
+SCHEMA.update({f'edge/{name}': '<i4' for name in CATEGORICAL_EDGE_ATTRS})
+
+# Variable-length string columns (UTF-8 data + int64 offsets)
+STRING_TABLES = ['station_ids', 'node/stop_name'] + \
+    [f'labels/{name}' for name in CATEGORICAL_EDGE_ATTRS + CATEGORICAL_NODE_ATTRS]
+
+# Optional station-name search index (graph/names.py); files without it still load
+NAME_INDEX_ARRAYS = ['token_ptr', 'token_nodes', 'trigram_ptr', 'trigram_tokens', 'node_rank']
+NAME_INDEX_STRINGS = ['tokens', 'trigrams']
+
+class GraphFormatError(ValueError):
+    """File is not a graph file, or was written with a different format version/schema"""
+
+class StringTable:
+    """
+    Read-only sequence of strings stored as one UTF-8 buffer plus offsets
+    Strings are decoded on access, so opening a table is free.
+    """
+    
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+    
+    @classmethod
+    def encode(cls, values):
+        """offsets and data arrays for a list of strings (None and NaN stored as '')"""
+        encoded = [('' if pd.isna(value) else str(value)).encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            if i < 0:
+                i += len(self)
+            return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+        indices = np.arange(len(self))[i] if isinstance(i, slice) else np.asarray(i)
+        return np.array([self[int(j)] for j in indices.ravel()], dtype=object).reshape(indices.shape)
+    
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class StationIndex:
+    """
+    station ID → node index by binary search over a presorted permutation,
+    instead of building a dict of every station at load time
+    """
+    
+    def __init__(self, station_ids, order):
+        self.station_ids = station_ids
+        self.order = order
+    
+    def get(self, station_id, default=None):
+        key = str(station_id)
+        lo, hi = 0, len(self.order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.station_ids[int(self.order[mid])] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.order) and self.station_ids[int(self.order[lo])] == key:
+            return int(self.order[lo])
+        return default
+    
+    def __getitem__(self, station_id):
+        i = self.get(station_id)
+        if i is None:
+            raise KeyError(station_id)
+        return i
+    
+    def __contains__(self, station_id):
+        return self.get(station_id) is not None
+    
+    def __len__(self):
+        return len(self.order)
+
+def _graph_arrays(G):
+    """Every array of a CSRGraph, keyed by its name in the file"""
+    station_ids = [str(s) for s in G.station_ids]
+    arrays = {
+        'indptr': G.indptr,
+        'indices': G.indices,
+        'station_order': np.array(sorted(range(len(station_ids)), key=station_ids.__getitem__), dtype='<i4'),
+        'node/lat': G.node_attrs['lat'],
+        'node/lon': G.node_attrs['lon'],
+        'node/node_type': G.node_attrs['node_type']
+    }
+    arrays.update({f'edge/{name}': values for name, values in G.edge_attrs.items()})
+    
+    strings = {'station_ids': station_ids, 'node/stop_name': list(G.node_attrs['stop_name'])}
+    strings.update({f'labels/{name}': list(values) for name, values in G.labels.items()})
+    
+    search_arrays, search_strings = G.name_index().arrays()
+    arrays.update({f'search/{name}': values for name, values in search_arrays.items()})
+    strings.update({f'search/{name}': values for name, values in search_strings.items()})
+    for name, values in strings.items():
+        arrays[f'{name}.offsets'], arrays[f'{name}.data'] = StringTable.encode(values)
+    
+    return {name: np.ascontiguousarray(values, dtype=SCHEMA.get(name, np.asarray(values).dtype))
+            for name, values in arrays.items()}
+
+def write_graph(G, path):
+    """
+    Write a CSRGraph in the mmap format
+    Written to a temporary file and renamed into place, so processes that
+    still map the old file keep a consistent copy.
+    """
+    arrays = _graph_arrays(G)
+    
+    # Offsets are relative to the start of the data section, which follows the header
+    layout = {}
+    position = 0
+    for name, values in arrays.items():
+        position = -(-position // ALIGNMENT) * ALIGNMENT
+        layout[name] = {'dtype': values.dtype.str, 'shape': list(values.shape), 'offset': position}
+        position += values.nbytes
+    
+    header = json.dumps({
+        'version': FORMAT_VERSION,
+        'n_nodes': G.number_of_nodes(),
+        'n_edges': G.number_of_edges(),
+        'arrays': layout
+    }).encode('utf-8')
+    preamble = len(MAGIC) + 8 + len(header)
+    data_start = -(-preamble // ALIGNMENT) * ALIGNMENT
+    
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(np.array([FORMAT_VERSION, len(header)], dtype='<u4').tobytes())
+        f.write(header)
+        for name, values in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(values.tobytes())
+    os.replace(tmp_path, path)
+
+def read_header(buffer):
+    """Parse and check the header, returns (header dict, data section start)"""
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise GraphFormatError("Not a PT graph file (bad magic)")
+    
+    version, header_length = (int(x) for x in np.frombuffer(buffer, dtype='<u4', count=2, offset=len(MAGIC)))
+    if version != FORMAT_VERSION:
+        raise GraphFormatError(f"Graph file format version {version}, expected {FORMAT_VERSION}; rebuild the graph")
+    
+    start = len(MAGIC) + 8
+    header = json.loads(bytes(buffer[start:start + header_length]).decode('utf-8'))
+    
+    arrays = header['arrays']
+    for name, dtype in SCHEMA.items():
+        if name not in arrays:
+            raise GraphFormatError(f"Graph file is missing array '{name}'")
+        if arrays[name]['dtype'] != dtype:
+            raise GraphFormatError(f"Array '{name}' has dtype {arrays[name]['dtype']}, expected {dtype}")
+    for name in STRING_TABLES:
+        if f'{name}.offsets' not in arrays or f'{name}.data' not in arrays:
+            raise GraphFormatError(f"Graph file is missing string table '{name}'")
+    
+    data_start = -(-(start + header_length) // ALIGNMENT) * ALIGNMENT
+    return header, data_start
+
+def _map(path):
+    """Read-only mmap of a graph file, its header and an array(name) / strings(name) reader"""
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    header, data_start = read_header(buffer)
+    
+    def array(name):
+        spec = header['arrays'][name]
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        values = np.frombuffer(buffer, dtype=spec['dtype'], count=count, offset=data_start + spec['offset'])
+        return values.reshape(spec['shape'])
+    
+    def strings(name):
+        return StringTable(array(f'{name}.offsets'), array(f'{name}.data'))
+    
+    return header, array, strings
+
+def _name_index(header, array, strings):
+    if not all(f'search/{name}' in header['arrays'] for name in NAME_INDEX_ARRAYS):
+        return None
+    parts = {name: array(f'search/{name}') for name in NAME_INDEX_ARRAYS}
+    parts.update({name: strings(f'search/{name}') for name in NAME_INDEX_STRINGS})
+    return NameIndex(**parts)
+
+def load_graph(path):
+    """
+    Map a graph file read-only and wrap it as a CSRGraph without copying
+    Arrays are read-only views into the page cache.
+    """
+    header, array, strings = _map(path)
+    
+    station_ids = strings('station_ids')
+    node_attrs = {
+        'stop_name': strings('node/stop_name'),
+        'lat': array('node/lat'),
+        'lon': array('node/lon'),
+        'node_type': array('node/node_type')
+    }
+    edge_attrs = {name: array(f'edge/{name}') for name in list(NUMERIC_EDGE_ATTRS) + CATEGORICAL_EDGE_ATTRS}
+    # Service statistics (graphs built from edges_merged with them) and extra
+    # weight columns (emissions scenarios) written by CSRGraph.set_weight
+    edge_attrs.update({
+        name[len('edge/'):]: array(name) for name in header['arrays']
+        if name.startswith('edge/') and name[len('edge/'):] not in edge_attrs
+    })
+    labels = {
+        name: np.array(list(strings(f'labels/{name}')), dtype=object)
+        for name in CATEGORICAL_EDGE_ATTRS + CATEGORICAL_NODE_ATTRS
+    }
+    
+    G = CSRGraph(
+        station_ids, node_attrs, array('indptr'), array('indices'), edge_attrs, labels,
+        index=StationIndex(station_ids, array('station_order'))
+    )
+    name_index = _name_index(header, array, strings)
+    if name_index is not None:
+        G.cache['name_index'] = name_index
+    return G
+
+def load_name_index(path):
+    """
+    Just the station-name index of a graph file, for lookups that never touch edges
+    Returns (NameIndex, station_ids, stop_names); GraphFormatError if the file has no index.
+    """
+    header, array, strings = _map(path)
+    name_index = _name_index(header, array, strings)
+    if name_index is None:
+        raise GraphFormatError(f"{path} has no station-name index; rebuild the graph")
+    return name_index, strings('station_ids'), strings('node/stop_name')
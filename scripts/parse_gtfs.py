@@ -1,8 +1,13 @@
 import pandas as pd
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+sys.path.append('scripts')
+from unzip_gtfs import open_feed_file
+from utils.io import PROCESSED_DIR, write_table
 
 RAW_DIR = "data/raw/"
-PROCESSED_DIR = "data/processed/"
 
 FEEDS = {
     "1": "1_regional_train",
@@ -16,25 +21,122 @@ FEEDS = {
 # Route types we want
 ROUTE_TYPES = {0, 1, 2, 3, 4, 6, 11}
 
-def load_and_concat(filename):
-    """Load a file from all feeds and concatenate"""
-    dfs = []
-    for feed_id, folder in FEEDS.items():
-        filepath = os.path.join(RAW_DIR, folder, filename)
-        if os.path.exists(filepath):
-            df = pd.read_csv(filepath)
-            df['feed_source'] = folder  # Track which feed it came from
-            dfs.append(df)
+# Columns we keep from each GTFS file, with explicit dtypes so nothing is inferred.
+# IDs stay strings (numeric-looking stop_ids would otherwise become floats once
+# a NaN shows up), and columns not listed here are never materialized.
+GTFS_COLUMNS = {
+    'routes.txt': {
+        'route_id': str,
+        'agency_id': str,
+        'route_short_name': str,
+        'route_long_name': str,
+        'route_type': 'Int16'
+    },
+    'stops.txt': {
+        'stop_id': str,
+        'stop_name': str,
+        'stop_lat': 'float64',
+        'stop_lon': 'float64',
+        'location_type': 'float32',
+        'parent_station': str
+    },
+    'trips.txt': {
+        'route_id': str,
+        'service_id': str,
+        'trip_id': str,
+        'direction_id': 'Int8'
+    },
+    'stop_times.txt': {
+        'trip_id': str,
+        'arrival_time': str,
+        'departure_time': str,
+        'stop_id': str,
+        'stop_sequence': 'int32'
+    }
+}
+
+# feed_source is one of six values; categorical keeps it at one byte per row
+FEED_SOURCE_DTYPE = pd.CategoricalDtype(list(FEEDS.values()))
+
+# Rows per read_csv chunk when filtering while reading
+CHUNK_SIZE = 1_000_000
+
+def iter_feed_chunks(feed_id, filename, filter_col=None, filter_values=None, from_zip=False):
+    """
+    Yield one GTFS file from one feed in CHUNK_SIZE-row chunks, with the dtypes in GTFS_COLUMNS
+    If filter_col is given, only rows whose filter_col is in filter_values are
+    kept, so the unfiltered file is never held in memory.
+    With from_zip the file is streamed out of the nested GTFS_MAIN zips instead
+    of the extracted RAW_DIR copy. Raises FileNotFoundError if the file is missing.
+    """
+    columns = GTFS_COLUMNS[filename]
+    read_options = dict(usecols=lambda c: c in columns, dtype=columns, chunksize=CHUNK_SIZE)
+    
+    with ExitStack() as stack:
+        if from_zip:
+            source = stack.enter_context(open_feed_file(feed_id, filename))
         else:
-            print(f"⚠ Missing {filename} in {folder}")
+            source = os.path.join(RAW_DIR, FEEDS[feed_id], filename)
+            if not os.path.exists(source):
+                raise FileNotFoundError(source)
+        
+        chunks = stack.enter_context(pd.read_csv(source, **read_options))
+        for chunk in chunks:
+            if filter_col is not None:
+                chunk = chunk[chunk[filter_col].isin(filter_values)]
+            yield chunk
+
+def read_feed_file(feed_id, filename, filter_col=None, filter_values=None, from_zip=False):
+    """
+    Read one GTFS file from one feed (see iter_feed_chunks), tagged with feed_source
+    Returns None if the file is missing.
+    """
+    try:
+        parts = list(iter_feed_chunks(feed_id, filename, filter_col, filter_values, from_zip))
+    except FileNotFoundError:
+        return None
     
-    return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+    folder = FEEDS[feed_id]
+    if parts:
+        df = pd.concat(parts, ignore_index=True)
+    else:
+        # Header-only file: no chunks, but still the usual columns and dtypes
+        df = pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in GTFS_COLUMNS[filename].items()})
+    df['feed_source'] = pd.Series(folder, index=df.index, dtype=FEED_SOURCE_DTYPE)  # Track which feed it came from
+    return df
 
-def parse_gtfs():
-    os.makedirs(PROCESSED_DIR, exist_ok=True)
+def load_and_concat(filename, filter_col=None, filter_values=None, from_zip=False, workers=None):
+    """
+    Load a file from all feeds in parallel (one process per feed) and concatenate
+    Feeds are concatenated in FEEDS order regardless of which finishes first.
+    """
+    if filter_values is not None:
+        filter_values = pd.Index(pd.unique(pd.Series(filter_values, dtype=str)))
+    
+    with ProcessPoolExecutor(max_workers=workers or len(FEEDS)) as pool:
+        futures = {
+            folder: pool.submit(read_feed_file, feed_id, filename, filter_col, filter_values, from_zip)
+            for feed_id, folder in FEEDS.items()
+        }
+        
+        dfs = []
+        for folder, future in futures.items():
+            df = future.result()
+            if df is None:
+                print(f"⚠ Missing {filename} in {folder}")
+            else:
+                dfs.append(df)
     
+    return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+
+def parse_gtfs(from_zip=False):
+    """
+    Parse all feeds into data/processed/
+    from_zip=True reads straight from GTFS_MAIN in one pass, so unzip_gtfs
+    does not need to run first; the default reads the extracted RAW_DIR.
+    """
     print("Loading routes...")
-    routes = load_and_concat('routes.txt')
+    routes = load_and_concat('routes.txt', from_zip=from_zip)
     
     print(routes['feed_source'].unique())
     # Filter by route type
@@ -44,18 +146,16 @@ def parse_gtfs():
     routes = routes[~routes['route_long_name'].str.contains('Replacement', case=False, na=False)]
     
     print(f"  ✓ {len(routes)} routes after filtering")
-    routes.to_csv(f'{PROCESSED_DIR}/routes.csv', index=False)
+    write_table(routes, 'routes')
     
     print("Loading stops...")
-    stops = load_and_concat('stops.txt')
+    stops = load_and_concat('stops.txt', from_zip=from_zip)
     print(f"  ✓ {len(stops)} stops loaded")
-    stops.to_csv(f'{PROCESSED_DIR}/stops_raw.csv', index=False)
+    write_table(stops, 'stops_raw')
     
     print("Loading trips...")
-    trips = load_and_concat('trips.txt')
-    
     # Only keep trips for our filtered routes
-    trips = trips[trips['route_id'].isin(routes['route_id'])]
+    trips = load_and_concat('trips.txt', 'route_id', routes['route_id'], from_zip)
     
     # Merge with routes to get route_type AND keep feed_source
     trips = trips.merge(
@@ -66,17 +166,15 @@ def parse_gtfs():
     )
     
     print(f"  ✓ {len(trips)} trips after filtering")
-    trips.to_csv(f'{PROCESSED_DIR}/trips.csv', index=False)
+    write_table(trips, 'trips')
     
     print("Loading stop_times...")
-    stop_times = load_and_concat('stop_times.txt')
-    
-    # Only keep stop_times for our filtered trips
-    stop_times = stop_times[stop_times['trip_id'].isin(trips['trip_id'])]
+    # Only keep stop_times for our filtered trips (filtered while reading)
+    stop_times = load_and_concat('stop_times.txt', 'trip_id', trips['trip_id'], from_zip)
     print(f"  ✓ {len(stop_times)} stop_times after filtering")
-    stop_times.to_csv(f'{PROCESSED_DIR}/stop_times.csv', index=False)
+    write_table(stop_times, 'stop_times')
     
-    print("\n✓ All files parsed and saved to data/processed/")
+    print(f"\n✓ All files parsed and saved to {PROCESSED_DIR}")
 
 if __name__ == "__main__":
-    parse_gtfs()
\ No newline at end of file
+    parse_gtfs(from_zip='--from-zip' in sys.argv)
\ No newline at end of file
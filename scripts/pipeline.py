@@ -0,0 +1,376 @@
+import hashlib
+import json
+import os
+import sys
+import time
+import zipfile
+import numpy as np
+import pandas as pd
+sys.path.append('scripts')
+from unzip_gtfs import FEEDS, GTFS_MAIN, OUTPUT_DIR as RAW_DIR
+from utils.io import (CH_METRICS, CH_PATH, LANDMARKS_PATH, PROCESSED_DIR, TIMETABLE_PATH,
+                      find_table, read_table, write_table)
+
+MANIFEST_PATH = os.path.join(PROCESSED_DIR, 'pipeline_manifest.json')
+GRAPH_PATH = os.path.join(PROCESSED_DIR, 'pt_graph.gpickle')
+COMPACT_GRAPH_PATH = os.path.join(PROCESSED_DIR, 'pt_graph.bin')
+
+# Code shared by several stages; a change here invalidates all of them
+UTILS = ['scripts/utils/io.py', 'scripts/utils/geo.py', 'scripts/utils/time.py', 'scripts/utils/spatial.py']
+
+# Tables edges can rebuild one feed at a time (every row carries feed_source),
+# and the raw GTFS files of each feed they are parsed from
+FEED_PARTITIONED = ['stop_times', 'trips', 'routes']
+FEED_FILES = ['routes.txt', 'trips.txt', 'stop_times.txt']
+
+def run_unzip(previous):
+    from unzip_gtfs import unzip_nested
+    unzip_nested()
+
+def run_parse(previous, from_zip=False):
+    from parse_gtfs import parse_gtfs
+    parse_gtfs(from_zip=from_zip)
+
+def run_stops(previous):
+    from build_graph.stops import process_stops
+    process_stops()
+
+def run_transfers(previous):
+    from build_graph.transfers import create_transfers
+    create_transfers()
+
+def run_edges(previous, cache):
+    from build_graph.edges import create_edges
+    
+    feed_fingerprints = feed_source_fingerprints(cache)
+    changed = changed_feeds(previous, feed_fingerprints)
+    
+    if changed is None:
+        create_edges()
+    else:
+        print(f"  Only feeds changed: {', '.join(sorted(changed)) or 'none'}")
+        splice_edges(changed)
+    
+    return {'feeds': feed_fingerprints}
+
+def run_timetable(previous):
+    from routing.raptor import Timetable
+    Timetable.build()
+
+def run_merge(previous):
+    from build_graph.merge import merge_edges
+    merge_edges()
+
+def run_build_graph(previous):
+    from build_graph.build_graph import build_graph
+    build_graph()
+
+def run_landmarks(previous):
+    from graph.storage import load_graph
+    from routing.alt import Landmarks
+    Landmarks.build(load_graph(COMPACT_GRAPH_PATH)).save(LANDMARKS_PATH)
+
+def run_ch(previous):
+    from graph.storage import load_graph
+    from routing.ch import ContractionHierarchy
+    G = load_graph(COMPACT_GRAPH_PATH)
+    for metric in CH_METRICS:
+        ContractionHierarchy.build(G, metric).save()
+
+# The DAG, in a valid run order. inputs/outputs are table names (resolved
+# through utils.io) or paths; a stage reruns when its code or inputs change.
+STAGES = {
+    'unzip': {
+        'run': run_unzip,
+        'deps': [],
+        'code': ['scripts/unzip_gtfs.py'],
+        'inputs': [GTFS_MAIN],
+        'outputs': [os.path.join(RAW_DIR, folder) for folder in FEEDS.values()]
+    },
+    'parse': {
+        'run': run_parse,
+        'deps': ['unzip'],
+        'code': ['scripts/parse_gtfs.py', 'scripts/unzip_gtfs.py'] + UTILS,
+        'inputs': [os.path.join(RAW_DIR, folder) for folder in FEEDS.values()],
+        'outputs': ['routes', 'stops_raw', 'trips', 'stop_times']
+    },
+    'stops': {
+        'run': run_stops,
+        'deps': ['parse'],
+        'code': ['scripts/build_graph/stops.py', 'scripts/graph/names.py', 'scripts/graph/components.py'] + UTILS,
+        'inputs': ['stops_raw'],
+        'outputs': ['stops_cleaned', 'stop_to_station_map']
+    },
+    'transfers': {
+        'run': run_transfers,
+        'deps': ['stops'],
+        'code': ['scripts/build_graph/transfers.py'] + UTILS,
+        'inputs': ['stops_cleaned'],
+        'outputs': ['transfers']
+    },
+    'edges': {
+        'run': run_edges,
+        'deps': ['parse', 'stops'],
+        'code': ['scripts/build_graph/edges.py'] + UTILS,
+        'inputs': ['stop_times', 'trips', 'routes', 'stop_to_station_map', 'stops_raw'],
+        'outputs': ['edges_raw']
+    },
+    'timetable': {
+        'run': run_timetable,
+        'deps': ['parse', 'stops', 'transfers'],
+        'code': ['scripts/routing/raptor.py', 'scripts/routing/route.py', 'scripts/build_graph/edges.py',
+                 'scripts/build_graph/build_graph.py', 'scripts/graph/emissions.py'] + UTILS,
+        'inputs': ['stop_times', 'trips', 'routes', 'stop_to_station_map', 'stops_cleaned', 'transfers'],
+        'outputs': [TIMETABLE_PATH]
+    },
+    'merge': {
+        'run': run_merge,
+        'deps': ['edges'],
+        'code': ['scripts/build_graph/merge.py'] + UTILS,
+        'inputs': ['edges_raw'],
+        'outputs': ['edges_merged', 'edge_stats']
+    },
+    'build_graph': {
+        'run': run_build_graph,
+        'deps': ['stops', 'transfers', 'merge'],
+        'code': ['scripts/build_graph/build_graph.py', 'scripts/graph/csr.py', 'scripts/graph/storage.py',
+                 'scripts/graph/emissions.py'] + UTILS,
+        'inputs': ['stops_cleaned', 'edges_merged', 'transfers'],
+        'outputs': [GRAPH_PATH, COMPACT_GRAPH_PATH]
+    },
+    'landmarks': {
+        'run': run_landmarks,
+        'deps': ['build_graph'],
+        'code': ['scripts/routing/alt.py', 'scripts/routing/dijkstra.py', 'scripts/graph/csr.py',
+                 'scripts/graph/storage.py'] + UTILS,
+        'inputs': [COMPACT_GRAPH_PATH],
+        'outputs': [LANDMARKS_PATH]
+    },
+    'ch': {
+        'run': run_ch,
+        'deps': ['build_graph'],
+        'code': ['scripts/routing/ch.py', 'scripts/routing/alt.py', 'scripts/graph/csr.py',
+                 'scripts/graph/storage.py'] + UTILS,
+        'inputs': [COMPACT_GRAPH_PATH],
+        'outputs': [CH_PATH.format(metric=metric) for metric in CH_METRICS]
+    }
+}
+
+def load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    return {'files': {}, 'stages': {}}
+
+def save_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def resolve(item):
+    """Path for a table name or plain path (None if a table does not exist yet)"""
+    if os.sep in item or '/' in item:
+        return item
+    try:
+        return find_table(item)[0]
+    except FileNotFoundError:
+        return None
+
+def file_hash(path, cache):
+    """
+    sha256 of a file's contents
+    Cached by (size, mtime) in the manifest so unchanged gigabyte inputs are not re-read.
+    """
+    stat = os.stat(path)
+    cached = cache.get(path)
+    if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return cached['sha256']
+    
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    
+    cache[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    return digest.hexdigest()
+
+def content_hash(item, cache):
+    """Hash of a table, file or directory (all files below it); None if missing"""
+    path = resolve(item)
+    if path is None or not os.path.exists(path):
+        return None
+    if not os.path.isdir(path):
+        return file_hash(path, cache)
+    
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode())
+            digest.update(file_hash(file_path, cache).encode())
+    return digest.hexdigest()
+
+def stage_fingerprint(name, stage, cache, params):
+    """Fingerprint of everything a stage's outputs depend on: code, inputs and parameters"""
+    parts = {
+        'code': {path: content_hash(path, cache) for path in stage['code']},
+        'inputs': {item: content_hash(item, cache) for item in stage['inputs']},
+        'params': params.get(name, {})
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest(), parts
+
+def feed_source_fingerprints(cache):
+    """
+    Per-feed_source fingerprint of what that feed's FEED_PARTITIONED rows are
+    parsed from, without reading the tables: the parse code, the feed's raw
+    FEED_FILES (hashes cached by size/mtime) and the CRC of its nested zip in GTFS_MAIN
+    """
+    parse_code = {path: content_hash(path, cache) for path in STAGES['parse']['code']}
+    members = {}
+    if os.path.exists(GTFS_MAIN):
+        with zipfile.ZipFile(GTFS_MAIN) as archive:
+            members = {info.filename: [info.CRC, info.file_size] for info in archive.infolist()}
+    
+    fingerprints = {}
+    for feed_id, folder in FEEDS.items():
+        parts = {
+            'code': parse_code,
+            'files': {name: content_hash(os.path.join(RAW_DIR, folder, name), cache) for name in FEED_FILES},
+            'zip': members.get(f'{feed_id}/google_transit.zip')
+        }
+        fingerprints[folder] = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+    return fingerprints
+
+def changed_feeds(previous, feed_fingerprints):
+    """
+    Feeds whose edges must be rebuilt, or None if edges need a full rebuild
+    Splicing is only safe when the previous edges_raw is intact and nothing
+    but the feed-partitioned tables changed since it was built.
+    """
+    if not previous or 'feeds' not in previous:
+        return None
+    
+    old_parts = previous.get('parts', {})
+    new_parts = previous.get('current_parts', {})
+    if old_parts.get('code') != new_parts.get('code'):
+        return None
+    for item in STAGES['edges']['inputs']:
+        if item not in FEED_PARTITIONED and old_parts['inputs'].get(item) != new_parts['inputs'].get(item):
+            return None
+    
+    # The previous edges_raw must be exactly what that run wrote
+    old_outputs = previous.get('outputs', {})
+    current_outputs = previous.get('current_outputs', {})
+    if any(digest is None or current_outputs.get(item) != digest for item, digest in old_outputs.items()):
+        return None
+    
+    old = previous['feeds']
+    return {feed for feed in set(old) | set(feed_fingerprints) if old.get(feed) != feed_fingerprints.get(feed)}
+
+def splice_edges(changed):
+    """
+    Rebuild edges for the changed feeds only and splice them into edges_raw
+    Gives the same rows in the same order as a full create_edges run, since
+    edges are ordered by trip_id and trips never span feeds.
+    """
+    from build_graph.edges import create_edges
+    
+    stop_times = read_table('stop_times', columns=['trip_id', 'feed_source'])
+    changed_trips = stop_times.loc[stop_times['feed_source'].astype(str).isin(changed), 'trip_id'].astype(str)
+    kept_trips = stop_times.loc[~stop_times['feed_source'].astype(str).isin(changed), 'trip_id'].astype(str)
+    
+    if np.intersect1d(pd.unique(changed_trips), pd.unique(kept_trips)).size > 0:
+        # A trip_id shared between feeds would pair across the split; rebuild everything
+        print("  ⚠ trip_ids shared between feeds, falling back to a full rebuild")
+        create_edges()
+        return
+    
+    old_edges = read_table('edges_raw')
+    kept = old_edges[old_edges['trip_id'].astype(str).isin(pd.unique(kept_trips))]
+    new_edges = create_edges(feeds=changed, save=False) if changed else old_edges.iloc[:0]
+    
+    edges = pd.concat([kept, new_edges], ignore_index=True)
+    edges = edges.sort_values('trip_id', kind='mergesort').reset_index(drop=True)
+    write_table(edges, 'edges_raw')
+    print(f"  ✓ Spliced {len(new_edges)} rebuilt edges into {len(kept)} kept edges")
+
+def plan(targets):
+    """Stages needed for targets (and their dependencies), in run order"""
+    needed = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage '{name}' (stages: {', '.join(STAGES)})")
+        if name not in needed:
+            needed.add(name)
+            stack.extend(STAGES[name]['deps'])
+    return [name for name in STAGES if name in needed]
+
+def run_pipeline(targets=None, force=False, from_zip=False):
+    """
+    Run the stages needed for targets (default: everything), skipping stages
+    whose recorded fingerprint and outputs are still valid.
+    from_zip: parse straight from data/gtfs.zip and drop the unzip stage.
+    """
+    stages = dict(STAGES)
+    if from_zip:
+        stages['parse'] = dict(
+            STAGES['parse'],
+            run=lambda previous: run_parse(previous, from_zip=True),
+            deps=[],
+            inputs=[GTFS_MAIN]
+        )
+        del stages['unzip']
+    
+    manifest = load_manifest()
+    cache = manifest['files']
+    # edges fingerprints raw feed files through the same file-hash cache
+    stages['edges'] = dict(STAGES['edges'], run=lambda previous: run_edges(previous, cache))
+    
+    names = plan(targets or stages)
+    names = [name for name in names if name in stages]
+    
+    # --force reruns the requested stages; their dependencies still run only if stale
+    forced = set(targets or names) if force else set()
+    
+    params = {'parse': {'from_zip': from_zip}}
+    
+    for name in names:
+        stage = stages[name]
+        fingerprint, parts = stage_fingerprint(name, stage, cache, params)
+        previous = manifest['stages'].get(name)
+        
+        up_to_date = (
+            name not in forced
+            and previous is not None
+            and previous['fingerprint'] == fingerprint
+            and all(content_hash(item, cache) == digest for item, digest in previous['outputs'].items())
+        )
+        if up_to_date:
+            print(f"[{name}] up to date, skipping")
+            continue
+        
+        print(f"[{name}] running...")
+        start = time.perf_counter()
+        if previous is not None:
+            current_outputs = {item: content_hash(item, cache) for item in previous['outputs']}
+            previous = dict(previous, current_parts=parts, current_outputs=current_outputs)
+        extra = stage['run'](None if name in forced else previous) or {}
+        
+        manifest['stages'][name] = dict(
+            extra,
+            fingerprint=fingerprint,
+            parts=parts,
+            outputs={item: content_hash(item, cache) for item in stage['outputs']}
+        )
+        save_manifest(manifest)
+        print(f"[{name}] done in {time.perf_counter() - start:.1f}s")
+    
+    save_manifest(manifest)
+
+if __name__ == "__main__":
+    # python scripts/pipeline.py [stage ...] [--force] [--from-zip]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    run_pipeline(args or None, force='--force' in sys.argv, from_zip='--from-zip' in sys.argv)
\ No newline at end of file
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append('scripts')
+from routing.cache import MAX_BYTES
+from routing.server import COMPACT_GRAPH_PATH, RouteService
+
+# Queries allowed to wait per kind before new ones are rejected with Overloaded
+MAX_PENDING = {'route': 1000, 'matrix': 16}
+
+# Per-process service, built once by _init_worker (maps the graph file)
+_service = None
+
+def _init_worker(graph_path, cache_bytes):
+    global _service
+    _service = RouteService(graph_path, cache_bytes)
+
+def _route(origin, destination, weight):
+    return _service.route(origin, destination, weight)
+
+def _matrix(origins, destinations, weight):
+    return _service.matrix(origins, destinations, weight)
+
+def _call_soon(loop, callback):
+    """Schedule callback on loop from a pool thread; ignored once the loop is closed"""
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        pass
+
+class Overloaded(RuntimeError):
+    """Too many queries of this kind are already waiting; retry later (e.g. HTTP 503)"""
+
+class AsyncRouter:
+    """
+    asyncio facade over RouteService: searches run in worker processes, never on the event loop
+    
+    - Route and matrix queries get separate process pools, so a burst of
+      matrix requests cannot starve single-route latency.
+    - At most one job per worker is submitted at a time; the rest wait here,
+      up to max_pending per kind, beyond which Overloaded is raised.
+    - Identical in-flight queries are coalesced onto one search.
+    - A cancelled caller (client disconnected) only stops the search when no
+      other caller is waiting on it, and only if it has not started yet.
+    
+        async with AsyncRouter() as router:
+            route = await router.route('19842', '19843')
+    """
+    
+    def __init__(self, graph_path=COMPACT_GRAPH_PATH, route_workers=None, matrix_workers=1,
+                 max_pending=None, cache_bytes=MAX_BYTES):
+        route_workers = route_workers or max((os.cpu_count() or 2) - matrix_workers, 1)
+        self._workers = {'route': route_workers, 'matrix': matrix_workers}
+        self._pools = {
+            kind: ProcessPoolExecutor(max_workers=n, initializer=_init_worker, initargs=(graph_path, cache_bytes))
+            for kind, n in self._workers.items()
+        }
+        self.max_pending = dict(MAX_PENDING, **(max_pending or {}))
+        
+        self._slots = {kind: asyncio.Semaphore(n) for kind, n in self._workers.items()}
+        self._pending = {kind: 0 for kind in self._workers}
+        self._inflight = {}
+        self.coalesced = 0
+        self.rejected = 0
+        self.cancelled = 0
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        self.close()
+    
+    def close(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    async def route(self, origin, destination, weight='time'):
+        """Route dict (None if unreachable); KeyError for unknown stations"""
+        key = ('route', str(origin), str(destination), weight)
+        return await self._query('route', key, _route, origin, destination, weight)
+    
+    async def matrix(self, origins, destinations, weight='time'):
+        """{metric: nested lists}, as RouteService.matrix"""
+        key = ('matrix', tuple(map(str, origins)), tuple(map(str, destinations)), weight)
+        return await self._query('matrix', key, _matrix, list(origins), list(destinations), weight)
+    
+    async def _query(self, kind, key, fn, *args):
+        entry = self._inflight.get(key)
+        if entry is None:
+            if self._pending[kind] >= self.max_pending[kind]:
+                self.rejected += 1
+                raise Overloaded(f"{self._pending[kind]} {kind} queries already waiting")
+            
+            self._pending[kind] += 1
+            entry = {'kind': kind, 'waiting': True, 'waiters': 0}
+            entry['task'] = asyncio.ensure_future(self._run(entry, fn, *args))
+            self._inflight[key] = entry
+            entry['task'].add_done_callback(lambda task: self._forget(key, entry))
+        else:
+            self.coalesced += 1
+        
+        entry['waiters'] += 1
+        try:
+            # shield: one caller going away must not cancel the search for the others
+            return await asyncio.shield(entry['task'])
+        except asyncio.CancelledError:
+            if entry['waiters'] == 1 and not entry['task'].done():
+                entry['task'].cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            entry['waiters'] -= 1
+    
+    def _forget(self, key, entry):
+        # A task cancelled before it first ran never got to leave the queue
+        self._leave_queue(entry)
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+    
+    def _leave_queue(self, entry):
+        if entry['waiting']:
+            entry['waiting'] = False
+            self._pending[entry['kind']] -= 1
+    
+    async def _run(self, entry, fn, *args):
+        """Wait for a free worker slot, then run fn in that kind's pool"""
+        kind = entry['kind']
+        loop = asyncio.get_running_loop()
+        slots = self._slots[kind]
+        try:
+            await slots.acquire()
+        finally:
+            self._leave_queue(entry)
+        
+        job = self._pools[kind].submit(fn, *args)
+        # The slot frees when the job really finishes, even if the caller stopped waiting
+        job.add_done_callback(lambda _: _call_soon(loop, slots.release))
+        try:
+            return await asyncio.wrap_future(job)
+        except asyncio.CancelledError:
+            job.cancel()
+            raise
+    
+    def stats(self):
+        return {
+            'workers': dict(self._workers),
+            'pending': dict(self._pending),
+            'inflight': len(self._inflight),
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'cancelled': self.cancelled
+        }
@@ -0,0 +1,147 @@
+import hashlib
+import math
+import sys
+import numpy as np
+sys.path.append('scripts')
+from utils.io import LANDMARKS_PATH, PROCESSED_DIR
+from routing.dijkstra import astar, dijkstra, path_edges
+from routing.route import route_from_edges
+
+# Major hubs always used as landmarks (matched on stop_name); the rest are
+# picked farthest-first so they spread out over the network
+HUB_LANDMARKS = ['Flinders Street', 'Southern Cross', 'Melbourne Central', 'Richmond']
+N_LANDMARKS = 16
+
+# Metrics we store lower bounds for
+METRICS = ['time', 'emissions']
+
+def graph_signature(G, metrics=()):
+    """
+    Fingerprint of a graph's node order, edges and the edge weights of metrics,
+    so files built for another graph or other weights are detected
+    """
+    digest = hashlib.sha256()
+    digest.update(f'{G.number_of_nodes()}:{G.number_of_edges()}'.encode())
+    for station_id in G.station_ids:
+        digest.update(str(station_id).encode() + b'\0')
+    digest.update(np.ascontiguousarray(G.indptr, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(G.indices, dtype=np.int32).tobytes())
+    for metric in metrics:
+        digest.update(metric.encode() + b'\0')
+        digest.update(np.ascontiguousarray(G.edge_attrs[metric], dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+def find_hub(G, name):
+    """Best-connected node whose stop_name contains name, or None"""
+    name = name.lower()
+    degree = np.diff(G.indptr)
+    matches = [u for u in range(G.number_of_nodes()) if name in str(G.node_attrs['stop_name'][u] or '').lower()]
+    return max(matches, key=lambda u: degree[u]) if matches else None
+
+class Landmarks:
+    """
+    Per-landmark shortest distances to and from every node
+    from_dist[metric][i, v] = d(L_i, v), to_dist[metric][i, v] = d(v, L_i)
+    By the triangle inequality d(v, t) >= d(v, L) - d(t, L) and
+    d(v, t) >= d(L, t) - d(L, v), which gives A* a lower bound per landmark.
+    """
+    
+    def __init__(self, nodes, from_dist, to_dist, signature):
+        self.nodes = np.asarray(nodes, dtype=np.int64)
+        self.from_dist = from_dist
+        self.to_dist = to_dist
+        self.signature = signature
+    
+    @classmethod
+    def build(cls, G, n_landmarks=N_LANDMARKS, hubs=HUB_LANDMARKS):
+        print(f"Selecting {n_landmarks} landmarks...")
+        reverse = G.reverse()
+        nodes = []
+        for name in hubs:
+            node = find_hub(G, name)
+            if node is not None and node not in nodes:
+                nodes.append(node)
+        nodes = nodes[:n_landmarks]
+        if not nodes:
+            nodes = [int(np.argmax(np.diff(G.indptr)))]
+        
+        from_dist = {metric: [] for metric in METRICS}
+        to_dist = {metric: [] for metric in METRICS}
+        closest = np.full(G.number_of_nodes(), np.inf)
+        
+        i = 0
+        while i < len(nodes):
+            landmark = nodes[i]
+            for metric in METRICS:
+                from_dist[metric].append(np.array(dijkstra(G, landmark, metric)[0]))
+                to_dist[metric].append(np.array(dijkstra(reverse, landmark, metric)[0]))
+            closest = np.minimum(closest, from_dist['time'][-1])
+            
+            # Farthest-first: next landmark is the reachable node farthest from all chosen ones
+            if i == len(nodes) - 1 and len(nodes) < n_landmarks:
+                score = np.where(np.isfinite(closest), closest, -1.0)
+                candidate = int(np.argmax(score))
+                if score[candidate] > 0:
+                    nodes.append(candidate)
+            i += 1
+        
+        print(f"  ✓ Landmarks: {', '.join(str(G.station_ids[u]) for u in nodes)}")
+        return cls(
+            nodes,
+            {metric: np.stack(from_dist[metric]) for metric in METRICS},
+            {metric: np.stack(to_dist[metric]) for metric in METRICS},
+            graph_signature(G, METRICS)
+        )
+    
+    def save(self, path=LANDMARKS_PATH):
+        arrays = {'nodes': self.nodes, 'signature': np.array(self.signature)}
+        arrays.update({f'from_{metric}': values for metric, values in self.from_dist.items()})
+        arrays.update({f'to_{metric}': values for metric, values in self.to_dist.items()})
+        np.savez(path, **arrays)
+    
+    @classmethod
+    def load(cls, G, path=LANDMARKS_PATH):
+        """Load landmarks built for G; ValueError if they were built for another graph"""
+        with np.load(path, allow_pickle=False) as data:
+            landmarks = cls(
+                data['nodes'],
+                {metric: data[f'from_{metric}'] for metric in METRICS},
+                {metric: data[f'to_{metric}'] for metric in METRICS},
+                str(data['signature'])
+            )
+        if landmarks.signature != graph_signature(G, METRICS):
+            raise ValueError(f"{path} was built for a different graph or other weights; rebuild landmarks")
+        return landmarks
+    
+    def heuristic(self, target, metric='time'):
+        """Lower bound on the metric from every node to target, as a list"""
+        from_dist = self.from_dist[metric]
+        to_dist = self.to_dist[metric]
+        with np.errstate(invalid='ignore'):
+            bounds = np.maximum(
+                to_dist - to_dist[:, target:target + 1],
+                from_dist[:, target:target + 1] - from_dist
+            )
+        # inf - inf (neither side reaches the landmark) says nothing
+        bounds = np.nan_to_num(bounds, nan=0.0, posinf=np.inf, neginf=0.0)
+        return np.maximum(bounds.max(axis=0), 0.0).tolist()
+
+def alt_route(G, landmarks, origin, destination, metric='time'):
+    """
+    A* with landmark bounds between two station IDs
+    Returns (Route or None, number of settled nodes).
+    """
+    source, target = G.node(origin), G.node(destination)
+    heuristic = landmarks.heuristic(target, metric)
+    cost, parent, settled = astar(G, source, target, heuristic, metric)
+    if cost == math.inf:
+        return None, settled
+    return route_from_edges(G, source, path_edges(G, parent, target)), settled
+
+if __name__ == "__main__":
+    # python scripts/routing/alt.py: build landmarks for pt_graph.bin
+    from graph.storage import load_graph
+    
+    G = load_graph(f'{PROCESSED_DIR}/pt_graph.bin')
+    Landmarks.build(G).save()
+    print(f"  ✓ Saved to {LANDMARKS_PATH}")
\ No newline at end of file
@@ -0,0 +1,124 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# Default memory budget of the cache and how often servers check for a rebuilt graph
+MAX_BYTES = 64 * 1024 * 1024
+CHECK_INTERVAL = 1.0       # seconds between graph fingerprint checks
+
+def graph_fingerprint(path):
+    """
+    Identity of a graph build: write_graph renames a new file into place,
+    so any rebuild changes the inode, size or mtime
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def value_size(value):
+    """
+    Approximate memory of a cached value in bytes: sys.getsizeof summed over
+    nested dicts, lists and tuples (shared strings are counted each time, so it errs high)
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(value_size(key) + value_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(value_size(item) for item in value)
+    return size
+
+class RouteCache:
+    """
+    LRU cache of route results keyed on (origin, destination, objective), bounded
+    by the estimated memory of the entries (value_size) rather than their count
+    Each result belongs to the graph snapshot it was computed on: reset(generation)
+    clears the cache for a new snapshot, and results computed on an older one are
+    then dropped instead of stored. Thread-safe.
+    """
+    
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        
+        self._entries = OrderedDict()   # key → (value, size)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.bytes = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def key(self, origin, destination, objective='time'):
+        return (str(origin), str(destination), objective)
+    
+    def reset(self, generation):
+        """Drop every entry; from now on only results computed on snapshot generation are stored"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self._generation = generation
+            self.invalidations += 1
+    
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+    
+    def put(self, key, value, generation=None):
+        """Store value; dropped if it was computed on another snapshot than the current one"""
+        size = value_size(key) + value_size(value)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+    
+    def get_or_compute(self, key, compute, generation=None):
+        """
+        Cached value for key, or compute() stored under it (None results are cached too)
+        generation: the snapshot compute() runs on; the result is only stored if
+        that is still the current one when it finishes
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value, generation)
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
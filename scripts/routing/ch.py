@@ -0,0 +1,299 @@
+import heapq
+import math
+import sys
+import time
+import numpy as np
+sys.path.append('scripts')
+from utils.io import CH_METRICS, CH_PATH, PROCESSED_DIR
+from graph.csr import array_view
+from routing.alt import graph_signature
+from routing.route import route_from_edges
+
+# Metrics we build hierarchies for
+METRICS = CH_METRICS
+
+# Witness searches give up after settling this many nodes; a shortcut may
+# then be added that was not strictly needed, which costs space, not correctness
+WITNESS_SETTLE_LIMIT = 500
+
+def _witness(out_adj, source, skip, targets, max_cost):
+    """Bounded Dijkstra from source avoiding skip; shortest known cost to each target"""
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    remaining = set(targets)
+    settled = 0
+    
+    while heap and remaining and settled < WITNESS_SETTLE_LIMIT:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        if d > max_cost:
+            break
+        settled += 1
+        remaining.discard(u)
+        for v, (weight, _) in out_adj[u].items():
+            if v == skip:
+                continue
+            nd = d + weight
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    
+    return dist
+
+def _needed_shortcuts(v, out_adj, in_adj):
+    """Shortcuts (u, w, weight, edge u→v, edge v→w) contracting v would require"""
+    shortcuts = []
+    outgoing = out_adj[v]
+    if not outgoing:
+        return shortcuts
+    for u, (w_uv, e_uv) in in_adj[v].items():
+        targets = [w for w in outgoing if w != u]
+        if not targets:
+            continue
+        max_cost = w_uv + max(outgoing[w][0] for w in targets)
+        dist = _witness(out_adj, u, v, targets, max_cost)
+        for w in targets:
+            w_vw, e_vw = outgoing[w]
+            weight = w_uv + w_vw
+            if dist.get(w, math.inf) > weight:
+                shortcuts.append((u, w, weight, e_uv, e_vw))
+    return shortcuts
+
+class ContractionHierarchy:
+    """
+    Contraction hierarchy for one metric over a CSRGraph
+    Every CH edge is either an original graph edge (orig = CSR position) or a
+    shortcut over two CH edges (child1 then child2). Queries search only
+    upward in rank from both ends: forward edges go from a node to a
+    higher-ranked head, backward edges are stored at their higher-ranked head.
+    """
+    
+    def __init__(self, arrays):
+        self.arrays = arrays
+        for name, values in arrays.items():
+            setattr(self, name, values)
+        self.metric = str(self.metric)
+        self.signature = str(self.signature)
+        
+        # Memoryviews for the query loops (see CSRGraph.adjacency_views): fast to
+        # index, and workers forked after loading share the arrays
+        self._fwd = tuple(array_view(values) for values in (self.fwd_ptr, self.fwd_head, self.fwd_edge))
+        self._bwd = tuple(array_view(values) for values in (self.bwd_ptr, self.bwd_tail, self.bwd_edge))
+        self._weight = array_view(self.edge_weight)
+        self._tail = array_view(self.edge_tail)
+        self._head = array_view(self.edge_head)
+        self._orig = array_view(self.edge_orig)
+        self._child1 = array_view(self.edge_child1)
+        self._child2 = array_view(self.edge_child2)
+    
+    @classmethod
+    def build(cls, G, metric='time'):
+        print(f"Contracting graph by {metric}...")
+        start = time.perf_counter()
+        n = G.number_of_nodes()
+        adj = G.adjacency_views()
+        cost = adj[metric]
+        
+        # CH edge table; originals first (cheapest parallel edge per pair)
+        edge_tail, edge_head, edge_weight, edge_child1, edge_child2, edge_orig = [], [], [], [], [], []
+        out_adj = [dict() for _ in range(n)]
+        in_adj = [dict() for _ in range(n)]
+        
+        def add_edge(u, w, weight, child1, child2, orig):
+            existing = out_adj[u].get(w)
+            if existing is not None and existing[0] <= weight:
+                return
+            e = len(edge_weight)
+            edge_tail.append(u)
+            edge_head.append(w)
+            edge_weight.append(weight)
+            edge_child1.append(child1)
+            edge_child2.append(child2)
+            edge_orig.append(orig)
+            out_adj[u][w] = (weight, e)
+            in_adj[w][u] = (weight, e)
+        
+        for u in range(n):
+            for e in range(adj['indptr'][u], adj['indptr'][u + 1]):
+                v = adj['indices'][e]
+                if v != u:
+                    add_edge(u, v, cost[e], -1, -1, e)
+        
+        # Node order by edge difference plus contracted neighbours, lazily updated
+        contracted_neighbours = [0] * n
+        
+        def priority(v):
+            shortcuts = _needed_shortcuts(v, out_adj, in_adj)
+            return len(shortcuts) - len(out_adj[v]) - len(in_adj[v]) + contracted_neighbours[v]
+        
+        heap = [(priority(v), v) for v in range(n)]
+        heapq.heapify(heap)
+        rank = np.zeros(n, dtype=np.int32)
+        order = 0
+        
+        while heap:
+            _, v = heapq.heappop(heap)
+            current = priority(v)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+            
+            for u, w, weight, e_uv, e_vw in _needed_shortcuts(v, out_adj, in_adj):
+                add_edge(u, w, weight, e_uv, e_vw, -1)
+            
+            # Remove v from the remaining graph
+            for w in out_adj[v]:
+                del in_adj[w][v]
+                contracted_neighbours[w] += 1
+            for u in in_adj[v]:
+                del out_adj[u][v]
+                contracted_neighbours[u] += 1
+            out_adj[v] = {}
+            in_adj[v] = {}
+            
+            rank[v] = order
+            order += 1
+        
+        edge_tail = np.array(edge_tail, dtype=np.int64)
+        edge_head = np.array(edge_head, dtype=np.int64)
+        upward = rank[edge_tail] < rank[edge_head]
+        
+        def csr(owner, other, mask):
+            ids = np.flatnonzero(mask)
+            ids = ids[np.argsort(owner[ids], kind='stable')]
+            ptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(owner[ids], minlength=n), out=ptr[1:])
+            return ptr, other[ids].astype(np.int32), ids.astype(np.int64)
+        
+        fwd_ptr, fwd_head, fwd_edge = csr(edge_tail, edge_head, upward)
+        bwd_ptr, bwd_tail, bwd_edge = csr(edge_head, edge_tail, ~upward)
+        
+        n_shortcuts = int(np.sum(np.array(edge_orig) < 0))
+        print(f"  ✓ {n_shortcuts} shortcuts in {time.perf_counter() - start:.1f}s")
+        
+        return cls({
+            'metric': np.array(metric),
+            'signature': np.array(graph_signature(G, [metric])),
+            'rank': rank,
+            'fwd_ptr': fwd_ptr, 'fwd_head': fwd_head, 'fwd_edge': fwd_edge,
+            'bwd_ptr': bwd_ptr, 'bwd_tail': bwd_tail, 'bwd_edge': bwd_edge,
+            'edge_tail': edge_tail.astype(np.int32),
+            'edge_head': edge_head.astype(np.int32),
+            'edge_weight': np.array(edge_weight, dtype=np.float64),
+            'edge_child1': np.array(edge_child1, dtype=np.int64),
+            'edge_child2': np.array(edge_child2, dtype=np.int64),
+            'edge_orig': np.array(edge_orig, dtype=np.int64)
+        })
+    
+    def save(self, path=None):
+        np.savez(path or CH_PATH.format(metric=self.metric), **self.arrays)
+    
+    @classmethod
+    def load(cls, G, metric='time', path=None):
+        """Load the hierarchy built for G; ValueError if it was built for another graph or other weights"""
+        path = path or CH_PATH.format(metric=metric)
+        with np.load(path, allow_pickle=False) as data:
+            ch = cls({name: data[name] for name in data.files})
+        if ch.metric != metric or ch.signature != graph_signature(G, [metric]):
+            raise ValueError(f"{path} was built for a different graph or other {metric} weights; rebuild the hierarchy")
+        return ch
+    
+    def nbytes(self):
+        """Index size in bytes"""
+        return sum(values.nbytes for values in self.arrays.values())
+    
+    def _unpack(self, e, out):
+        """Append the original CSR edges under CH edge e to out"""
+        stack = [e]
+        while stack:
+            e = stack.pop()
+            orig = self._orig[e]
+            if orig >= 0:
+                out.append(orig)
+            else:
+                stack.append(self._child2[e])
+                stack.append(self._child1[e])
+    
+    def query(self, source, target):
+        """
+        Bidirectional upward Dijkstra between node indices
+        Returns (cost, list of original CSR edge positions), cost inf if unreachable.
+        """
+        if source == target:
+            return 0.0, []
+        
+        dist = ({source: 0.0}, {target: 0.0})
+        parent = ({source: -1}, {target: -1})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        adjacency = (self._fwd, self._bwd)
+        weight = self._weight
+        best, meeting = math.inf, -1
+        
+        while heaps[0] or heaps[1]:
+            # Expand the side with the smaller queue head
+            side = 0 if heaps[0] and (not heaps[1] or heaps[0][0][0] <= heaps[1][0][0]) else 1
+            d, u = heapq.heappop(heaps[side])
+            if d >= best:
+                # Nothing left on this side can improve the meeting point
+                heaps[side].clear()
+                continue
+            if d > dist[side][u]:
+                continue
+            
+            other = dist[1 - side].get(u)
+            if other is not None and d + other < best:
+                best, meeting = d + other, u
+            
+            ptr, nodes, edge_ids = adjacency[side]
+            for i in range(ptr[u], ptr[u + 1]):
+                v, e = nodes[i], edge_ids[i]
+                nd = d + weight[e]
+                if nd < dist[side].get(v, math.inf):
+                    dist[side][v] = nd
+                    parent[side][v] = e
+                    heapq.heappush(heaps[side], (nd, v))
+        
+        if meeting < 0:
+            return math.inf, []
+        
+        # Source half: follow forward parents back from the meeting node
+        forward = []
+        u = meeting
+        while parent[0][u] >= 0:
+            e = parent[0][u]
+            forward.append(e)
+            u = self._tail[e]
+        edges = []
+        for e in reversed(forward):
+            self._unpack(e, edges)
+        
+        # Target half: backward parents lead from the meeting node towards target
+        u = meeting
+        while parent[1][u] >= 0:
+            e = parent[1][u]
+            self._unpack(e, edges)
+            u = self._head[e]
+        
+        return best, edges
+
+def ch_route(G, ch, origin, destination):
+    """
+    Station-to-station query through a ContractionHierarchy
+    Returns (cost, Route) with the unpacked path and edge attributes, or (inf, None).
+    """
+    source, target = G.node(origin), G.node(destination)
+    cost, edges = ch.query(source, target)
+    if cost == math.inf:
+        return cost, None
+    return cost, route_from_edges(G, source, edges)
+
+if __name__ == "__main__":
+    # python scripts/routing/ch.py: build hierarchies for pt_graph.bin
+    from graph.storage import load_graph
+    
+    G = load_graph(f'{PROCESSED_DIR}/pt_graph.bin')
+    for metric in METRICS:
+        ch = ContractionHierarchy.build(G, metric)
+        ch.save()
+        print(f"  ✓ Saved to {CH_PATH.format(metric=metric)} ({ch.nbytes() / 1e6:.1f} MB)")
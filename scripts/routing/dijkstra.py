@@ -0,0 +1,92 @@
+import heapq
+import math
+import sys
+sys.path.append('scripts')
+from routing.route import route_from_edges
+
+# Edge weights the searches understand (keys of CSRGraph.adjacency_views())
+WEIGHTS = ['time', 'emissions', 'distance']
+
+def dijkstra(G, source, weight='time', target=None):
+    """
+    Single-source shortest paths over a CSRGraph from node index source
+    Stops early once target (a node index) is settled.
+    Returns (dist list, parent edge list, number of settled nodes).
+    """
+    adj = G.adjacency_views()
+    indptr, indices, cost = adj['indptr'], adj['indices'], adj[weight]
+    
+    dist = [math.inf] * G.number_of_nodes()
+    parent = [-1] * G.number_of_nodes()
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    settled = 0
+    
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        settled += 1
+        if u == target:
+            break
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            nd = d + cost[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                parent[v] = e
+                heapq.heappush(heap, (nd, v))
+    
+    return dist, parent, settled
+
+def astar(G, source, target, heuristic, weight='time'):
+    """
+    A* from source to target (node indices) with a consistent heuristic
+    heuristic: sequence of lower bounds on the cost from each node to target
+    Returns (cost, parent edge list, number of settled nodes).
+    """
+    adj = G.adjacency_views()
+    indptr, indices, cost = adj['indptr'], adj['indices'], adj[weight]
+    
+    dist = {source: 0.0}
+    parent = {source: -1}
+    closed = set()
+    heap = [(heuristic[source], 0.0, source)]
+    
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u in closed:
+            continue
+        closed.add(u)
+        if u == target:
+            return d, parent, len(closed)
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            nd = d + cost[e]
+            if nd < dist.get(v, math.inf):
+                h = heuristic[v]
+                if h == math.inf:
+                    continue  # target provably unreachable from v
+                dist[v] = nd
+                parent[v] = e
+                heapq.heappush(heap, (nd + h, nd, v))
+    
+    return math.inf, parent, len(closed)
+
+def path_edges(G, parent, target):
+    """Edge positions from the search source to target, following parent edges"""
+    sources = G.adjacency_views()['sources']
+    edges = []
+    node = target
+    while parent[node] >= 0:
+        edges.append(parent[node])
+        node = sources[parent[node]]
+    return edges[::-1]
+
+def shortest_route(G, origin, destination, weight='time'):
+    """Dijkstra between two station IDs, as a Route (None if unreachable)"""
+    source, target = G.node(origin), G.node(destination)
+    dist, parent, _ = dijkstra(G, source, weight, target)
+    if dist[target] == math.inf:
+        return None
+    return route_from_edges(G, source, path_edges(G, parent, target))
\ No newline at end of file
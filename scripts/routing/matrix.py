@@ -0,0 +1,162 @@
+import gc
+import heapq
+import math
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+sys.path.append('scripts')
+from graph.storage import load_graph
+from utils.io import PROCESSED_DIR
+
+COMPACT_GRAPH_PATH = f'{PROCESSED_DIR}/pt_graph.bin'
+
+# Metrics every matrix reports, measured along the path that is best by `weight`
+MATRIX_METRICS = ['time', 'distance', 'emissions']
+
+def matrix_metrics(weight):
+    """MATRIX_METRICS, plus weight itself when it is an extra weight column (emissions scenario)"""
+    return MATRIX_METRICS + ([weight] if weight not in MATRIX_METRICS else [])
+
+# Origins per task; one task's rows are written to disk as soon as it finishes
+CHUNK_SIZE = 64
+
+# Per-process graph, mapped once by _init_worker. Every worker maps the same
+# file and searches memoryviews of its arrays (CSRGraph.adjacency_views), so
+# the graph is shared through the page cache, neither pickled nor copied.
+_graph = None
+
+def _init_worker(graph_path):
+    global _graph
+    _graph = load_graph(graph_path)
+    _graph.adjacency_views()
+
+def one_to_many(G, source, targets, weight='time'):
+    """
+    Dijkstra from node source until every node in targets is settled
+    Returns {metric: list over nodes} for matrix_metrics(weight) along the
+    best-by-weight paths (inf where unreachable or not reached).
+    """
+    metrics = matrix_metrics(weight)
+    adj = G.adjacency_views()
+    indptr, indices = adj['indptr'], adj['indices']
+    costs = [adj[metric] for metric in metrics]
+    key = metrics.index(weight)
+    
+    n = G.number_of_nodes()
+    values = [[math.inf] * n for _ in metrics]
+    for column in values:
+        column[source] = 0.0
+    dist = values[key]
+    heap = [(0.0, source)]
+    remaining = set(targets)
+    remaining.discard(source)
+    
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        remaining.discard(u)
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            nd = d + costs[key][e]
+            if nd < dist[v]:
+                # u is settled, so its other metrics are final along this path
+                for column, cost in zip(values, costs):
+                    column[v] = column[u] + cost[e]
+                heapq.heappush(heap, (nd, v))
+    
+    return dict(zip(metrics, values))
+
+def _matrix_rows(sources, targets, weight):
+    """Rows for a chunk of origins, in the worker process"""
+    rows = {metric: np.full((len(sources), len(targets)), np.inf) for metric in matrix_metrics(weight)}
+    for i, source in enumerate(sources):
+        if source < 0:
+            continue
+        values = one_to_many(_graph, source, [t for t in targets if t >= 0], weight)
+        for metric in rows:
+            column = values[metric]
+            rows[metric][i] = [column[t] if t >= 0 else math.inf for t in targets]
+    return rows
+
+def od_matrix(origins, destinations, weight='time', graph_path=COMPACT_GRAPH_PATH, out=None,
+              workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Origin-destination matrices between station IDs, one one-to-many search per origin
+    weight: which metric the paths minimise (time, distance, emissions or an extra
+    weight column); time, distance, emissions and the weight are all reported
+    along those paths. Unknown stations and unreachable pairs are inf.
+    out: path prefix; matrices are then written chunk by chunk to <out>_<metric>.npy
+    (memory-mapped, so they can be larger than RAM) and returned as memmaps.
+    Returns {metric: (len(origins), len(destinations)) float64 array}.
+    """
+    G = load_graph(graph_path)
+    weights = MATRIX_METRICS + G.extra_weights()
+    if weight not in weights:
+        raise ValueError(f"Unknown weight '{weight}' (expected one of {', '.join(weights)})")
+    metrics = matrix_metrics(weight)
+    sources = [G.index.get(station_id, -1) for station_id in origins]
+    targets = [G.index.get(station_id, -1) for station_id in destinations]
+    shape = (len(sources), len(targets))
+    
+    if out is None:
+        matrices = {metric: np.full(shape, np.inf) for metric in metrics}
+    else:
+        os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+        matrices = {
+            metric: np.lib.format.open_memmap(f'{out}_{metric}.npy', mode='w+', dtype=np.float64, shape=shape)
+            for metric in metrics
+        }
+    
+    print(f"Computing {shape[0]}×{shape[1]} matrix by {weight}...")
+    start = time.perf_counter()
+    # Workers fork from this process; frozen objects are skipped by their
+    # collector, so the pages they inherit stay shared (as in server.serve)
+    gc.collect()
+    gc.freeze()
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(graph_path,)) as pool:
+            futures = {
+                pool.submit(_matrix_rows, sources[i:i + chunk_size], targets, weight): i
+                for i in range(0, len(sources), chunk_size)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                rows = future.result()
+                for metric in metrics:
+                    matrices[metric][i:i + chunk_size] = rows[metric]
+    finally:
+        gc.unfreeze()
+    
+    if out is not None:
+        for matrix in matrices.values():
+            matrix.flush()
+    
+    print(f"  ✓ Done in {time.perf_counter() - start:.1f}s")
+    return matrices
+
+def stations_from_table(df, G=None):
+    """
+    Station IDs for a table of origins/destinations: a station_id column, or
+    stop_lat/stop_lon columns snapped to the nearest station
+    """
+    if 'station_id' in df.columns:
+        return df['station_id'].astype(str).tolist()
+    
+    from routing.snap import StationLocator
+    G = G or load_graph(COMPACT_GRAPH_PATH)
+    nodes, _ = StationLocator(G).nearest_batch(df['stop_lat'].to_numpy(), df['stop_lon'].to_numpy())
+    return [G.station_ids[u] if u >= 0 else None for u in nodes[:, 0]]
+
+if __name__ == "__main__":
+    # python scripts/routing/matrix.py ORIGINS.csv DESTINATIONS.csv OUT_PREFIX [time|distance|emissions|EXTRA_WEIGHT]
+    # CSVs have a station_id column, or stop_lat/stop_lon columns
+    origins = stations_from_table(pd.read_csv(sys.argv[1], dtype={'station_id': str}))
+    destinations = stations_from_table(pd.read_csv(sys.argv[2], dtype={'station_id': str}))
+    weight = sys.argv[4] if len(sys.argv) > 4 else 'time'
+    od_matrix(origins, destinations, weight, out=sys.argv[3])
+    print(f"  ✓ Saved {sys.argv[3]}_{{{','.join(matrix_metrics(weight))}}}.npy")
@@ -0,0 +1,140 @@
+import heapq
+import sys
+sys.path.append('scripts')
+from routing.route import route_from_edges
+
+# Default cap on labels kept per station; bounds work on dense parts of the network
+MAX_LABELS = 8
+
+def _dominates(a_time, a_emissions, a_changes, a_route, b_time, b_emissions, b_changes, b_route, at_target):
+    """
+    True if label a is at least as good as label b for every continuation
+    Away from the target, a label on a different route only dominates with
+    strictly fewer changes, since staying on b's route may save a change later.
+    """
+    if a_time > b_time or a_emissions > b_emissions or a_changes > b_changes:
+        return False
+    return at_target or a_route == b_route or a_changes < b_changes
+
+def pareto_routes(G, origin, destination, max_labels=MAX_LABELS, max_changes=None, max_time_ratio=None):
+    """
+    Pareto-optimal routes between two stations over travel time, emissions
+    and number of route/mode changes (multi-criteria label-setting search)
+    
+    G: CSRGraph; origin/destination: station IDs
+    max_labels: labels kept per station (bounds the search; may drop some
+        Pareto routes on very dense graphs)
+    max_changes: discard routes with more changes than this
+    max_time_ratio: discard routes slower than this multiple of the fastest
+    
+    Returns a list of Route sorted by time (fastest first).
+    """
+    source = G.node(origin)
+    target = G.node(destination)
+    if source == target:
+        return [route_from_edges(G, source, [])]
+    
+    adj = G.adjacency_views()
+    indptr, indices = adj['indptr'], adj['indices']
+    edge_time, edge_emissions, edge_route = adj['time'], adj['emissions'], adj['route']
+    
+    # Labels as parallel lists; label 0 is the origin
+    label_time = [0.0]
+    label_emissions = [0.0]
+    label_changes = [0]
+    label_route = [-1]
+    label_node = [source]
+    label_parent = [-1]
+    label_edge = [-1]
+    alive = [True]
+    
+    bags = {source: [0]}  # node → labels not (yet) dominated
+    heap = [(0.0, 0.0, 0, 0)]
+    results = []
+    time_limit = float('inf')
+    
+    while heap:
+        t, em, changes, label = heapq.heappop(heap)
+        if not alive[label]:
+            continue
+        if t > time_limit:
+            break
+        
+        u = label_node[label]
+        if u == target:
+            results.append(label)
+            if max_time_ratio is not None and len(results) == 1:
+                time_limit = t * max_time_ratio
+            continue
+        
+        route = label_route[label]
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            new_time = t + edge_time[e]
+            if new_time > time_limit:
+                continue
+            new_emissions = em + edge_emissions[e]
+            new_route = edge_route[e]
+            new_changes = changes + (1 if route >= 0 and new_route != route else 0)
+            if max_changes is not None and new_changes > max_changes:
+                continue
+            
+            # Target pruning: a route already found that is no worse anywhere
+            target_bag = bags.get(target, ())
+            if any(label_time[b] <= new_time and label_emissions[b] <= new_emissions and label_changes[b] <= new_changes
+                   for b in target_bag):
+                continue
+            
+            at_target = v == target
+            bag = bags.setdefault(v, [])
+            if any(_dominates(label_time[b], label_emissions[b], label_changes[b], label_route[b],
+                              new_time, new_emissions, new_changes, new_route, at_target)
+                   for b in bag):
+                continue
+            
+            # Drop labels the new one dominates
+            survivors = []
+            for b in bag:
+                if _dominates(new_time, new_emissions, new_changes, new_route,
+                              label_time[b], label_emissions[b], label_changes[b], label_route[b], at_target):
+                    alive[b] = False
+                else:
+                    survivors.append(b)
+            if len(survivors) >= max_labels:
+                bags[v] = survivors
+                continue
+            
+            new_label = len(label_time)
+            label_time.append(new_time)
+            label_emissions.append(new_emissions)
+            label_changes.append(new_changes)
+            label_route.append(new_route)
+            label_node.append(v)
+            label_parent.append(label)
+            label_edge.append(e)
+            alive.append(True)
+            survivors.append(new_label)
+            bags[v] = survivors
+            heapq.heappush(heap, (new_time, new_emissions, new_changes, new_label))
+    
+    routes = []
+    for label in results:
+        if not alive[label]:
+            continue
+        edges = []
+        while label_parent[label] >= 0:
+            edges.append(label_edge[label])
+            label = label_parent[label]
+        routes.append(route_from_edges(G, source, edges[::-1]))
+    
+    return sorted(routes, key=lambda r: (r.time, r.emissions, r.changes))
+
+if __name__ == "__main__":
+    # python scripts/routing/pareto.py ORIGIN_STATION_ID DESTINATION_STATION_ID
+    from graph.storage import load_graph
+    
+    G = load_graph('data/processed/pt_graph.bin')
+    for route in pareto_routes(G, sys.argv[1], sys.argv[2]):
+        print(f"{route.time/60:.1f} min, {route.emissions:.3f} kg CO2, {route.changes} changes")
+        for leg in route.legs:
+            print(f"    {leg.mode} {leg.route_name}: {leg.from_station} → {leg.to_station} ({len(leg.stations) - 1} stops)")
\ No newline at end of file
@@ -0,0 +1,468 @@
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append('scripts')
+from utils.geo import haversine_distances
+from utils.io import TIMETABLE_PATH, read_table
+from utils.time import parse_gtfs_time, parse_gtfs_times
+from routing.route import WALK_ROUTE_ID, WALK_ROUTE_NAME, Leg, Route
+
+# Rounds = max number of trips in a journey
+MAX_ROUNDS = 6
+
+# Minimum seconds between alighting and boarding another trip at a station
+CHANGE_TIME = 60
+
+INFINITY = 2**31 - 1
+
+class Timetable:
+    """
+    RAPTOR timetable at station level
+    Trips with the same route and station sequence form a pattern; each
+    pattern's trips are rows of an (n_trips × n_stops) block of arrival and
+    departure times, sorted so every column is non-decreasing (trips that
+    overtake each other are split into separate patterns).
+    Service calendars are not modelled: every trip is treated as running.
+    """
+    
+    def __init__(self, arrays):
+        self.arrays = arrays
+        for name, values in arrays.items():
+            setattr(self, name, values)
+        
+        self.index = {station_id: i for i, station_id in enumerate(self.station_ids)}
+        self.n_stations = len(self.station_ids)
+        
+        # Python-side views used by the scan loops
+        self._pattern_stops = [
+            self.pattern_stops[self.pattern_stop_ptr[p]:self.pattern_stop_ptr[p + 1]].tolist()
+            for p in range(len(self.pattern_route))
+        ]
+        self._station_patterns = [
+            list(zip(
+                self.station_patterns[self.station_pattern_ptr[s]:self.station_pattern_ptr[s + 1]].tolist(),
+                self.station_positions[self.station_pattern_ptr[s]:self.station_pattern_ptr[s + 1]].tolist()
+            ))
+            for s in range(self.n_stations)
+        ]
+        self._transfers = [
+            list(zip(
+                self.transfer_targets[self.transfer_ptr[s]:self.transfer_ptr[s + 1]].tolist(),
+                self.transfer_times[self.transfer_ptr[s]:self.transfer_ptr[s + 1]].tolist()
+            ))
+            for s in range(self.n_stations)
+        ]
+    
+    def pattern_times(self, p):
+        """(arrivals, departures) of pattern p as (n_trips × n_stops) views"""
+        n_stops = len(self._pattern_stops[p])
+        start, end = self.pattern_time_ptr[p], self.pattern_time_ptr[p + 1]
+        shape = ((end - start) // n_stops, n_stops)
+        return self.arrival_times[start:end].reshape(shape), self.departure_times[start:end].reshape(shape)
+    
+    @classmethod
+    def from_tables(cls, stop_times, trips, routes, stop_map, stations, emissions_factors, transfers=None):
+        """
+        Build from the processed tables
+        transfers: optional walking links (from_station, to_station, time, distance)
+        """
+        from build_graph.edges import get_mode_from_feed
+        
+        print("Building timetable...")
+        stop_to_station = stop_map.drop_duplicates(subset=['stop_id'], keep='last')
+        stop_to_station = pd.Series(
+            stop_to_station['station_id'].astype(str).to_numpy(),
+            index=stop_to_station['stop_id'].astype(str)
+        )
+        
+        st = pd.DataFrame({
+            'trip_id': stop_times['trip_id'].astype(str).to_numpy(),
+            'stop_sequence': stop_times['stop_sequence'].to_numpy(),
+            'station_id': stop_to_station.reindex(stop_times['stop_id'].astype(str)).to_numpy(),
+            'arrival': parse_gtfs_times(stop_times['arrival_time'].to_numpy()),
+            'departure': parse_gtfs_times(stop_times['departure_time'].to_numpy())
+        })
+        st = st[st['station_id'].notna()]
+        st = st.sort_values(['trip_id', 'stop_sequence'], kind='mergesort')
+        
+        # Consecutive stops at the same station collapse into one visit
+        new_trip = st['trip_id'].ne(st['trip_id'].shift())
+        new_visit = new_trip | st['station_id'].ne(st['station_id'].shift())
+        st = st.groupby(new_visit.cumsum().to_numpy(), sort=False).agg(
+            trip_id=('trip_id', 'first'),
+            station_id=('station_id', 'first'),
+            arrival=('arrival', 'first'),
+            departure=('departure', 'last')
+        )
+        
+        # Trips with one visit have no rides
+        visits = st.groupby('trip_id', sort=False)['station_id'].transform('size')
+        st = st[visits > 1]
+        
+        station_ids = pd.unique(pd.concat([
+            stations['station_id'].astype(str), st['station_id']
+        ], ignore_index=True))
+        station_index = pd.Index(station_ids)
+        st['station'] = station_index.get_indexer(st['station_id'])
+        
+        # Route and mode of every trip
+        trips = trips.drop_duplicates(subset=['trip_id'], keep='last')
+        routes = routes.drop_duplicates(subset=['route_id'], keep='last')
+        trip_info = pd.DataFrame({'trip_id': trips['trip_id'].astype(str), 'route_id': trips['route_id'].astype(str)})
+        route_info = pd.DataFrame({
+            'route_id': routes['route_id'].astype(str),
+            'route_name': routes['route_short_name'].astype(object) if 'route_short_name' in routes else None,
+            'mode': [get_mode_from_feed(f, t) for f, t in zip(routes['feed_source'], routes['route_type'])]
+        })
+        trip_info = trip_info.merge(route_info, on='route_id', how='left').set_index('trip_id')
+        st = st[st['trip_id'].isin(trip_info.index)]
+        
+        # Group trips into patterns by (route, station sequence)
+        sequences = st.groupby('trip_id', sort=False)['station'].agg(tuple)
+        trip_route = trip_info.loc[sequences.index, 'route_id'].to_numpy()
+        keys = pd.Series(list(zip(trip_route, sequences.to_numpy())))
+        pattern_codes, pattern_keys = pd.factorize(keys)
+        
+        trip_rows = st.groupby('trip_id', sort=False).indices
+        arrival = st['arrival'].to_numpy(np.int32)
+        departure = st['departure'].to_numpy(np.int32)
+        
+        # Split each pattern into FIFO groups so columns stay sorted
+        by_pattern = np.argsort(pattern_codes, kind='stable')
+        bounds = np.searchsorted(pattern_codes[by_pattern], np.arange(len(pattern_keys) + 1))
+        groups = []
+        for p, (route_id, stops) in enumerate(pattern_keys):
+            trip_ids = sequences.index[by_pattern[bounds[p]:bounds[p + 1]]]
+            blocks = sorted(
+                ((arrival[trip_rows[t]], departure[trip_rows[t]], t) for t in trip_ids),
+                key=lambda block: (block[1][0], block[0][-1])
+            )
+            fifo = []
+            for arr, dep, trip_id in blocks:
+                for group in fifo:
+                    last_arr, last_dep, _ = group[-1]
+                    if (arr >= last_arr).all() and (dep >= last_dep).all():
+                        group.append((arr, dep, trip_id))
+                        break
+                else:
+                    fifo.append([(arr, dep, trip_id)])
+            groups.extend((route_id, stops, group) for group in fifo)
+        
+        route_codes, route_labels = pd.factorize(pd.Series([g[0] for g in groups], dtype=object))
+        route_meta = trip_info.drop_duplicates(subset=['route_id']).set_index('route_id').reindex(route_labels)
+        
+        pattern_stop_ptr = np.zeros(len(groups) + 1, dtype=np.int64)
+        np.cumsum([len(g[1]) for g in groups], out=pattern_stop_ptr[1:])
+        pattern_time_ptr = np.zeros(len(groups) + 1, dtype=np.int64)
+        np.cumsum([len(g[1]) * len(g[2]) for g in groups], out=pattern_time_ptr[1:])
+        pattern_trip_ptr = np.zeros(len(groups) + 1, dtype=np.int64)
+        np.cumsum([len(g[2]) for g in groups], out=pattern_trip_ptr[1:])
+        
+        pattern_stops = np.concatenate([np.array(g[1], dtype=np.int32) for g in groups]) if groups else np.zeros(0, np.int32)
+        arrival_times = np.concatenate([np.stack([t[0] for t in g[2]]).ravel() for g in groups]) if groups else np.zeros(0, np.int32)
+        departure_times = np.concatenate([np.stack([t[1] for t in g[2]]).ravel() for g in groups]) if groups else np.zeros(0, np.int32)
+        trip_ids = np.array([t[2] for g in groups for t in g[2]], dtype=str)
+        
+        # Station → (pattern, position) incidence
+        pattern_of_stop = np.repeat(np.arange(len(groups), dtype=np.int32), np.diff(pattern_stop_ptr))
+        position_of_stop = np.arange(len(pattern_stops)) - np.repeat(pattern_stop_ptr[:-1], np.diff(pattern_stop_ptr))
+        order = np.argsort(pattern_stops, kind='stable')
+        station_pattern_ptr = np.zeros(len(station_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pattern_stops, minlength=len(station_ids)), out=station_pattern_ptr[1:])
+        
+        # Distance along each pattern, for leg distance and emissions
+        coords = stations.drop_duplicates(subset=['station_id'], keep='last')
+        coords = coords.set_index(coords['station_id'].astype(str))[['stop_lat', 'stop_lon']].reindex(station_ids)
+        lat = coords['stop_lat'].to_numpy(np.float64)
+        lon = coords['stop_lon'].to_numpy(np.float64)
+        segment = np.nan_to_num(haversine_distances(
+            lat[pattern_stops[:-1]], lon[pattern_stops[:-1]],
+            lat[pattern_stops[1:]], lon[pattern_stops[1:]]
+        ))
+        segment = np.concatenate([[0.0], segment])
+        segment[pattern_stop_ptr[:-1]] = 0.0  # no distance into a pattern's first stop
+        pattern_distance = np.cumsum(segment)
+        pattern_distance -= np.repeat(pattern_distance[pattern_stop_ptr[:-1]], np.diff(pattern_stop_ptr))
+        
+        modes = route_meta['mode'].fillna('bus').to_numpy(dtype=object)
+        factors = np.array([emissions_factors.get(mode, 0.1) for mode in modes], dtype=np.float64)
+        
+        # Walking transfers, if a transfers table was built
+        if transfers is None or len(transfers) == 0:
+            transfer_sources = np.zeros(0, np.int64)
+            transfer_targets = np.zeros(0, np.int32)
+            transfer_times = np.zeros(0, np.int32)
+        else:
+            sources = station_index.get_indexer(transfers['from_station'].astype(str))
+            targets = station_index.get_indexer(transfers['to_station'].astype(str))
+            valid = (sources >= 0) & (targets >= 0)
+            walk_order = np.argsort(sources[valid], kind='stable')
+            transfer_sources = sources[valid][walk_order]
+            transfer_targets = targets[valid][walk_order].astype(np.int32)
+            transfer_times = np.ceil(transfers['time'].to_numpy()[valid][walk_order]).astype(np.int32)
+        transfer_ptr = np.zeros(len(station_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(transfer_sources, minlength=len(station_ids)), out=transfer_ptr[1:])
+        
+        print(f"  ✓ {len(groups)} patterns, {len(trip_ids)} trips, {len(station_ids)} stations")
+        
+        return cls({
+            'station_ids': np.asarray(station_ids, dtype=str),
+            'pattern_route': route_codes.astype(np.int32),
+            'pattern_stop_ptr': pattern_stop_ptr,
+            'pattern_stops': pattern_stops,
+            'pattern_distance': pattern_distance,
+            'pattern_trip_ptr': pattern_trip_ptr,
+            'pattern_time_ptr': pattern_time_ptr,
+            'arrival_times': arrival_times.astype(np.int32),
+            'departure_times': departure_times.astype(np.int32),
+            'trip_ids': trip_ids,
+            'station_pattern_ptr': station_pattern_ptr,
+            'station_patterns': pattern_of_stop[order],
+            'station_positions': position_of_stop[order].astype(np.int32),
+            'transfer_ptr': transfer_ptr,
+            'transfer_targets': transfer_targets,
+            'transfer_times': transfer_times,
+            'route_ids': np.asarray(route_labels, dtype=str),
+            'route_names': route_meta['route_name'].fillna('').astype(str).to_numpy(dtype=str),
+            'route_modes': modes.astype(str),
+            'route_emissions_factors': factors
+        })
+    
+    @classmethod
+    def build(cls, save=True):
+        """Build from data/processed/ and optionally save to TIMETABLE_PATH"""
+        from build_graph.build_graph import EMISSIONS_FACTORS
+        
+        try:
+            transfers = read_table('transfers')
+        except FileNotFoundError:
+            transfers = None
+        
+        timetable = cls.from_tables(
+            read_table('stop_times', columns=['trip_id', 'stop_id', 'stop_sequence', 'arrival_time', 'departure_time']),
+            read_table('trips', columns=['trip_id', 'route_id']),
+            read_table('routes'),
+            read_table('stop_to_station_map'),
+            read_table('stops_cleaned'),
+            EMISSIONS_FACTORS,
+            transfers
+        )
+        if save:
+            timetable.save(TIMETABLE_PATH)
+            print(f"  ✓ Saved to {TIMETABLE_PATH}")
+        return timetable
+    
+    def save(self, path=TIMETABLE_PATH):
+        np.savez(path, **self.arrays)
+    
+    @classmethod
+    def load(cls, path=TIMETABLE_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+def _to_seconds(time):
+    return parse_gtfs_time(time) if isinstance(time, str) else int(time)
+
+def _scan(tt, source, target, departure, labels, best, parents, max_rounds, change_time):
+    """
+    One RAPTOR run from source at departure, improving labels/best/parents in place
+    labels[k][s]: earliest arrival at s with at most k trips
+    """
+    labels[0][source] = departure
+    best[source] = min(best[source], departure)
+    marked = {source}
+    
+    # Round 0: walk from the origin to nearby stations before the first trip
+    for t, walk in tt._transfers[source]:
+        arrival = departure + walk
+        if arrival < best[t] and arrival < best[target]:
+            labels[0][t] = arrival
+            best[t] = arrival
+            parents[0][t] = ('walk', source, walk, None)
+            marked.add(t)
+    
+    for k in range(1, max_rounds + 1):
+        previous = labels[k - 1]
+        previous_parents = parents[k - 1]
+        current = labels[k]
+        round_parents = parents[k]
+        
+        # Patterns serving a marked station, scanned from the earliest marked position
+        queue = {}
+        for s in marked:
+            for p, position in tt._station_patterns[s]:
+                if position < queue.get(p, INFINITY):
+                    queue[p] = position
+        marked = set()
+        
+        for p, start in queue.items():
+            stops = tt._pattern_stops[p]
+            arrivals, departures = tt.pattern_times(p)
+            trip = -1
+            board = -1
+            trip_arrivals = trip_departures = None
+            
+            for i in range(start, len(stops)):
+                s = stops[i]
+                if trip >= 0:
+                    arrival = trip_arrivals[i]
+                    if arrival < best[s] and arrival < best[target]:
+                        current[s] = arrival
+                        best[s] = arrival
+                        round_parents[s] = ('trip', p, trip, board, i)
+                        marked.add(s)
+                
+                # Can an earlier trip be caught here?
+                if previous[s] < INFINITY:
+                    # Change time only after alighting; a walk already covers the change
+                    alighted = previous_parents[s] is not None and previous_parents[s][0] == 'trip'
+                    ready = previous[s] + (change_time if alighted else 0)
+                    if trip < 0 or ready <= trip_departures[i]:
+                        t = int(np.searchsorted(departures[:, i], ready, side='left'))
+                        if t < len(departures) and (trip < 0 or t < trip):
+                            trip = t
+                            board = i
+                            trip_arrivals = arrivals[t].tolist()
+                            trip_departures = departures[t].tolist()
+        
+        # Walking transfers from stations reached by a trip in this round; each walk
+        # keeps the trip it follows, as a later walk may overwrite that station's label
+        for s, alighted, trip_parent in [(s, current[s], round_parents[s]) for s in marked]:
+            for t, walk in tt._transfers[s]:
+                arrival = alighted + walk
+                if arrival < best[t] and arrival < best[target]:
+                    current[t] = arrival
+                    best[t] = arrival
+                    round_parents[t] = ('walk', s, walk, trip_parent)
+                    marked.add(t)
+        
+        if not marked:
+            break
+
+def _journey(tt, source, target, departure, labels, parents, max_rounds):
+    """Reconstruct the earliest arriving journey (fewest trips on ties) as a Route"""
+    rounds = [k for k in range(max_rounds + 1) if labels[k][target] < INFINITY]
+    if not rounds:
+        return None
+    k = min(rounds, key=lambda k: (labels[k][target], k))
+    
+    legs = []
+    s = target
+    parent = parents[k][s]
+    while s != source:
+        if parent[0] == 'walk':
+            _, from_station, walk, parent = parent
+            arrival = labels[k][s]
+            legs.append(Leg(
+                WALK_ROUTE_ID, WALK_ROUTE_NAME, 'walk', [tt.station_ids[from_station], tt.station_ids[s]],
+                time=float(walk), departure=arrival - walk, arrival=arrival
+            ))
+            s = from_station
+            continue
+        
+        _, p, trip, board, alight = parent
+        stops = tt._pattern_stops[p]
+        arrivals, departures = tt.pattern_times(p)
+        route = tt.pattern_route[p]
+        distance = tt.pattern_distance[tt.pattern_stop_ptr[p] + alight] - tt.pattern_distance[tt.pattern_stop_ptr[p] + board]
+        legs.append(Leg(
+            str(tt.route_ids[route]), str(tt.route_names[route]), str(tt.route_modes[route]),
+            [tt.station_ids[x] for x in stops[board:alight + 1]],
+            time=float(arrivals[trip, alight] - departures[trip, board]),
+            distance=float(distance),
+            emissions=float(distance / 1000 * tt.route_emissions_factors[route]),
+            departure=int(departures[trip, board]),
+            arrival=int(arrivals[trip, alight])
+        ))
+        s = stops[board]
+        k -= 1
+        parent = parents[k][s]
+    
+    legs.reverse()
+    arrival = legs[-1].arrival
+    return Route(
+        legs=legs,
+        time=float(arrival - departure),
+        distance=sum(leg.distance for leg in legs),
+        emissions=sum(leg.emissions for leg in legs),
+        changes=max(sum(1 for leg in legs if leg.mode != 'walk') - 1, 0),
+        departure=departure,
+        arrival=arrival
+    )
+
+def _empty_labels(tt, max_rounds):
+    labels = [[INFINITY] * tt.n_stations for _ in range(max_rounds + 1)]
+    parents = [[None] * tt.n_stations for _ in range(max_rounds + 1)]
+    return labels, parents, [INFINITY] * tt.n_stations
+
+def earliest_arrival(tt, origin, destination, departure, max_rounds=MAX_ROUNDS, change_time=CHANGE_TIME):
+    """
+    Earliest-arrival journey leaving origin station at or after departure
+    departure: seconds since midnight or a GTFS 'HH:MM:SS' string
+    Returns a Route with per-leg departure/arrival times and emissions, or None.
+    """
+    source, target = tt.index[origin], tt.index[destination]
+    departure = _to_seconds(departure)
+    if source == target:
+        return Route(departure=departure, arrival=departure)
+    labels, parents, best = _empty_labels(tt, max_rounds)
+    _scan(tt, source, target, departure, labels, best, parents, max_rounds, change_time)
+    return _journey(tt, source, target, departure, labels, parents, max_rounds)
+
+def departures_from(tt, station, start, end):
+    """Distinct departure times from a station in [start, end], latest first"""
+    times = set()
+    for p, position in tt._station_patterns[station]:
+        if position == len(tt._pattern_stops[p]) - 1:
+            continue
+        _, departures = tt.pattern_times(p)
+        column = departures[:, position]
+        lo = np.searchsorted(column, start, side='left')
+        hi = np.searchsorted(column, end, side='right')
+        times.update(column[lo:hi].tolist())
+    return sorted(times, reverse=True)
+
+def range_query(tt, origin, destination, start, end, max_rounds=MAX_ROUNDS, change_time=CHANGE_TIME):
+    """
+    All useful journeys departing in [start, end] (rRAPTOR)
+    Departures are scanned latest first, reusing labels, so each run only
+    explores what later departures could not already reach.
+    Returns Routes sorted by departure, none dominated by a later departure
+    that arrives no later.
+    """
+    source, target = tt.index[origin], tt.index[destination]
+    start, end = _to_seconds(start), _to_seconds(end)
+    labels, parents, best = _empty_labels(tt, max_rounds)
+    
+    # Departures from the origin, and from stations a walk away (leaving earlier by the walk)
+    candidates = set(departures_from(tt, source, start, end))
+    for t, walk in tt._transfers[source]:
+        candidates.update(d - walk for d in departures_from(tt, t, start + walk, end + walk))
+    
+    journeys = []
+    latest_arrival = INFINITY
+    for departure in sorted(candidates, reverse=True):
+        _scan(tt, source, target, departure, labels, best, parents, max_rounds, change_time)
+        route = _journey(tt, source, target, departure, labels, parents, max_rounds)
+        if route is not None and route.arrival < latest_arrival:
+            # Leave when the first vehicle actually departs
+            route.departure = route.legs[0].departure
+            route.time = float(route.arrival - route.departure)
+            journeys.append(route)
+            latest_arrival = route.arrival
+    
+    return journeys[::-1]
+
+if __name__ == "__main__":
+    # python scripts/routing/raptor.py [--build] ORIGIN DESTINATION HH:MM:SS
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    timetable = Timetable.build() if '--build' in sys.argv else Timetable.load()
+    if len(args) == 3:
+        route = earliest_arrival(timetable, *args)
+        if route is None:
+            print("No journey found")
+        else:
+            for leg in route.legs:
+                print(f"  {leg.mode} {leg.route_name or ''}: {leg.from_station} → {leg.to_station} "
+                      f"({leg.departure} → {leg.arrival}s, {leg.emissions:.3f} kg CO2)")
+            print(f"  Arrive {route.arrival}s, {route.time/60:.1f} min, {route.emissions:.3f} kg CO2")
\ No newline at end of file
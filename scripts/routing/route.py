@@ -0,0 +1,106 @@
+from dataclasses import dataclass, field
+
+# Walking legs from every engine look like the graph's walking edges
+# (build_graph.edge_table), so consumers and caches can treat them alike
+WALK_ROUTE_ID = 'walk'
+WALK_ROUTE_NAME = 'Walk'
+
+@dataclass
+class Leg:
+    """Consecutive edges ridden on one route (or walked)"""
+    route_id: object
+    route_name: object
+    mode: str
+    stations: list          # station IDs, first is the boarding station
+    time: float = 0.0       # seconds
+    distance: float = 0.0   # meters
+    emissions: float = 0.0  # kg CO2
+    departure: int = None   # seconds since midnight, for timetable routes
+    arrival: int = None
+    
+    @property
+    def from_station(self):
+        return self.stations[0]
+    
+    @property
+    def to_station(self):
+        return self.stations[-1]
+    
+    def to_dict(self):
+        return {
+            'route_id': self.route_id,
+            'route_name': self.route_name,
+            'mode': self.mode,
+            'from_station': self.from_station,
+            'to_station': self.to_station,
+            'stations': list(self.stations),
+            'time': self.time,
+            'distance': self.distance,
+            'emissions': self.emissions,
+            'departure': self.departure,
+            'arrival': self.arrival
+        }
+
+@dataclass
+class Route:
+    """A route between two stations, as returned by the search engines"""
+    legs: list = field(default_factory=list)
+    time: float = 0.0       # seconds, including any waiting
+    distance: float = 0.0   # meters
+    emissions: float = 0.0  # kg CO2
+    changes: int = 0        # route/mode changes between legs
+    departure: int = None   # seconds since midnight, for timetable routes
+    arrival: int = None
+    
+    @property
+    def stations(self):
+        """Every station passed through, origin first"""
+        if not self.legs:
+            return []
+        stations = list(self.legs[0].stations)
+        for leg in self.legs[1:]:
+            stations.extend(leg.stations[1:])
+        return stations
+    
+    @property
+    def modes(self):
+        return [leg.mode for leg in self.legs]
+    
+    def to_dict(self):
+        return {
+            'time': self.time,
+            'distance': self.distance,
+            'emissions': self.emissions,
+            'changes': self.changes,
+            'departure': self.departure,
+            'arrival': self.arrival,
+            'legs': [leg.to_dict() for leg in self.legs]
+        }
+
+def route_from_edges(G, origin, edges):
+    """
+    Build a Route from a path of CSRGraph edge positions starting at node origin
+    Edges on the same route_id are merged into one leg.
+    """
+    route = Route()
+    node = origin
+    for e in edges:
+        data = G.edge_data(e)
+        next_node = int(G.indices[e])
+        
+        leg = route.legs[-1] if route.legs else None
+        if leg is None or leg.route_id != data['route_id'] or leg.mode != data['mode']:
+            leg = Leg(data['route_id'], data['route_name'], data['mode'], [G.station_ids[node]])
+            route.legs.append(leg)
+        
+        leg.stations.append(G.station_ids[next_node])
+        leg.time += data['time']
+        leg.distance += data['distance']
+        leg.emissions += data['emissions']
+        node = next_node
+    
+    route.time = sum(leg.time for leg in route.legs)
+    route.distance = sum(leg.distance for leg in route.legs)
+    route.emissions = sum(leg.emissions for leg in route.legs)
+    route.changes = max(len(route.legs) - 1, 0)
+    return route
\ No newline at end of file
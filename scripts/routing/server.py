@@ -0,0 +1,357 @@
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+sys.path.append('scripts')
+from graph.storage import GraphFormatError, load_graph
+from routing.cache import CHECK_INTERVAL, MAX_BYTES, RouteCache, graph_fingerprint
+from routing.ch import METRICS as CH_METRICS, ContractionHierarchy, ch_route
+from routing.dijkstra import WEIGHTS, shortest_route
+from routing.matrix import MATRIX_METRICS, matrix_metrics, one_to_many
+from utils.io import PROCESSED_DIR
+
+COMPACT_GRAPH_PATH = f'{PROCESSED_DIR}/pt_graph.bin'
+DEFAULT_PORT = 8080
+
+# Limits per request, so one client cannot tie up a worker indefinitely
+MAX_BATCH = 1000
+MAX_MATRIX_CELLS = 250_000
+
+class GraphSnapshot:
+    """
+    A loaded graph with the contraction hierarchies built for it, made whole
+    before RouteService swaps it in, so a query never mixes two graph builds
+    """
+    
+    def __init__(self, graph_path, generation=0):
+        # Taken before loading: a rebuild during the load shows up at the next check
+        self.fingerprint = graph_fingerprint(graph_path)
+        self.generation = generation
+        self.G = load_graph(graph_path)
+        self.G.adjacency_views()   # views only; the edge arrays stay in the mapped file
+        self.G.name_index()
+        
+        # Contraction hierarchies where they have been built for this graph
+        self.hierarchies = {}
+        for metric in CH_METRICS:
+            try:
+                self.hierarchies[metric] = ContractionHierarchy.load(self.G, metric)
+            except (FileNotFoundError, ValueError):
+                pass
+
+class RouteService:
+    """
+    Query logic behind the server, read-only once constructed
+    Built before workers fork: the graph is an mmap of pt_graph.bin and searches
+    index memoryviews of it (CSRGraph.adjacency_views), so every worker shares
+    its pages instead of holding its own copy. Route results are cached per worker.
+    When pt_graph.bin is rebuilt, one thread loads a new GraphSnapshot while the
+    others keep answering from the old one, then swaps it in with one assignment;
+    results still being computed on the old snapshot are not cached.
+    """
+    
+    def __init__(self, graph_path=COMPACT_GRAPH_PATH, cache_bytes=MAX_BYTES, check_interval=CHECK_INTERVAL):
+        self.graph_path = graph_path
+        self.check_interval = check_interval
+        self.snapshot = GraphSnapshot(graph_path)
+        self.cache = RouteCache(cache_bytes) if cache_bytes else None
+        self._checked = time.monotonic()
+        self._reload_lock = threading.Lock()
+    
+    @property
+    def G(self):
+        return self.snapshot.G
+    
+    def current(self):
+        """The snapshot to answer a query from, after reloading it if pt_graph.bin was rebuilt"""
+        snapshot = self.snapshot
+        if time.monotonic() - self._checked < self.check_interval:
+            return snapshot
+        # One thread checks and reloads; the rest carry on with the snapshot they have
+        if not self._reload_lock.acquire(blocking=False):
+            return snapshot
+        try:
+            self._checked = time.monotonic()
+            if graph_fingerprint(self.graph_path) == snapshot.fingerprint:
+                return snapshot
+            try:
+                snapshot = GraphSnapshot(self.graph_path, snapshot.generation + 1)
+            except (OSError, GraphFormatError) as e:
+                print(f"  ⚠ Keeping the loaded graph, reload failed: {e}")
+                return snapshot
+            if self.cache is not None:
+                self.cache.reset(snapshot.generation)
+            self.snapshot = snapshot
+            return snapshot
+        finally:
+            self._reload_lock.release()
+    
+    def info(self):
+        snapshot = self.snapshot
+        return {
+            'pid': os.getpid(),
+            'nodes': snapshot.G.number_of_nodes(),
+            'edges': snapshot.G.number_of_edges(),
+            'generation': snapshot.generation,
+            'hierarchies': sorted(snapshot.hierarchies),
+            'weights': WEIGHTS + snapshot.G.extra_weights(),
+            'cache': self.cache.stats() if self.cache is not None else None,
+            'memory': memory_usage()
+        }
+    
+    def route(self, origin, destination, weight='time'):
+        """Route dict between two station IDs (None if unreachable); KeyError for unknown stations"""
+        snapshot = self.current()
+        weights = WEIGHTS + snapshot.G.extra_weights()
+        if weight not in weights:
+            raise ValueError(f"Unknown weight '{weight}' (expected one of {', '.join(weights)})")
+        if self.cache is None:
+            return self._route(snapshot, origin, destination, weight)
+        key = self.cache.key(origin, destination, weight)
+        return self.cache.get_or_compute(key, lambda: self._route(snapshot, origin, destination, weight),
+                                         snapshot.generation)
+    
+    @staticmethod
+    def _route(snapshot, origin, destination, weight):
+        if weight in snapshot.hierarchies:
+            _, route = ch_route(snapshot.G, snapshot.hierarchies[weight], origin, destination)
+        else:
+            route = shortest_route(snapshot.G, origin, destination, weight)
+        return route.to_dict() if route else None
+    
+    def batch(self, queries):
+        """Answer many route queries in one request; errors are reported per query"""
+        if len(queries) > MAX_BATCH:
+            raise ValueError(f"At most {MAX_BATCH} queries per batch")
+        results = []
+        for query in queries:
+            try:
+                origin, destination = required(query, 'from', 'to')
+                results.append({'route': self.route(origin, destination, query.get('weight', 'time'))})
+            except KeyError as e:
+                results.append({'error': f"Unknown station {e}"})
+            except ValueError as e:
+                results.append({'error': str(e)})
+        return results
+    
+    def matrix(self, origins, destinations, weight='time'):
+        """{metric: nested lists} along best-by-weight paths; null where unreachable"""
+        G = self.current().G
+        weights = MATRIX_METRICS + G.extra_weights()
+        if weight not in weights:
+            raise ValueError(f"Unknown weight '{weight}' (expected one of {', '.join(weights)})")
+        if len(origins) * len(destinations) > MAX_MATRIX_CELLS:
+            raise ValueError(f"At most {MAX_MATRIX_CELLS} matrix cells per request")
+        targets = [G.node(station_id) for station_id in destinations]
+        rows = {metric: [] for metric in matrix_metrics(weight)}
+        for station_id in origins:
+            values = one_to_many(G, G.node(station_id), targets, weight)
+            for metric in rows:
+                rows[metric].append([values[metric][t] if values[metric][t] != float('inf') else None
+                                     for t in targets])
+        return rows
+    
+    def stations(self, query, limit=10):
+        return [
+            {'station_id': station_id, 'stop_name': name, 'score': score}
+            for station_id, name, score in self.current().G.find_stations(query, limit)
+        ]
+
+def required(fields, *names):
+    """Values of the named request fields; ValueError (400, not 404) if any is missing"""
+    if not isinstance(fields, dict):
+        raise ValueError("Expected a JSON object")
+    missing = [name for name in names if name not in fields]
+    if missing:
+        raise ValueError(f"Missing {', '.join(repr(name) for name in missing)}")
+    return tuple(fields[name] for name in names)
+
+def memory_usage():
+    """
+    Resident and private (unshared) memory of this process in MB, from
+    /proc/self/smaps_rollup; None where that is not available. Workers that
+    share the graph have a large RSS but a small private part.
+    """
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+    except OSError:
+        return None
+    kb = {name: int(value.split()[0]) for name, value in fields.items() if value.strip().endswith('kB')}
+    return {
+        'rss_mb': kb.get('Rss', 0) / 1024,
+        'private_mb': (kb.get('Private_Clean', 0) + kb.get('Private_Dirty', 0)) / 1024
+    }
+
+def _json_default(value):
+    """numpy scalars and the like that json cannot encode by itself"""
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class RouteHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health
+    GET  /route?from=ID&to=ID[&weight=time|emissions|distance|<emissions scenario>]
+    GET  /stations?q=NAME[&limit=10]
+    POST /batch   {"queries": [{"from": ID, "to": ID, "weight": ...}, ...]}
+    POST /matrix  {"origins": [ID, ...], "destinations": [ID, ...], "weight": ...}
+    """
+    protocol_version = 'HTTP/1.1'  # keep-alive, so load tests do not pay a connect per request
+    wbufsize = 1 << 16             # headers and body leave in one write (no Nagle/delayed-ACK stall)
+    
+    def address_string(self):
+        # Unix sockets have no client address
+        return self.client_address[0] if self.client_address else 'unix'
+    
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+    
+    def _send(self, status, body):
+        data = json.dumps(body, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _handle(self, action):
+        try:
+            self._send(200, action())
+        except KeyError as e:
+            self._send(404, {'error': f"Unknown station {e}"})
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        service = self.server.service
+        
+        if url.path == '/health':
+            self._handle(service.info)
+        elif url.path == '/route':
+            self._handle(lambda: {'route': service.route(*required(params, 'from', 'to'), params.get('weight', 'time'))})
+        elif url.path == '/stations':
+            self._handle(lambda: service.stations(params.get('q', ''), int(params.get('limit', 10))))
+        else:
+            self._send(404, {'error': f"No such endpoint {url.path}"})
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError as e:
+            self._send(400, {'error': f"Invalid JSON: {e}"})
+            return
+        service = self.server.service
+        
+        if url.path == '/batch':
+            self._handle(lambda: service.batch(*required(body, 'queries')))
+        elif url.path == '/matrix':
+            self._handle(lambda: service.matrix(*required(body, 'origins', 'destinations'), body.get('weight', 'time')))
+        else:
+            self._send(404, {'error': f"No such endpoint {url.path}"})
+
+class RouteServer(ThreadingHTTPServer):
+    """
+    One per worker process; a thread per connection, so an idle keep-alive
+    client cannot hold the whole worker
+    """
+    
+    def __init__(self, address, service, family=socket.AF_INET, verbose=False):
+        self.address_family = family
+        self.service = service
+        self.verbose = verbose
+        super().__init__(address, RouteHandler)
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None, workers=None,
+          graph_path=COMPACT_GRAPH_PATH, cache_bytes=MAX_BYTES, verbose=False):
+    """
+    Load the graph once, bind, then fork workers that all accept on the same socket
+    Falls back to a single process where fork is not available.
+    """
+    service = RouteService(graph_path, cache_bytes)
+    
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = RouteServer(unix_socket, service, socket.AF_UNIX, verbose)
+        where = unix_socket
+    else:
+        server = RouteServer((host, port), service, socket.AF_INET, verbose)
+        where = f'http://{host}:{server.server_address[1]}'
+    
+    workers = workers or os.cpu_count() or 1
+    if not hasattr(os, 'fork'):
+        workers = 1
+    print(f"Serving {service.G.number_of_nodes()} stations on {where} with {workers} worker(s)")
+    
+    if workers == 1:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+    
+    # Everything loaded so far goes to a generation the collector never scans,
+    # so collections in the children do not write to (and copy) those pages
+    gc.collect()
+    gc.freeze()
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            os.waitpid(pid, 0)
+    finally:
+        server.server_close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+if __name__ == "__main__":
+    # python scripts/routing/server.py [--port 8080 | --unix PATH] [--workers N] [--cache MB] [--verbose]
+    args = sys.argv[1:]
+    
+    def option(name, default=None):
+        return args[args.index(name) + 1] if name in args else default
+    
+    serve(
+        port=int(option('--port', DEFAULT_PORT)),
+        unix_socket=option('--unix'),
+        workers=int(option('--workers', 0)) or None,
+        cache_bytes=int(float(option('--cache', MAX_BYTES / 2**20)) * 2**20),
+        verbose='--verbose' in args
+    )
@@ -0,0 +1,155 @@
+import heapq
+import math
+import sys
+sys.path.append('scripts')
+from utils.geo import haversine_distance
+from utils.spatial import GridIndex
+from build_graph.transfers import WALK_DETOUR, WALK_SPEED
+from routing.route import WALK_ROUTE_ID, WALK_ROUTE_NAME, Leg, Route, route_from_edges
+
+# Stations considered for walking to/from an arbitrary point
+ACCESS_RADIUS = 800     # meters, straight line
+ACCESS_CANDIDATES = 8   # nearest stations tried when none are within ACCESS_RADIUS
+
+def point_label(lat, lon):
+    """Stand-in 'station ID' for a coordinate at the end of an access/egress leg"""
+    return f'{lat:.6f},{lon:.6f}'
+
+def walk_leg(start, end, straight_distance):
+    """Walking Leg between two labels, costed like the walking transfers"""
+    distance = float(straight_distance) * WALK_DETOUR
+    return Leg(WALK_ROUTE_ID, WALK_ROUTE_NAME, 'walk', [start, end], time=distance / WALK_SPEED, distance=distance)
+
+class StationLocator:
+    """
+    Nearest-station lookups over a CSRGraph's node lat/lon
+    Single queries return [(station_id, meters), ...]; the *_batch methods take
+    coordinate arrays and return node indices for thousands of points at once.
+    """
+    
+    def __init__(self, G, cell_size=500):
+        self.G = G
+        self.index = GridIndex(G.node_attrs['lat'], G.node_attrs['lon'], cell_size=cell_size)
+    
+    def nearest_batch(self, lats, lons, k=1):
+        """(nodes, meters) arrays of shape (n_points, k); -1 / inf where there are fewer than k"""
+        return self.index.nearest(lats, lons, k)
+    
+    def within_batch(self, lats, lons, radius):
+        """(point position, node, meters) arrays, sorted by point then distance"""
+        return self.index.within(lats, lons, radius)
+    
+    def nearest(self, lat, lon, k=1):
+        nodes, distances = self.nearest_batch([lat], [lon], k)
+        return [(self.G.station_ids[u], float(d)) for u, d in zip(nodes[0], distances[0]) if u >= 0]
+    
+    def within(self, lat, lon, radius):
+        _, nodes, distances = self.within_batch([lat], [lon], radius)
+        return [(self.G.station_ids[u], float(d)) for u, d in zip(nodes, distances)]
+    
+    def access(self, lat, lon, radius=ACCESS_RADIUS, k=ACCESS_CANDIDATES):
+        """
+        Stations to walk to from a point: all within radius, or else the k nearest
+        Returns [(node index, walking Leg from the point)]; reverse the legs for egress.
+        """
+        _, nodes, distances = self.within_batch([lat], [lon], radius)
+        if len(nodes) == 0:
+            nodes, distances = self.nearest_batch([lat], [lon], k)
+            keep = nodes[0] >= 0
+            nodes, distances = nodes[0][keep], distances[0][keep]
+        
+        label = point_label(lat, lon)
+        return [(int(u), walk_leg(label, self.G.station_ids[u], d)) for u, d in zip(nodes, distances)]
+
+def point_route(G, locator, origin, destination, weight='time', radius=ACCESS_RADIUS):
+    """
+    Route between two (lat, lon) points: walk to a nearby station, ride, walk on
+    Searches from all access stations at once (seeded with their walking cost)
+    towards all egress stations, so the best station pair is picked, not just the
+    nearest. A direct walk is returned when it is cheaper. None if nothing connects.
+    """
+    access = locator.access(*origin, radius=radius)
+    egress = locator.access(*destination, radius=radius)
+    egress_cost = {}
+    egress_leg = {}
+    for u, leg in egress:
+        egress_cost[u] = getattr(leg, weight)
+        egress_leg[u] = Leg(leg.route_id, leg.route_name, leg.mode, leg.stations[::-1],
+                            time=leg.time, distance=leg.distance, emissions=leg.emissions)
+    
+    adj = G.adjacency_views()
+    indptr, indices, sources, cost = adj['indptr'], adj['indices'], adj['sources'], adj[weight]
+    
+    # Multi-source Dijkstra; each access station starts at the cost of walking to it
+    dist, parent, start_leg = {}, {}, {}
+    heap = []
+    for u, leg in access:
+        d = getattr(leg, weight)
+        if d < dist.get(u, math.inf):
+            dist[u], parent[u], start_leg[u] = d, -1, leg
+            heapq.heappush(heap, (d, u))
+    
+    best, best_node = math.inf, -1
+    settled = set()
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d >= best:
+            break
+        if u in settled:
+            continue
+        settled.add(u)
+        if u in egress_cost and d + egress_cost[u] < best:
+            best, best_node = d + egress_cost[u], u
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            nd = d + cost[e]
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                parent[v] = e
+                heapq.heappush(heap, (nd, v))
+    
+    # Walking the whole way, if the points are close enough to walk between
+    straight = haversine_distance(*origin, *destination)
+    if straight <= 2 * radius:
+        direct = walk_leg(point_label(*origin), point_label(*destination), straight)
+        if getattr(direct, weight) <= best:
+            return Route([direct], time=direct.time, distance=direct.distance)
+    if best_node < 0:
+        return None
+    
+    edges = []
+    node = best_node
+    while parent[node] >= 0:
+        edges.append(parent[node])
+        node = sources[parent[node]]
+    
+    ride = route_from_edges(G, node, edges[::-1])
+    legs = [start_leg[node]] + ride.legs + [egress_leg[best_node]]
+    return Route(
+        legs,
+        time=sum(leg.time for leg in legs),
+        distance=sum(leg.distance for leg in legs),
+        emissions=sum(leg.emissions for leg in legs),
+        changes=max(len(ride.legs) - 1, 0)
+    )
+
+if __name__ == "__main__":
+    # python scripts/routing/snap.py LAT LON [DEST_LAT DEST_LON]
+    from graph.storage import load_graph
+    from utils.io import PROCESSED_DIR
+    
+    G = load_graph(f'{PROCESSED_DIR}/pt_graph.bin')
+    locator = StationLocator(G)
+    coords = [float(x) for x in sys.argv[1:5]]
+    
+    if len(coords) == 2:
+        for station_id, distance in locator.nearest(*coords, k=5):
+            print(f"  {station_id} {G.node_data(G.node(station_id)).get('stop_name')}: {distance:.0f} m")
+    else:
+        route = point_route(G, locator, tuple(coords[:2]), tuple(coords[2:]))
+        if route is None:
+            print("  No route found")
+        else:
+            for leg in route.legs:
+                print(f"  {leg.mode:5} {leg.route_name}: {leg.from_station} → {leg.to_station} ({leg.time/60:.1f} min)")
+            print(f"  Total: {route.time/60:.1f} min, {route.emissions:.3f} kg CO2")
@@ -1,5 +1,6 @@
 import zipfile
 import os
+from contextlib import contextmanager
 
 # Path to main GTFS zip
 GTFS_MAIN = "data/gtfs.zip"
@@ -29,5 +30,28 @@ def unzip_nested():
             zip_ref.extractall(out_dir)
         print(f"Extracted {folder_name}")
 
+@contextmanager
+def open_feed_file(feed_id, filename, gtfs_zip=GTFS_MAIN):
+    """
+    Open one GTFS file (e.g. stop_times.txt) for reading straight out of
+    gtfs.zip → {feed_id}/google_transit.zip, without extracting anything.
+    The inner zip is decompressed on the fly, so memory stays bounded.
+    Raises FileNotFoundError if the feed or file is not in the archive.
+    """
+    with zipfile.ZipFile(gtfs_zip, 'r') as outer:
+        try:
+            inner_file = outer.open(f"{feed_id}/google_transit.zip")
+        except KeyError as e:
+            raise FileNotFoundError(f"{feed_id}/google_transit.zip not in {gtfs_zip}") from e
+        
+        with inner_file, zipfile.ZipFile(inner_file, 'r') as inner:
+            try:
+                member = inner.open(filename)
+            except KeyError as e:
+                raise FileNotFoundError(f"{filename} not in {feed_id}/google_transit.zip") from e
+            
+            with member:
+                yield member
+
 if __name__ == "__main__":
     unzip_nested()
\ No newline at end of file
@@ -1,11 +1,12 @@
 import math
+import numpy as np
+
+R = 6371000  # Earth radius in meters
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     """
     Calculate distance between two points in meters
     """
-    R = 6371000  # Earth radius in meters
-    
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
     delta_phi = math.radians(lat2 - lat1)
@@ -17,6 +18,39 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     
     return R * c
 
+def haversine_distances(lat1, lon1, lat2, lon2):
+    """
+    Vectorized haversine_distance over coordinate arrays (meters)
+    Inputs broadcast against each other; NaN coordinates give NaN distances
+    """
+    lat1 = np.asarray(lat1, dtype=np.float64)
+    lon1 = np.asarray(lon1, dtype=np.float64)
+    lat2 = np.asarray(lat2, dtype=np.float64)
+    lon2 = np.asarray(lon2, dtype=np.float64)
+    
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    delta_phi = np.radians(lat2 - lat1)
+    delta_lambda = np.radians(lon2 - lon1)
+    
+    a = np.sin(delta_phi/2)**2 + \
+        np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    
+    return R * c
+
+def pairwise_haversine(lats1, lons1, lats2, lons2):
+    """
+    Distance matrix (meters) between every point in set 1 and every point in set 2
+    Result has shape (len(lats1), len(lats2))
+    """
+    lats1 = np.asarray(lats1, dtype=np.float64)[:, None]
+    lons1 = np.asarray(lons1, dtype=np.float64)[:, None]
+    lats2 = np.asarray(lats2, dtype=np.float64)[None, :]
+    lons2 = np.asarray(lons2, dtype=np.float64)[None, :]
+    
+    return haversine_distances(lats1, lons1, lats2, lons2)
+
 def is_in_melbourne(lat, lon):
     """Check if coordinates are in Melbourne region"""
     return (-38.5 <= lat <= -37.5) and (144.5 <= lon <= 145.5)
\ No newline at end of file
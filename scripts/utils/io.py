@@ -0,0 +1,174 @@
+import os
+import sys
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PROCESSED_DIR = "data/processed/"
+
+# Intermediate tables passed between pipeline stages (name → written by)
+TABLES = {
+    'routes': 'parse_gtfs',
+    'stops_raw': 'parse_gtfs',
+    'trips': 'parse_gtfs',
+    'stop_times': 'parse_gtfs',
+    'stops_cleaned': 'stops',
+    'stop_to_station_map': 'stops',
+    'transfers': 'transfers',
+    'edges_raw': 'edges',
+    'edges_merged': 'merge',
+    'edge_stats': 'merge'
+}
+
+# Routing indexes built from the graph, also in PROCESSED_DIR. Defined here so the
+# pipeline can name its outputs without importing the routing modules.
+TIMETABLE_PATH = f'{PROCESSED_DIR}/timetable.npz'    # routing/raptor.py
+LANDMARKS_PATH = f'{PROCESSED_DIR}/landmarks.npz'    # routing/alt.py
+CH_PATH = PROCESSED_DIR + '/ch_{metric}.npz'         # routing/ch.py, one per CH_METRICS
+CH_METRICS = ['time', 'emissions']
+
+def _apply_filters(df, filters):
+    """
+    Apply pyarrow-style filters [(column, op, value), ...] to a DataFrame
+    Used by backends that cannot push predicates down into the reader.
+    """
+    ops = {
+        '==': lambda s, v: s == v,
+        '=': lambda s, v: s == v,
+        '!=': lambda s, v: s != v,
+        '<': lambda s, v: s < v,
+        '<=': lambda s, v: s <= v,
+        '>': lambda s, v: s > v,
+        '>=': lambda s, v: s >= v,
+        'in': lambda s, v: s.isin(v),
+        'not in': lambda s, v: ~s.isin(v)
+    }
+    
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        if op not in ops:
+            raise ValueError(f"Unsupported filter operator '{op}'")
+        mask &= ops[op](df[column], value)
+    
+    return df[mask].reset_index(drop=True)
+
+class CsvStore:
+    """Plain CSV files, as every stage used to write. Dtypes are re-inferred on read."""
+    extension = '.csv'
+    
+    def write(self, df, path):
+        df.to_csv(path, index=False)
+    
+    def read(self, path, columns=None, filters=None, memory_map=False):
+        usecols = None
+        if columns is not None:
+            # Filter columns have to be read even when they are not returned
+            usecols = list(columns) + [f[0] for f in filters or [] if f[0] not in columns]
+
+        df = pd.read_csv(path, usecols=usecols, low_memory=False, memory_map=memory_map)
+        if filters:
+            df = _apply_filters(df, filters)
+        return df[list(columns)] if columns is not None else df
+    
+    def iter_batches(self, path, columns=None, batch_size=None):
+        chunks = pd.read_csv(path, usecols=columns, low_memory=False, chunksize=batch_size)
+        with chunks:
+            for df in chunks:
+                yield df[list(columns)] if columns is not None else df
+
+class ParquetStore:
+    """
+    Parquet via pyarrow. Keeps dtypes (including categoricals), reads only the
+    requested columns, pushes filters down to row groups and memory-maps the file.
+    """
+    extension = '.parquet'
+    
+    def write(self, df, path):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, path, compression='zstd')
+    
+    def read(self, path, columns=None, filters=None, memory_map=True):
+        table = pq.read_table(path, columns=columns, filters=filters or None, memory_map=memory_map)
+        return table.to_pandas()
+    
+    def iter_batches(self, path, columns=None, batch_size=None):
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+STORES = {'csv': CsvStore()}
+if pq is not None:
+    STORES['parquet'] = ParquetStore()
+
+# Rows per batch when streaming a table with iter_table
+BATCH_ROWS = 1_000_000
+
+# Format used for writing; GREEN_STORE_FORMAT=csv forces the old behaviour
+STORE_FORMAT = os.environ.get('GREEN_STORE_FORMAT', 'parquet' if pq is not None else 'csv')
+
+def get_store(fmt=None):
+    fmt = fmt or STORE_FORMAT
+    if fmt not in STORES:
+        raise ValueError(f"Unknown store format '{fmt}' (available: {', '.join(STORES)})")
+    return STORES[fmt]
+
+def table_path(name, fmt=None, directory=PROCESSED_DIR):
+    return os.path.join(directory, name + get_store(fmt).extension)
+
+def find_table(name, directory=PROCESSED_DIR):
+    """
+    Path and format of an existing table, preferring STORE_FORMAT
+    Falls back to any other format so older CSV outputs can still be read.
+    """
+    formats = [STORE_FORMAT] + [fmt for fmt in STORES if fmt != STORE_FORMAT]
+    for fmt in formats:
+        path = table_path(name, fmt, directory)
+        if os.path.exists(path):
+            return path, fmt
+    raise FileNotFoundError(f"No stored table '{name}' in {directory}")
+
+def write_table(df, name, fmt=None, directory=PROCESSED_DIR):
+    """Write an intermediate table in the configured format, returns the path"""
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(name, fmt, directory)
+    get_store(fmt).write(df, path)
+    return path
+
+def read_table(name, columns=None, filters=None, directory=PROCESSED_DIR):
+    """
+    Read an intermediate table
+    columns: only load these columns
+    filters: [(column, op, value), ...], e.g. [('mode', '==', 'train')]
+    """
+    path, fmt = find_table(name, directory)
+    return get_store(fmt).read(path, columns=columns, filters=filters)
+
+def iter_table(name, columns=None, batch_size=BATCH_ROWS, directory=PROCESSED_DIR):
+    """
+    Read an intermediate table in batches of about batch_size rows, in stored
+    order, so stages can stream tables larger than memory
+    """
+    path, fmt = find_table(name, directory)
+    yield from get_store(fmt).iter_batches(path, columns=columns, batch_size=batch_size)
+
+def export_csv(names=None, directory=PROCESSED_DIR):
+    """Write CSV copies of stored tables for inspecting by hand"""
+    for name in names or TABLES:
+        try:
+            path, fmt = find_table(name, directory)
+        except FileNotFoundError:
+            continue
+        if fmt == 'csv':
+            continue
+        
+        out = write_table(get_store(fmt).read(path), name, 'csv', directory)
+        print(f"  ✓ Exported {out}")
+
+if __name__ == "__main__":
+    # python scripts/utils/io.py [table ...]
+    export_csv(sys.argv[1:] or None)
\ No newline at end of file
@@ -0,0 +1,169 @@
+import numpy as np
+from utils.geo import R, haversine_distances
+
+# Grid cells are laid out on an equirectangular projection around the points'
+# mean latitude. Over Melbourne that is within ~1% of true distance, so
+# searches look this much further out and then filter on exact haversine.
+PROJECTION_SLACK = 1.05
+
+# Cell coordinates are packed into one int64 key (x in the high half)
+_KEY_OFFSET = 1 << 30
+
+class GridIndex:
+    """
+    Uniform grid over lat/lon points for radius searches without O(n²) comparisons
+    Points with NaN coordinates are left out of the index.
+    """
+    
+    def __init__(self, lats, lons, cell_size=500):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cell_size = float(cell_size)
+        
+        valid = np.isfinite(self.lats) & np.isfinite(self.lons)
+        self.lat0 = float(np.mean(self.lats[valid])) if valid.any() else 0.0
+        
+        cx, cy = self._cells(self.lats[valid], self.lons[valid])
+        keys = self._key(cx, cy)
+        order = np.argsort(keys, kind='stable')
+        self.points = np.flatnonzero(valid)[order]  # point indices sorted by cell
+        self.keys = keys[order]
+        self.cx = cx[order]
+        self.cy = cy[order]
+    
+    def __len__(self):
+        return len(self.points)
+    
+    def _cells(self, lats, lons):
+        # NaN query points land in cell (0, 0); their distances stay NaN
+        x = np.nan_to_num(R * np.radians(lons) * np.cos(np.radians(self.lat0)))
+        y = np.nan_to_num(R * np.radians(lats))
+        return (np.floor(x / self.cell_size).astype(np.int64),
+                np.floor(y / self.cell_size).astype(np.int64))
+    
+    @staticmethod
+    def _key(cx, cy):
+        return ((cx + _KEY_OFFSET) << 32) | (cy + _KEY_OFFSET)
+    
+    def _reach(self, radius):
+        """Cells to look on each side to cover radius"""
+        return int(np.ceil(radius * PROJECTION_SLACK / self.cell_size))
+    
+    def _candidates(self, cx, cy, reach):
+        """
+        (query position, point index) for every indexed point in the
+        (2*reach+1)² cells around each query cell
+        """
+        # Keys sort by x then y, so each column of the square is one key range
+        queries, points = [], []
+        for dx in range(-reach, reach + 1):
+            lo = np.searchsorted(self.keys, self._key(cx + dx, cy - reach), side='left')
+            hi = np.searchsorted(self.keys, self._key(cx + dx, cy + reach), side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            
+            # Expand each [lo, hi) range into positions in self.points
+            starts = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+            queries.append(np.repeat(np.arange(len(cx)), counts))
+            points.append(self.points[starts + np.arange(total)])
+        
+        if not queries:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64)
+        return np.concatenate(queries), np.concatenate(points)
+    
+    def pairs_within(self, radius):
+        """
+        Every pair of indexed points at most radius metres apart
+        Returns (i, j, distance) arrays with i < j, sorted by (i, j).
+        """
+        reach = self._reach(radius)
+        positions, j = self._candidates(self.cx, self.cy, reach)
+        i = self.points[positions]
+        
+        upper = i < j
+        i, j = i[upper], j[upper]
+        distance = haversine_distances(self.lats[i], self.lons[i], self.lats[j], self.lons[j])
+        close = distance <= radius
+        i, j, distance = i[close], j[close], distance[close]
+        
+        order = np.lexsort((j, i))
+        return i[order], j[order], distance[order]
+    
+    def _max_reach(self, cx, cy):
+        """Reach that covers every indexed point from each query cell"""
+        if len(self) == 0:
+            return np.zeros(len(cx), dtype=np.int64)
+        return np.maximum.reduce([
+            cx - self.cx.min(), self.cx.max() - cx,
+            cy - self.cy.min(), self.cy.max() - cy
+        ])
+    
+    def within(self, lats, lons, radius):
+        """
+        Indexed points at most radius metres from each query point
+        Returns (query, point, distance) arrays sorted by query, then distance.
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        cx, cy = self._cells(lats, lons)
+        reach = self._reach(radius)
+        if len(cx):
+            reach = max(min(reach, int(self._max_reach(cx, cy).max())), 0)
+        query, point = self._candidates(cx, cy, reach)
+        
+        distance = haversine_distances(lats[query], lons[query], self.lats[point], self.lons[point])
+        close = distance <= radius
+        query, point, distance = query[close], point[close], distance[close]
+        
+        order = np.lexsort((distance, query))
+        return query[order], point[order], distance[order]
+    
+    def nearest(self, lats, lons, k=1):
+        """
+        k nearest indexed points to each query point
+        Returns (points, distances) of shape (n_queries, k), nearest first,
+        padded with -1 / inf when fewer than k points are indexed.
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        n = len(lats)
+        points = np.full((n, k), -1, dtype=np.int64)
+        distances = np.full((n, k), np.inf)
+        
+        cx, cy = self._cells(lats, lons)
+        pending = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        if len(self) == 0:
+            return points, distances
+        max_reach = self._max_reach(cx, cy)
+        reach = 1
+        
+        # Grow the searched square until the k-th candidate is closer than
+        # anything outside it could be (reach - 1 whole cells on every side)
+        while len(pending):
+            query, point = self._candidates(cx[pending], cy[pending], min(reach, int(max_reach[pending].max())))
+            distance = haversine_distances(lats[pending][query], lons[pending][query],
+                                           self.lats[point], self.lons[point])
+            order = np.lexsort((distance, query))
+            query, point, distance = query[order], point[order], distance[order]
+            
+            counts = np.bincount(query, minlength=len(pending))
+            rank = np.arange(len(query)) - np.repeat(np.cumsum(counts) - counts, counts)
+            top = rank < k
+            
+            kth = np.full(len(pending), np.inf)
+            full = rank == k - 1
+            kth[query[full]] = distance[full]
+            covered = (reach - 1) * self.cell_size / PROJECTION_SLACK
+            done = (kth <= covered) | (reach >= max_reach[pending])
+            
+            keep = top & done[query]
+            rows = pending[query[keep]]
+            points[rows, rank[keep]] = point[keep]
+            distances[rows, rank[keep]] = distance[keep]
+            
+            pending = pending[~done]
+            reach *= 2
+        
+        return points, distances
@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+
 def parse_gtfs_time(time_str):
     """
     Convert GTFS time string to seconds since midnight
@@ -12,6 +15,46 @@ def parse_gtfs_time(time_str):
     except:
         return 0
 
+def _parse_time_strings(strings):
+    """Seconds for an object array of strings, 0 where parse_gtfs_time would fail"""
+    seconds = np.zeros(len(strings), dtype=np.int64)
+    fast = np.zeros(len(strings), dtype=bool)
+    
+    # Fast path: fixed-width HH:MM:SS, read straight from the code points
+    chars = np.array(strings, dtype=str)
+    width = chars.dtype.itemsize // 4
+    if width >= 8:
+        codepoints = chars.view(np.uint32).reshape(len(strings), width)
+        digits = codepoints[:, [0, 1, 3, 4, 6, 7]] - ord('0')
+        fast = (digits < 10).all(axis=1) & (codepoints[:, 2] == ord(':')) & (codepoints[:, 5] == ord(':'))
+        if width > 8:
+            fast &= codepoints[:, 8] == 0
+        d = digits[fast].astype(np.int64)
+        seconds[fast] = (d[:, 0]*10 + d[:, 1]) * 3600 + (d[:, 2]*10 + d[:, 3]) * 60 + d[:, 4]*10 + d[:, 5]
+    
+    # Everything else (H:MM:SS, spaces, junk) is rare; use the scalar parser
+    slow = np.flatnonzero(~fast)
+    seconds[slow] = [parse_gtfs_time(t) for t in strings[slow]]
+    
+    return seconds
+
+def parse_gtfs_times(values):
+    """
+    Vectorized parse_gtfs_time: int32 seconds since midnight for a column of GTFS times
+    Anything parse_gtfs_time would reject (NaN, numbers, malformed strings) becomes 0.
+    Each distinct value is parsed once, so repeated timetable times are cheap.
+    """
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    uniques = np.asarray(uniques, dtype=object)
+    seconds = np.zeros(len(uniques), dtype=np.int64)
+    
+    is_str = np.fromiter((isinstance(u, str) for u in uniques), dtype=bool, count=len(uniques))
+    if is_str.any():
+        seconds[is_str] = _parse_time_strings(uniques[is_str])
+    
+    # Sentinel -1 (missing value) indexes the appended 0
+    return np.append(seconds, 0)[codes].astype(np.int32)
+
 def time_diff(time1_str, time2_str):
     """Calculate difference in seconds between two GTFS times"""
     t1 = parse_gtfs_time(time1_str)
@@ -31,4 +74,15 @@ def time_diff(time1_str, time2_str):
     if diff > 7200:
         return 0  # Will be filtered out
     
-    return diff
\ No newline at end of file
+    return diff
+
+def time_diffs(t1, t2):
+    """Vectorized time_diff over arrays of seconds since midnight (see parse_gtfs_times)"""
+    diff = np.asarray(t2) - np.asarray(t1)
+    
+    # Handle negative times (overnight)
+    diff = np.where(diff < 0, diff + 24 * 3600, diff)
+    
+    # Same zero-time and over-2-hour rules as time_diff
+    diff = np.where(diff == 0, 30, diff)
+    return np.where(diff > 7200, 0, diff)
\ No newline at end of file
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import build_graph.merge as merge
+from utils.io import read_table, write_table
+
+def edges_raw(seed=0, n=400):
+    """Small edges_raw with repeated travel times and departures on every edge"""
+    rng = np.random.default_rng(seed)
+    stations = ['A', 'B', 'C', 'D']
+    routes = {'R1': ('1', 'bus'), 'R2': ('2', 'tram'), 'R3': ('3', 'train')}
+    rows = pd.DataFrame({
+        'from_station': rng.choice(stations, n),
+        'to_station': rng.choice(stations, n),
+        'route_id': rng.choice(list(routes), n),
+        'time': rng.choice([60, 90, 120, 150, 300], n).astype(np.int32),
+        'distance': rng.uniform(200, 2000, n),
+        # Few distinct departures, so some repeat (as across service days)
+        'departure': (6 * 3600 + 600 * rng.integers(0, 20, n)).astype(np.int32)
+    })
+    rows = rows[rows['from_station'] != rows['to_station']].reset_index(drop=True)
+    rows['route_name'] = rows['route_id'].map(lambda r: routes[r][0])
+    rows['mode'] = rows['route_id'].map(lambda r: routes[r][1])
+    rows['trip_id'] = [f"T{i}" for i in range(len(rows))]
+    return rows
+
+def expected(raw, keys):
+    """Reference statistics from a plain pandas groupby"""
+    def stats(group):
+        departures = np.unique(group['departure'])
+        return pd.Series({
+            'trips': len(group),
+            'time': np.median(group['time']),
+            'time_p90': np.percentile(group['time'], 90),
+            'first_departure': departures[0],
+            'last_departure': departures[-1],
+            'headway': (departures[-1] - departures[0]) / (len(departures) - 1) if len(departures) > 1 else np.nan
+        })
+    return raw.groupby(keys)[['time', 'departure']].apply(stats).reset_index()
+
+STATS = ['trips', 'time', 'time_p90', 'first_departure', 'last_departure', 'headway']
+
+@pytest.fixture
+def processed(tmp_path, monkeypatch):
+    # Tables are read and written under data/processed/ of the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def check(result, reference, keys):
+    result = result.sort_values(keys, ignore_index=True)
+    reference = reference.sort_values(keys, ignore_index=True)
+    assert list(result[keys].itertuples(index=False)) == list(reference[keys].itertuples(index=False))
+    for name in STATS:
+        np.testing.assert_allclose(result[name].to_numpy(np.float64), reference[name].to_numpy(np.float64),
+                                   rtol=1e-6, err_msg=name)
+
+@pytest.mark.parametrize('batch_size', [7, 1000])
+def test_matches_groupby(processed, batch_size):
+    raw = edges_raw()
+    write_table(raw, 'edges_raw')
+    merged = merge.merge_edges(batch_size=batch_size)
+    
+    check(read_table('edge_stats'), expected(raw, ['from_station', 'to_station', 'route_id']),
+          ['from_station', 'to_station', 'route_id'])
+    check(merged, expected(raw, ['from_station', 'to_station']), ['from_station', 'to_station'])
+
+def test_busiest_route(processed):
+    raw = edges_raw(seed=1)
+    write_table(raw, 'edges_raw')
+    merged = merge.merge_edges(batch_size=50)
+    
+    counts = raw.groupby(['from_station', 'to_station', 'route_id']).size().rename('trips').reset_index()
+    busiest = counts.sort_values(['trips', 'route_id'], ascending=[False, True], kind='mergesort')
+    busiest = busiest.drop_duplicates(['from_station', 'to_station']).set_index(['from_station', 'to_station'])
+    route_ids = merged.set_index(['from_station', 'to_station'])['route_id']
+    assert route_ids.sort_index().equals(busiest['route_id'].sort_index())
+    
+    distance = raw.groupby(['from_station', 'to_station', 'route_id'])['distance'].mean()
+    chosen = list(zip(merged['from_station'], merged['to_station'], merged['route_id']))
+    np.testing.assert_allclose(merged['distance'], distance.loc[chosen].to_numpy())
+
+def test_without_departures(processed):
+    raw = edges_raw().drop(columns='departure')
+    write_table(raw, 'edges_raw')
+    merged = merge.merge_edges()
+    
+    assert 'headway' not in merged.columns
+    reference = raw.groupby(['from_station', 'to_station'])['time']
+    np.testing.assert_allclose(merged['trips'], reference.size().to_numpy())
+    np.testing.assert_allclose(merged['time'], reference.median().to_numpy())
+
+def test_empty(processed):
+    write_table(edges_raw().iloc[:0], 'edges_raw')
+    merged = merge.merge_edges()
+    assert merged.empty
+    assert read_table('edge_stats').empty
+
+def test_overflowing_fields(processed, monkeypatch):
+    raw = edges_raw()
+    write_table(raw, 'edges_raw')
+    
+    with monkeypatch.context() as patch:
+        patch.setattr(merge, 'DEPARTURE_BITS', 10)
+        with pytest.raises(ValueError, match='DEPARTURE_BITS'):
+            merge.merge_edges()
+    with monkeypatch.context() as patch:
+        patch.setattr(merge, 'CODE_BITS', 1)
+        with pytest.raises(ValueError, match='CODE_BITS'):
+            merge.merge_edges()
+    
+    write_table(raw.assign(time=-raw['time']), 'edges_raw')
+    with pytest.raises(ValueError, match='TIME_BITS'):
+        merge.merge_edges()
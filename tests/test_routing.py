@@ -0,0 +1,233 @@
+import math
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from graph.csr import CSRGraph
+from routing.alt import Landmarks, alt_route
+from routing.ch import ContractionHierarchy, ch_route
+from routing.dijkstra import dijkstra, shortest_route
+from routing.pareto import pareto_routes
+from routing.raptor import Timetable, earliest_arrival, range_query
+
+MODES = {'R1': 'train', 'R2': 'tram', 'R3': 'bus', 'W': 'walk'}
+
+def network(n=24, seed=0):
+    """
+    Random strongly connected PT graph; times in whole seconds and emissions
+    in 1/64 kg, so float32 edge weights sum exactly
+    """
+    rng = np.random.default_rng(seed)
+    G = nx.DiGraph()
+    for i in range(n):
+        G.add_node(f"S{i}", stop_name='Flinders Street' if i == 0 else f"Stop {i}",
+                   lat=-37.8 + i / 1000, lon=144.9, node_type='station')
+    # A ring keeps every station reachable, chords add alternatives
+    pairs = [(i, (i + 1) % n) for i in range(n)] + [tuple(rng.choice(n, 2, replace=False)) for _ in range(3 * n)]
+    for u, v in pairs:
+        route_id = rng.choice(list(MODES))
+        G.add_edge(f"S{u}", f"S{v}", time=float(rng.integers(60, 900)), distance=float(rng.integers(100, 5000)),
+                   emissions_factor=0.0, emissions=float(rng.integers(0, 64)) / 64, route_id=route_id,
+                   route_name=route_id, mode=MODES[route_id])
+    return G
+
+@pytest.fixture(scope='module')
+def graphs():
+    G = network()
+    return G, CSRGraph.from_networkx(G)
+
+def lengths(G, weight):
+    return dict(nx.all_pairs_dijkstra_path_length(G, weight=weight))
+
+@pytest.mark.parametrize('weight', ['time', 'emissions', 'distance'])
+def test_dijkstra(graphs, weight):
+    G, csr = graphs
+    expected = lengths(G, weight)
+    for origin in G.nodes:
+        dist = dijkstra(csr, csr.node(origin), weight)[0]
+        assert {station: dist[csr.node(station)] for station in G.nodes} == pytest.approx(expected[origin])
+
+def test_shortest_route(graphs):
+    G, csr = graphs
+    for origin, destination in [('S0', 'S12'), ('S5', 'S4'), ('S23', 'S1')]:
+        route = shortest_route(csr, origin, destination)
+        assert route.time == pytest.approx(nx.shortest_path_length(G, origin, destination, weight='time'))
+        assert route.stations[0] == origin and route.stations[-1] == destination
+
+def check_path(G, route, origin, destination):
+    """The route follows graph edges from origin to destination and adds up their times"""
+    stations = [leg.stations for leg in route.legs]
+    assert stations[0][0] == origin and stations[-1][-1] == destination
+    times = sum(G.edges[u, v]['time'] for leg in stations for u, v in zip(leg, leg[1:]))
+    assert route.time == pytest.approx(times)
+
+@pytest.mark.parametrize('metric', ['time', 'emissions'])
+def test_contraction_hierarchy(graphs, metric):
+    G, csr = graphs
+    ch = ContractionHierarchy.build(csr, metric)
+    expected = lengths(G, metric)
+    for origin in G.nodes:
+        for destination in G.nodes:
+            cost, route = ch_route(csr, ch, origin, destination)
+            assert cost == pytest.approx(expected[origin][destination])
+            if origin != destination:
+                assert getattr(route, metric) == pytest.approx(cost)
+                check_path(G, route, origin, destination)
+
+def test_contraction_hierarchy_unreachable():
+    G = network(n=6)
+    G.add_node('lonely', stop_name='Lonely', lat=-37.0, lon=145.0, node_type='station')
+    csr = CSRGraph.from_networkx(G)
+    ch = ContractionHierarchy.build(csr)
+    assert ch_route(csr, ch, 'S0', 'lonely') == (math.inf, None)
+
+@pytest.mark.parametrize('metric', ['time', 'emissions'])
+def test_alt(graphs, metric):
+    G, csr = graphs
+    landmarks = Landmarks.build(csr, n_landmarks=4)
+    expected = lengths(G, metric)
+    for origin in G.nodes:
+        for destination in ['S3', 'S11', 'S20']:
+            route, _ = alt_route(csr, landmarks, origin, destination, metric)
+            assert getattr(route, metric) == pytest.approx(expected[origin][destination])
+            if origin != destination:
+                check_path(G, route, origin, destination)
+
+def test_pareto(graphs):
+    G, csr = graphs
+    for origin, destination in [('S0', 'S12'), ('S7', 'S2'), ('S19', 'S9')]:
+        routes = pareto_routes(csr, origin, destination, max_labels=1000)
+        # The extremes of the front are the single-criterion optima
+        assert routes[0].time == pytest.approx(nx.shortest_path_length(G, origin, destination, weight='time'))
+        assert min(r.emissions for r in routes) == pytest.approx(
+            nx.shortest_path_length(G, origin, destination, weight='emissions'))
+        for route in routes:
+            check_path(G, route, origin, destination)
+            assert not any(
+                other is not route and other.time <= route.time and other.emissions <= route.emissions
+                and other.changes <= route.changes
+                and (other.time, other.emissions, other.changes) != (route.time, route.emissions, route.changes)
+                for other in routes
+            )
+
+# Timetable: (route, feed, station sequence, first departure, trips, headway, seconds per hop, dwell)
+# R2 leaves B 30 s after the first R1 arrives there, inside CHANGE_TIME
+LINES = [
+    ('R1', '2_metro_train', ['A', 'B', 'C', 'D'], 8 * 3600, 6, 600, 240, 30),
+    ('R2', '3_metro_tram', ['B', 'E', 'D'], 8 * 3600 + 270, 8, 420, 420, 0),
+    ('R3', '4_metro_bus', ['C', 'F', 'G'], 8 * 3600 + 300, 5, 900, 300, 60),
+    ('R4', '4_metro_bus', ['G', 'E', 'A'], 8 * 3600, 4, 1200, 360, 0)
+]
+WALKS = [('D', 'F', 200), ('F', 'D', 200)]
+CHANGE_TIME = 60
+
+def clock(seconds):
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+@pytest.fixture(scope='module')
+def timetable():
+    stop_times, trips, routes = [], [], []
+    for route_id, feed, stations, first, n_trips, headway, hop, dwell in LINES:
+        routes.append({'route_id': route_id, 'route_short_name': route_id, 'feed_source': feed, 'route_type': 3})
+        for k in range(n_trips):
+            trip_id = f"{route_id}-{k}"
+            trips.append({'trip_id': trip_id, 'route_id': route_id})
+            departure = first + k * headway
+            for i, station in enumerate(stations):
+                arrival = departure if i == 0 else departure + hop
+                departure = arrival + (dwell if 0 < i < len(stations) - 1 else 0)
+                stop_times.append({'trip_id': trip_id, 'stop_id': f"{station}1", 'stop_sequence': i + 1,
+                                   'arrival_time': clock(arrival), 'departure_time': clock(departure)})
+    names = sorted({station for line in LINES for station in line[2]})
+    stations = pd.DataFrame({'station_id': names, 'stop_lat': -37.8, 'stop_lon': 144.9 + np.arange(len(names)) / 100})
+    stop_map = pd.DataFrame({'stop_id': [f"{s}1" for s in names], 'station_id': names})
+    transfers = pd.DataFrame(WALKS, columns=['from_station', 'to_station', 'time']).assign(distance=150.0)
+    tt = Timetable.from_tables(pd.DataFrame(stop_times), pd.DataFrame(trips), pd.DataFrame(routes), stop_map,
+                               stations, {'train': 0.04, 'tram': 0.05, 'bus': 0.1}, transfers)
+    return tt, pd.DataFrame(stop_times)
+
+def time_expanded(stop_times, origin, departure):
+    """
+    Time-expanded DiGraph of the timetable whose path lengths from
+    ('wait', origin, departure) to ('at', station) are travel times
+    Riding, dwelling and waiting take their scheduled time; changing trips
+    takes CHANGE_TIME unless a walk covers it.
+    """
+    G = nx.DiGraph()
+    waits = {(origin, departure)}
+    stop_times = stop_times.assign(
+        station=stop_times['stop_id'].str[:-1],
+        arrival=[sum(int(x) * f for x, f in zip(t.split(':'), (3600, 60, 1))) for t in stop_times['arrival_time']],
+        departure=[sum(int(x) * f for x, f in zip(t.split(':'), (3600, 60, 1))) for t in stop_times['departure_time']]
+    )
+    walks = {}
+    for source, target, walk in WALKS:
+        walks.setdefault(source, []).append((target, walk))
+    for _, stop_times_of_trip in stop_times.groupby('trip_id'):
+        rows = list(stop_times_of_trip.sort_values('stop_sequence').itertuples())
+        for i, row in enumerate(rows):
+            here = ('trip', row.trip_id, i)
+            G.add_edge(('stop', row.trip_id, i), here, weight=row.departure - row.arrival)
+            G.add_edge(('wait', row.station, row.departure), here, weight=0)
+            waits.add((row.station, row.departure))
+            if i + 1 < len(rows):
+                G.add_edge(here, ('stop', row.trip_id, i + 1), weight=rows[i + 1].arrival - row.departure)
+            if i > 0:
+                G.add_edge(('stop', row.trip_id, i), ('wait', row.station, row.arrival + CHANGE_TIME), weight=CHANGE_TIME)
+                waits.add((row.station, row.arrival + CHANGE_TIME))
+                for target, walk in walks.get(row.station, []):
+                    G.add_edge(('stop', row.trip_id, i), ('wait', target, row.arrival + walk), weight=walk)
+                    waits.add((target, row.arrival + walk))
+            G.add_edge(('stop', row.trip_id, i), ('at', row.station), weight=0)
+    for target, walk in walks.get(origin, []):
+        G.add_edge(('wait', origin, departure), ('wait', target, departure + walk), weight=walk)
+        waits.add((target, departure + walk))
+    # Waiting at a station until its next event
+    for station in {s for s, _ in waits}:
+        times = sorted(t for s, t in waits if s == station)
+        for a, b in zip(times, times[1:]):
+            G.add_edge(('wait', station, a), ('wait', station, b), weight=b - a)
+        for t in times:
+            G.add_edge(('wait', station, t), ('at', station), weight=0)
+    return G
+
+DEPARTURES = [8 * 3600 - 60, 8 * 3600 + 200, 8 * 3600 + 1000, 8 * 3600 + 2500, 9 * 3600]
+
+@pytest.mark.parametrize('departure', DEPARTURES)
+def test_earliest_arrival(timetable, departure):
+    tt, stop_times = timetable
+    for origin in tt.station_ids:
+        G = time_expanded(stop_times, origin, departure)
+        for destination in tt.station_ids:
+            if origin == destination:
+                continue
+            route = earliest_arrival(tt, origin, destination, departure, change_time=CHANGE_TIME)
+            try:
+                expected = nx.shortest_path_length(G, ('wait', origin, departure), ('at', destination), weight='weight')
+            except nx.NetworkXNoPath:
+                assert route is None
+                continue
+            assert route.arrival - departure == expected
+            assert route.legs[0].from_station == origin and route.legs[-1].to_station == destination
+            for leg, next_leg in zip(route.legs, route.legs[1:]):
+                assert leg.to_station == next_leg.from_station
+                assert leg.arrival <= next_leg.departure
+
+def test_range_query(timetable):
+    tt, _ = timetable
+    start, end = 8 * 3600, 8 * 3600 + 3600
+    for origin, destination in [('A', 'D'), ('A', 'G'), ('C', 'A'), ('B', 'F')]:
+        journeys = range_query(tt, origin, destination, start, end, change_time=CHANGE_TIME)
+        assert journeys
+        # Later departures arrive strictly later, or they would dominate
+        assert all(a.departure < b.departure and a.arrival < b.arrival for a, b in zip(journeys, journeys[1:]))
+        for journey in journeys:
+            assert start <= journey.departure <= end
+            assert journey.arrival == earliest_arrival(tt, origin, destination, journey.departure, change_time=CHANGE_TIME).arrival
+        # Leaving at any minute of the window, the best journey is in the set
+        for departure in range(start, end + 1, 60):
+            best = earliest_arrival(tt, origin, destination, departure, change_time=CHANGE_TIME)
+            if best is None or best.legs[0].departure > end:
+                continue
+            assert best.arrival == min(j.arrival for j in journeys if j.departure >= departure)
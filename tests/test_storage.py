@@ -0,0 +1,139 @@
+import json
+import networkx as nx
+import numpy as np
+import pytest
+
+from graph.csr import CSRGraph
+from graph.storage import ALIGNMENT, MAGIC, GraphFormatError, load_graph, load_name_index, write_graph
+
+def graph(service=False):
+    G = nx.DiGraph()
+    stations = [('S1', 'Flinders Street'), ('S2', 'Southern Cross'), ('S3', float('nan')), ('S4', None), ('W1', 'Ünïcode Rd')]
+    for i, (station_id, name) in enumerate(stations):
+        G.add_node(station_id, stop_name=name, lat=-37.8 - i / 100, lon=144.9 + i / 100,
+                   node_type='walk' if station_id.startswith('W') else 'station')
+    for u, v, route_id, mode, t in [('S1', 'S2', 'R1', 'train', 120), ('S2', 'S3', 'R1', 'train', 180),
+                                    ('S3', 'S1', 'R2', 'tram', 300), ('S2', 'W1', 'walk', 'walk', 90),
+                                    ('W1', 'S4', None, 'walk', 45)]:
+        data = {'time': t, 'distance': 10.0 * t, 'emissions_factor': 0.05, 'emissions': t / 1000,
+                'route_id': route_id, 'route_name': route_id, 'mode': mode}
+        if service and mode != 'walk':
+            data.update(trips=40.0, time_p90=t + 30.0, headway=600.0)
+        G.add_edge(u, v, **data)
+    return CSRGraph.from_networkx(G)
+
+def check_equal(loaded, G):
+    assert list(loaded.station_ids) == [str(s) for s in G.station_ids]
+    np.testing.assert_array_equal(loaded.indptr, G.indptr)
+    np.testing.assert_array_equal(loaded.indices, G.indices)
+    assert set(loaded.edge_attrs) == set(G.edge_attrs)
+    for name, values in G.edge_attrs.items():
+        np.testing.assert_array_equal(loaded.edge_attrs[name], values, err_msg=name)
+    for name in ['lat', 'lon', 'node_type']:
+        np.testing.assert_array_equal(loaded.node_attrs[name], G.node_attrs[name], err_msg=name)
+    for name, labels in G.labels.items():
+        assert list(loaded.labels[name]) == list(labels)
+    for e in range(G.number_of_edges()):
+        assert loaded.edge_data(e) == pytest.approx(G.edge_data(e), nan_ok=True)
+    for station_id in G.station_ids:
+        assert loaded.node(station_id) == G.node(station_id)
+
+def test_round_trip(tmp_path):
+    G = graph()
+    write_graph(G, tmp_path / 'g.bin')
+    loaded = load_graph(tmp_path / 'g.bin')
+    
+    check_equal(loaded, G)
+    # Missing names (None, NaN) come back as empty strings
+    assert list(loaded.node_attrs['stop_name']) == ['Flinders Street', 'Southern Cross', '', '', 'Ünïcode Rd']
+    assert 'S9' not in loaded.index
+    assert loaded.find_stations('flinders')[0][0] == 'S1'
+    assert not (tmp_path / 'g.bin.tmp').exists()
+
+def test_optional_arrays(tmp_path):
+    G = graph(service=True)
+    G.set_weight('emissions_high', G.edge_attrs['emissions'] * 2)
+    write_graph(G, tmp_path / 'g.bin')
+    loaded = load_graph(tmp_path / 'g.bin')
+    
+    check_equal(loaded, G)
+    assert loaded.service_attrs() == ['trips', 'time_p90', 'headway']
+    assert loaded.extra_weights() == ['emissions_high']
+    assert np.isnan(loaded.edge_attrs['headway']).sum() == 2  # walking edges
+
+def test_rewrite_keeps_mapped_graph(tmp_path):
+    # Readers of the old file keep their copy while a new graph is swapped in
+    write_graph(graph(), tmp_path / 'g.bin')
+    old = load_graph(tmp_path / 'g.bin')
+    new = graph()
+    new.set_weight('scenario', np.ones(new.number_of_edges()))
+    write_graph(new, tmp_path / 'g.bin')
+    
+    check_equal(old, graph())
+    assert load_graph(tmp_path / 'g.bin').extra_weights() == ['scenario']
+
+def rewrite(path, edit):
+    """Rewrite a graph file with edit(header) applied to its JSON header"""
+    content = path.read_bytes()
+    length = int(np.frombuffer(content, '<u4', count=1, offset=len(MAGIC) + 4)[0])
+    start = len(MAGIC) + 8
+    data = content[-(-(start + length) // ALIGNMENT) * ALIGNMENT:]
+    header = json.loads(content[start:start + length])
+    edit(header)
+    header = json.dumps(header).encode('utf-8')
+    preamble = content[:len(MAGIC) + 4] + np.array([len(header)], '<u4').tobytes() + header
+    path.write_bytes(preamble.ljust(-(-len(preamble) // ALIGNMENT) * ALIGNMENT, b'\0') + data)
+
+@pytest.fixture
+def written(tmp_path):
+    path = tmp_path / 'g.bin'
+    write_graph(graph(), path)
+    return path
+
+def test_rewrite_helper(written):
+    rewrite(written, lambda header: header.update(note='unchanged arrays'))
+    check_equal(load_graph(written), graph())
+
+def test_bad_magic(written):
+    written.write_bytes(b'NOTGRAPH' + written.read_bytes()[len(MAGIC):])
+    with pytest.raises(GraphFormatError, match='magic'):
+        load_graph(written)
+
+def test_other_version(written):
+    content = bytearray(written.read_bytes())
+    content[len(MAGIC):len(MAGIC) + 4] = np.array([2], '<u4').tobytes()
+    written.write_bytes(bytes(content))
+    with pytest.raises(GraphFormatError, match='version 2'):
+        load_graph(written)
+
+@pytest.mark.parametrize('name', ['indptr', 'edge/time', 'edge/route_id', 'node/lat'])
+def test_missing_array(written, name):
+    rewrite(written, lambda header: header['arrays'].pop(name))
+    with pytest.raises(GraphFormatError, match=f"missing array '{name}'"):
+        load_graph(written)
+
+def test_wrong_dtype(written):
+    rewrite(written, lambda header: header['arrays']['edge/time'].update(dtype='<f8'))
+    with pytest.raises(GraphFormatError, match="'edge/time' has dtype"):
+        load_graph(written)
+
+def test_missing_string_table(written):
+    rewrite(written, lambda header: header['arrays'].pop('node/stop_name.data'))
+    with pytest.raises(GraphFormatError, match="string table 'node/stop_name'"):
+        load_graph(written)
+
+def test_without_name_index(written):
+    # Files from before the search index load, and build the index on demand
+    rewrite(written, lambda header: [header['arrays'].pop(name) for name in list(header['arrays'])
+                                     if name.startswith('search/')])
+    loaded = load_graph(written)
+    assert 'name_index' not in loaded.cache
+    assert loaded.find_stations('southern')[0][0] == 'S2'
+    with pytest.raises(GraphFormatError, match='no station-name index'):
+        load_name_index(written)
+
+def test_not_a_file_of_ours(tmp_path):
+    path = tmp_path / 'g.bin'
+    path.write_bytes(b'x' * 100)
+    with pytest.raises(GraphFormatError):
+        load_graph(path)